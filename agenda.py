@@ -0,0 +1,240 @@
+"""
+Agenda unificada: clases, entregas de tareas y eventos de Google Calendar
+de un rango de días en una sola lista ordenada cronológicamente.
+
+La agenda de cada día (por usuario) se materializa en una caché junto con
+las versiones de las fuentes con las que se calculó:
+  - catálogo (horarios): DataManager.recargar_catalogo cambia su versión;
+  - tareas del usuario: cada escritura del store cambia su versión;
+  - calendario: las herramientas que crean o borran eventos llaman a
+    `invalidar_calendario`. Los cambios hechos fuera del asistente
+    (desde la web de Google Calendar) no se ven, así que además cada
+    día caduca a los AGENDA_CACHE_TTL segundos.
+
+Un día se sirve de la caché solo si ninguna versión ha cambiado y no ha
+caducado. Los días que faltan se calculan juntos, con una sola consulta a
+Google Calendar para todo el tramo (como mucho AGENDA_MAX_EVENTOS
+eventos: si hay más, la respuesta lo indica con "truncada" y un aviso, y
+esos días no se guardan en la caché).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import (
+    AGENDA_CACHE_TTL,
+    AGENDA_CACHE_MAX_DIAS,
+    AGENDA_MAX_DIAS,
+    AGENDA_MAX_EVENTOS,
+    USUARIO_POR_DEFECTO,
+)
+from metrics import REGISTRY
+from tracing import trazar
+
+AGENDA_CACHE = REGISTRY.counter(
+    "agenda_cache_dias_total",
+    "Días de agenda servidos desde la caché o recalculados",
+    ("resultado",),
+)
+
+# Orden dentro de una misma hora: entregas, clases y después eventos
+_ORDEN_TIPO = {"tarea": 0, "clase": 1, "evento": 2}
+
+
+def _clave_orden(elemento: Dict) -> Tuple:
+    return (elemento["fecha"], elemento["hora_inicio"], _ORDEN_TIPO[elemento["tipo"]])
+
+
+def _clase(fecha: str, h: Dict) -> Dict:
+    return {
+        "tipo": "clase",
+        "fecha": fecha,
+        "hora_inicio": h["hora_inicio"],
+        "hora_fin": h["hora_fin"],
+        "titulo": h["asignatura"],
+        "aula": h.get("aula"),
+        "profesor": h.get("profesor"),
+    }
+
+
+def _tarea(t: Dict) -> Dict:
+    return {
+        "tipo": "tarea",
+        "fecha": t["fecha_vencimiento"],
+        "hora_inicio": "",
+        "hora_fin": "",
+        "titulo": t["titulo"],
+        "id": t["id"],
+        "prioridad": t.get("prioridad"),
+        "descripcion": t.get("descripcion") or "",
+    }
+
+
+def _evento(e: Dict) -> Dict:
+    # start/end son 'YYYY-MM-DDTHH:MM:SS+hh:mm' o 'YYYY-MM-DD' (todo el día)
+    inicio = e.get("start") or ""
+    fin = e.get("end") or ""
+    return {
+        "tipo": "evento",
+        "fecha": inicio[:10],
+        "hora_inicio": inicio[11:16],
+        "hora_fin": fin[11:16],
+        "titulo": e.get("summary") or "",
+        "id": e.get("id"),
+        "ubicacion": e.get("location"),
+    }
+
+
+class Agenda:
+    """
+    Agenda unificada con caché materializada por (usuario, día).
+
+    Args:
+        dm: DataManager con el catálogo y las tareas.
+        calendario: Función que devuelve el cliente de Google Calendar
+            (se llama solo al calcular días que no están en caché).
+        ttl: Segundos que se conserva un día en caché.
+        max_dias: Días (usuario, fecha) que se guardan como máximo.
+        max_eventos: Eventos del calendario que se leen por consulta.
+    """
+
+    def __init__(
+        self,
+        dm,
+        calendario: Optional[Callable] = None,
+        ttl: float = AGENDA_CACHE_TTL,
+        max_dias: int = AGENDA_CACHE_MAX_DIAS,
+        max_eventos: int = AGENDA_MAX_EVENTOS,
+    ):
+        self.dm = dm
+        self.calendario = calendario
+        self.ttl = ttl
+        self.max_dias = max_dias
+        self.max_eventos = max_eventos
+        self._version_calendario = 1
+        self._dias: "OrderedDict[Tuple[str, str], Tuple[Tuple, float, List[Dict]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def invalidar_calendario(self):
+        """Marca como obsoletos todos los días (tras crear o borrar un evento)."""
+        with self._lock:
+            self._version_calendario += 1
+
+    def _versiones(self, usuario: str) -> Tuple:
+        v = self.dm.versiones(usuario)
+        return (v["catalogo"], v["tareas"], self._version_calendario)
+
+    def _eventos(self, desde: date, hasta: date) -> Tuple[Dict[str, List[Dict]], bool]:
+        """
+        Eventos del calendario entre desde y hasta (incluidos), agrupados por
+        día, y si se han quedado fuera eventos por pasar de max_eventos.
+        """
+        # Uno de más para saber si había más eventos que el límite
+        eventos = self.calendario().list_events(
+            fecha_inicio=f"{desde.isoformat()} 00:00",
+            fecha_fin=f"{hasta.isoformat()} 23:59",
+            max_resultados=self.max_eventos + 1,
+            ajustar_anio=False,
+        )
+        truncada = len(eventos) > self.max_eventos
+        por_dia: Dict[str, List[Dict]] = {}
+        for e in eventos[:self.max_eventos]:
+            elemento = _evento(e)
+            por_dia.setdefault(elemento["fecha"], []).append(elemento)
+        return por_dia, truncada
+
+    def _calcular(self, dias: List[date], usuario: str,
+                  eventos: Optional[Dict[str, List[Dict]]]) -> Dict[str, List[Dict]]:
+        """Agenda de cada día pedido (sin eventos si `eventos` es None)."""
+        tareas: Dict[str, List[Dict]] = {}
+        for t in self.dm.tareas_entre(dias[0], dias[-1], usuario=usuario):
+            tareas.setdefault(t["fecha_vencimiento"], []).append(_tarea(t))
+
+        resultado = {}
+        for dia in dias:
+            fecha = dia.isoformat()
+            elementos = [_clase(fecha, h) for h in self.dm.horarios_del_dia(dia)]
+            elementos += tareas.get(fecha, [])
+            elementos += (eventos or {}).get(fecha, [])
+            elementos.sort(key=_clave_orden)
+            resultado[fecha] = elementos
+        return resultado
+
+    @trazar("agenda.consultar")
+    def consultar(self, fecha_inicio: str, fecha_fin: Optional[str] = None,
+                  usuario: str = USUARIO_POR_DEFECTO) -> Dict:
+        """
+        Agenda de fecha_inicio a fecha_fin ('YYYY-MM-DD', ambos incluidos).
+
+        Devuelve {"fecha_inicio", "fecha_fin", "agenda": [...]} y, si no se
+        pudo consultar Google Calendar, "avisos" (la agenda sale sin eventos).
+        Si había más de max_eventos eventos, añade "truncada": True y un aviso.
+        """
+        try:
+            desde = date.fromisoformat(fecha_inicio)
+            hasta = date.fromisoformat(fecha_fin) if fecha_fin else desde
+        except ValueError:
+            raise ValueError("Las fechas deben tener el formato YYYY-MM-DD") from None
+        if hasta < desde:
+            raise ValueError("fecha_fin no puede ser anterior a fecha_inicio")
+        if (hasta - desde).days >= AGENDA_MAX_DIAS:
+            raise ValueError(f"El rango no puede superar {AGENDA_MAX_DIAS} días")
+        dias = [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+
+        # Las versiones se leen antes que los datos: si algo cambia mientras
+        # se calcula, la entrada queda con una versión antigua y no se reutiliza
+        versiones = self._versiones(usuario)
+        ahora = time.monotonic()
+        por_dia: Dict[str, List[Dict]] = {}
+        with self._lock:
+            for dia in dias:
+                entrada = self._dias.get((usuario, dia.isoformat()))
+                if entrada is not None and entrada[0] == versiones and entrada[1] > ahora:
+                    self._dias.move_to_end((usuario, dia.isoformat()))
+                    por_dia[dia.isoformat()] = entrada[2]
+
+        pendientes = [d for d in dias if d.isoformat() not in por_dia]
+        AGENDA_CACHE.labels("acierto").inc(len(dias) - len(pendientes))
+        AGENDA_CACHE.labels("fallo").inc(len(pendientes))
+
+        avisos: List[str] = []
+        truncada = False
+        if pendientes:
+            eventos = None
+            if self.calendario is not None:
+                try:
+                    eventos, truncada = self._eventos(pendientes[0], pendientes[-1])
+                except Exception as e:
+                    avisos.append(f"No se pudo consultar Google Calendar: {e}")
+            if truncada:
+                avisos.append(
+                    f"Hay más de {self.max_eventos} eventos en Google Calendar en esas "
+                    "fechas: solo se incluyen los primeros"
+                )
+
+            calculados = self._calcular(pendientes, usuario, eventos)
+            por_dia.update(calculados)
+
+            # Sin eventos, o sin todos, el día está incompleto y no se guarda
+            if (eventos is not None and not truncada) or self.calendario is None:
+                expira = time.monotonic() + self.ttl
+                with self._lock:
+                    for fecha, elementos in calculados.items():
+                        self._dias[(usuario, fecha)] = (versiones, expira, elementos)
+                        self._dias.move_to_end((usuario, fecha))
+                    while len(self._dias) > self.max_dias:
+                        self._dias.popitem(last=False)
+
+        resultado = {
+            "fecha_inicio": desde.isoformat(),
+            "fecha_fin": hasta.isoformat(),
+            "agenda": [e for dia in dias for e in por_dia[dia.isoformat()]],
+        }
+        if truncada:
+            resultado["truncada"] = True
+        if avisos:
+            resultado["avisos"] = avisos
+        return resultado
@@ -1,37 +1,172 @@
-from typing import List, Dict, Callable, Any
-from datetime import datetime
-from zoneinfo import ZoneInfo
+from typing import List, Dict, Callable, Any, Optional
+from pathlib import Path
+import asyncio
+import inspect
 import json
-from huggingface_hub import InferenceClient
-from config import HF_TOKEN, MODEL_NAME, SYSTEM_PROMPT, TIMEZONE
+from config import (
+    MODEL_TIMEOUT,
+    TOOL_TIMEOUT,
+    USUARIO_ID,
+    TOOLS_SELECCION_POR_TURNO,
+    PREFETCH_TOOLS,
+    SESIONES_DIR,
+    SESION_REANUDAR_MENSAJES,
+)
+from llm_backends import LLMBackend, crear_backend
+from model_caller import ModelCaller
+from prefetch import TOOLS_SOLO_LECTURA, Prefetch, Prefetcher
+from prompt_builder import PrefijoEstable, construir_mensajes, necesita_hora
+from sesiones import SesionGuardada
+from tool_selector import ToolSelector, seleccionar_tools
+from tracing import tracer
+
+
+def make_jsonable(obj):
+    """
+    Convierte cualquier objeto devuelto por la tool en algo que
+    json.dumps pueda manejar: dict, list, str, int, float, bool, None.
+    Maneja tipos como CallToolResult, modelos pydantic, dataclasses, etc.
+    """
+    # Tipos básicos directamente serializables
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
 
+    # Listas / tuplas
+    if isinstance(obj, (list, tuple)):
+        return [make_jsonable(x) for x in obj]
 
-class QwenAgent:
+    # Diccionarios
+    if isinstance(obj, dict):
+        return {k: make_jsonable(v) for k, v in obj.items()}
+
+    # Objetos con model_dump (pydantic v2)
+    if hasattr(obj, "model_dump") and callable(obj.model_dump):
+        try:
+            return make_jsonable(obj.model_dump())
+        except Exception:
+            pass
+
+    # Objetos con dict() (pydantic v1, dataclasses con método dict)
+    if hasattr(obj, "dict") and callable(obj.dict):
+        try:
+            return make_jsonable(obj.dict())
+        except Exception:
+            pass
+
+    # Objetos con atributo "content" o "result" (como CallToolResult)
+    if hasattr(obj, "content"):
+        try:
+            return make_jsonable(obj.content)
+        except Exception:
+            pass
+
+    if hasattr(obj, "result"):
+        try:
+            return make_jsonable(obj.result)
+        except Exception:
+            pass
+
+    # Último recurso: usar __dict__ si existe
+    if hasattr(obj, "__dict__"):
+        try:
+            return make_jsonable(obj.__dict__)
+        except Exception:
+            pass
+
+    # Fallback final: representarlo como string
+    return str(obj)
+
+
+def _unwrap_tool(function):
+    """
+    Desenvuelve wrappers (por ejemplo, FunctionTool) para quedarnos con
+    una función realmente invocable.
     """
-    Agente conversacional usando Qwen2.5-72B-Instruct con tool calling
-    sobre la Inference API de Hugging Face.
+    if not callable(function):
+        # Caso típico: objetos con atributo .func o .fn que es la función real
+        if hasattr(function, "func") and callable(function.func):
+            function = function.func
+        elif hasattr(function, "fn") and callable(function.fn):
+            function = function.fn
+        elif hasattr(function, "__call__"):
+            function = function.__call__
+    return function
+
+
+class AsyncQwenAgent:
     """
+    Agente conversacional asíncrono usando Qwen2.5-72B-Instruct con tool
+    calling, sobre la Inference API de Hugging Face o un servidor
+    compatible con OpenAI (ver llm_backends.py).
 
-    def __init__(self):
-        self.client = InferenceClient(
-            model=MODEL_NAME,
-            token=HF_TOKEN
-        )
+    Las llamadas al modelo y a las herramientas se esperan con `await`,
+    de modo que un único event loop puede atender muchas conversaciones
+    a la vez. Las herramientas pueden ser corutinas (se esperan
+    directamente) o funciones síncronas (se ejecutan en un hilo).
+
+    Las herramientas registradas con `por_usuario=True` reciben siempre
+    el argumento `usuario` del agente; el modelo no lo ve ni lo elige.
+
+    Con un `tool_selector`, en cada turno solo se envían al modelo las
+    herramientas relevantes para el mensaje del usuario. Con un
+    `prefetcher`, la herramienta de lectura más probable se ejecuta en
+    paralelo con la primera llamada al modelo.
+
+    Con `guardar_sesiones` cada mensaje del historial se añade además a
+    una sesión en disco que se puede reanudar después (ver sesiones.py).
+    """
+
+    def __init__(
+        self,
+        client: Optional[LLMBackend] = None,
+        model_timeout: Optional[float] = MODEL_TIMEOUT,
+        tool_timeout: Optional[float] = TOOL_TIMEOUT,
+        usuario: str = USUARIO_ID,
+        tool_selector: Optional[ToolSelector] = None,
+        caller: Optional[ModelCaller] = None,
+        prefetcher: Optional[Prefetcher] = None,
+    ):
+        # Backend configurado en LLM_BACKEND (Hugging Face por defecto)
+        self.client = client or crear_backend()
+        # Reintentos, modelos de reserva y cobertura (ver model_caller.py)
+        self.caller = caller or ModelCaller(self.client, timeout=model_timeout)
+        self.model_timeout = model_timeout
+        self.tool_timeout = tool_timeout
+        self.usuario = usuario
         self.conversation_history: List[Dict] = []
+        # Sesión en disco donde se va guardando el historial (None = no se guarda)
+        self.sesion: Optional[SesionGuardada] = None
+        # Tokens consumidos por este agente (prompt/completion/total)
+        self.tokens: Dict[str, int] = {}
+        # Errores del último turno (modelo, herramientas o límite de
+        # iteraciones); chat() responde igualmente con un texto para el usuario
+        self.errores_turno: List[str] = []
         self.tools_map: Dict[str, Any] = {}
         self.tools_schema: List[Dict] = []
-
-    def register_tool(self, name: str, function: callable, description: str, parameters: Dict):
+        self.tools_por_usuario: set = set()
+        if tool_selector is None and TOOLS_SELECCION_POR_TURNO:
+            tool_selector = ToolSelector()
+        self.tool_selector = tool_selector
+        if prefetcher is None and PREFETCH_TOOLS:
+            prefetcher = Prefetcher()
+        self.prefetcher = prefetcher
+        self._prefijo = PrefijoEstable()
+
+    def register_tool(self, name: str, function: callable, description: str, parameters: Dict,
+                      por_usuario: bool = False):
         """
         Registra una herramienta disponible para el agente.
 
         Args:
             name: Nombre de la herramienta.
-            function: Función ejecutable.
+            function: Función ejecutable (síncrona o corutina).
             description: Descripción de la herramienta.
             parameters: Schema de parámetros en formato JSON Schema.
+            por_usuario: Si es True, la función recibe `usuario=self.usuario`.
         """
         self.tools_map[name] = function
+        if por_usuario:
+            self.tools_por_usuario.add(name)
 
         # Formato compatible con tool calling de Qwen/HF
         self.tools_schema.append({
@@ -43,43 +178,46 @@ class QwenAgent:
             }
         })
 
-    def _build_messages(self, user_message: str = None) -> List[Dict]:
+    def fork(self, usuario: Optional[str] = None) -> "AsyncQwenAgent":
         """
-        Construye la lista de mensajes que se envían al modelo,
-        usando hora actual y manejando cualquier problema de zona horaria.
+        Crea un agente nuevo con historial vacío que comparte cliente,
+        herramientas y timeouts con este. Sirve para atender varias
+        conversaciones sin volver a registrar las herramientas.
         """
-        # Manejo robusto de zona horaria
-        try:
-            ahora = datetime.now(ZoneInfo(TIMEZONE))
-        except Exception:
-            # Si la zona no existe en el sistema, usa hora local sin zona
-            ahora = datetime.now()
-
-        ahora_str = ahora.strftime("%Y-%m-%d %H:%M")
-
-        system_with_date = (
-            SYSTEM_PROMPT
-            + f"\n\nFecha actual: {ahora_str}. "
-            "Cuando el usuario use palabras como 'hoy', 'mañana' o "
-            "'pasado mañana', debes convertirlas SIEMPRE a fechas "
-            "completas en formato 'YYYY-MM-DD HH:MM' usando esta "
-            "fecha como referencia. "
-            "Nunca pongas años anteriores al año actual salvo que "
-            "el usuario lo pida explícitamente."
+        agent = AsyncQwenAgent(
+            client=self.client,
+            model_timeout=self.model_timeout,
+            tool_timeout=self.tool_timeout,
+            usuario=usuario or self.usuario,
+            tool_selector=self.tool_selector,
+            caller=self.caller,
+            prefetcher=self.prefetcher,
         )
+        agent.tools_map = self.tools_map
+        agent.tools_schema = self.tools_schema
+        agent.tools_por_usuario = self.tools_por_usuario
+        return agent
 
-        messages: List[Dict[str, str]] = [
-            {"role": "system", "content": system_with_date}
-        ]
-
-        messages.extend(self.conversation_history)
-
-        if user_message:
-            messages.append({"role": "user", "content": user_message})
+    def _build_messages(self, user_message: str = None, incluir_hora: bool = False) -> List[Dict]:
+        """
+        Construye la lista de mensajes que se envían al modelo. El prompt
+        de sistema es fijo y la fecha actual va en un mensaje final, para
+        que el prefijo se mantenga estable entre peticiones.
+        """
+        return construir_mensajes(self.conversation_history, user_message, incluir_hora)
 
-        return messages
+    def _agregar_mensaje(self, role: str, content: str, resultado_herramienta: bool = False):
+        """Añade un mensaje al historial (y a la sesión guardada, si la hay)."""
+        mensaje = {"role": role, "content": content}
+        self.conversation_history.append(mensaje)
+        if self.sesion is not None:
+            try:
+                self.sesion.agregar(mensaje, resultado_herramienta)
+            except OSError as e:
+                # Sin disco la conversación sigue, solo que no se podrá reanudar
+                print(f"⚠️  No se pudo guardar la sesión: {e}")
 
-    def _execute_tool(self, tool_name: str, tool_args: Dict) -> str:
+    async def _execute_tool(self, tool_name: str, tool_args: Dict) -> str:
         """
         Ejecuta una herramienta y retorna el resultado como string JSON.
         Intenta desenvolver wrappers tipo FunctionTool antes de llamar
@@ -88,112 +226,111 @@ class QwenAgent:
         if tool_name not in self.tools_map:
             error_msg = f"Herramienta '{tool_name}' no encontrada"
             print("❌", error_msg)
+            self.errores_turno.append(error_msg)
             return json.dumps({"error": error_msg}, ensure_ascii=False)
 
-        # Recuperamos el objeto registrado
-        function = self.tools_map[tool_name]
-
-        # Desenvuelto de wrappers (por ejemplo, FunctionTool)
-        # Intentamos quedarnos con una función realmente invocable
-        if not callable(function):
-            # Caso típico: objetos con atributo .func o .fn que es la función real
-            if hasattr(function, "func") and callable(function.func):
-                function = function.func
-            elif hasattr(function, "fn") and callable(function.fn):
-                function = function.fn
-            elif hasattr(function, "__call__"):
-                function = function.__call__
-
-        def make_jsonable(obj):
-            """
-            Convierte cualquier objeto devuelto por la tool en algo que
-            json.dumps pueda manejar: dict, list, str, int, float, bool, None.
-            Maneja tipos como CallToolResult, modelos pydantic, dataclasses, etc.
-            """
-            # Tipos básicos directamente serializables
-            if obj is None or isinstance(obj, (str, int, float, bool)):
-                return obj
-
-            # Listas / tuplas
-            if isinstance(obj, (list, tuple)):
-                return [make_jsonable(x) for x in obj]
-
-            # Diccionarios
-            if isinstance(obj, dict):
-                return {k: make_jsonable(v) for k, v in obj.items()}
-
-            # Objetos con model_dump (pydantic v2)
-            if hasattr(obj, "model_dump") and callable(obj.model_dump):
-                try:
-                    return make_jsonable(obj.model_dump())
-                except Exception:
-                    pass
-
-            # Objetos con dict() (pydantic v1, dataclasses con método dict)
-            if hasattr(obj, "dict") and callable(obj.dict):
-                try:
-                    return make_jsonable(obj.dict())
-                except Exception:
-                    pass
-
-            # Objetos con atributo "content" o "result" (como CallToolResult)
-            if hasattr(obj, "content"):
-                try:
-                    return make_jsonable(obj.content)
-                except Exception:
-                    pass
-
-            if hasattr(obj, "result"):
-                try:
-                    return make_jsonable(obj.result)
-                except Exception:
-                    pass
-
-            # Último recurso: usar __dict__ si existe
-            if hasattr(obj, "__dict__"):
-                try:
-                    return make_jsonable(obj.__dict__)
-                except Exception:
-                    pass
-
-            # Fallback final: representarlo como string
-            return str(obj)
+        function = _unwrap_tool(self.tools_map[tool_name])
+        if tool_name in self.tools_por_usuario:
+            tool_args = {**tool_args, "usuario": self.usuario}
 
         try:
-            result = function(**tool_args)
-            serializable_result = make_jsonable(result)
-            return json.dumps(serializable_result, ensure_ascii=False, indent=2)
+            with tracer.span(f"tool.{tool_name}"):
+                if inspect.iscoroutinefunction(function):
+                    pending = function(**tool_args)
+                else:
+                    pending = asyncio.to_thread(function, **tool_args)
+                result = await asyncio.wait_for(pending, self.tool_timeout)
+            with tracer.span("agente.serializar"):
+                serializable_result = make_jsonable(result)
+                return json.dumps(serializable_result, ensure_ascii=False, indent=2)
+        except asyncio.TimeoutError:
+            error_msg = (
+                f"Tiempo de espera agotado ejecutando {tool_name} "
+                f"({self.tool_timeout:g}s)"
+            )
+            print("❌", error_msg)
+            self.errores_turno.append(error_msg)
+            return json.dumps({"error": error_msg}, ensure_ascii=False)
         except Exception as e:
             error_msg = f"Error ejecutando {tool_name}: {str(e)}"
             print("❌", error_msg)
+            self.errores_turno.append(error_msg)
             return json.dumps({"error": error_msg}, ensure_ascii=False)
 
+    def _tools_para_turno(self, user_message: str) -> List[Dict]:
+        """Herramientas que se envían al modelo durante este turno."""
+        if self.tool_selector is None or not self.tools_schema:
+            return self.tools_schema
+        return seleccionar_tools(self.tool_selector, user_message, self.tools_schema)
 
-    def chat(self, user_message: str, max_turns: int = 10) -> str:
+    async def _call_model(self, messages: List[Dict], tools: Optional[List[Dict]] = None):
+        """
+        Llama al modelo (con reintentos y modelos de reserva) y registra
+        el uso de tokens.
+        """
+        if tools is None:
+            tools = self.tools_schema
+        estables, total = self._prefijo.medir(messages, tools)
+        with tracer.span("agente.modelo", prefijo_estable=estables, prompt_bytes=total) as s:
+            response, modelo = await self.caller.llamar(
+                messages,
+                tools,
+                tool_choice="auto",
+                max_tokens=1000,
+                temperature=0.7
+            )
+            s.set(modelo=modelo)
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                s.set(
+                    prompt_tokens=getattr(usage, "prompt_tokens", None),
+                    completion_tokens=getattr(usage, "completion_tokens", None),
+                )
+                tracer.registrar_tokens(usage)
+                for campo in ("prompt_tokens", "completion_tokens", "total_tokens"):
+                    self.tokens[campo] = self.tokens.get(campo, 0) + (getattr(usage, campo, None) or 0)
+        return response
+
+    async def chat(self, user_message: str, max_turns: int = 10) -> str:
         """
         Procesa un mensaje del usuario con soporte para tool calling.
         Hace varias iteraciones como máximo (max_turns) por si el modelo
         encadena varias llamadas a herramientas.
+
+        Los errores no se lanzan: se responde con un texto de disculpa y
+        quedan en `errores_turno` (vacía si el turno fue bien).
         """
+        tracer.nuevo_turno()
+        self.errores_turno = []
+        with tracer.span("agente.chat"):
+            # La selección se hace una vez por turno: el subconjunto no cambia
+            # entre iteraciones de tool calling
+            tools = self._tools_para_turno(user_message)
+
+            # Herramienta de solo lectura adelantada en paralelo con el modelo
+            prefetch = None
+            if self.prefetcher is not None:
+                prefetch = self.prefetcher.iniciar(user_message, tools, self._execute_tool)
+            try:
+                return await self._chat(user_message, max_turns, tools, prefetch)
+            finally:
+                if prefetch is not None:
+                    prefetch.descartar()
+
+    async def _chat(self, user_message: str, max_turns: int, tools: List[Dict],
+                    prefetch: Optional[Prefetch] = None) -> str:
         # Añadimos el mensaje del usuario al historial
-        self.conversation_history.append({
-            "role": "user",
-            "content": user_message
-        })
+        self._agregar_mensaje("user", user_message)
+
+        incluir_hora = necesita_hora(user_message)
 
         turn = 0
 
         while turn < max_turns:
-            messages = self._build_messages()
+            messages = self._build_messages(incluir_hora=incluir_hora)
 
             try:
-                response = self.client.chat_completion(
-                    messages=messages,
-                    tools=self.tools_schema if self.tools_schema else None,
-                    tool_choice="auto",
-                    max_tokens=1000,
-                    temperature=0.7
-                )
+                response = await self._call_model(messages, tools)
 
                 assistant_message = response.choices[0].message
 
@@ -201,10 +338,7 @@ class QwenAgent:
                 if hasattr(assistant_message, "tool_calls") and assistant_message.tool_calls:
                     # Si el modelo ha generado algo de texto antes de las tool calls, lo guardamos
                     if assistant_message.content:
-                        self.conversation_history.append({
-                            "role": "assistant",
-                            "content": assistant_message.content
-                        })
+                        self._agregar_mensaje("assistant", assistant_message.content)
 
                     # Ejecutamos cada herramienta solicitada
                     for tool_call in assistant_message.tool_calls:
@@ -226,17 +360,22 @@ class QwenAgent:
 
                         print(f"🔧 Ejecutando: {tool_name}({tool_args})")
 
-                        tool_result = self._execute_tool(tool_name, tool_args)
+                        if prefetch is not None and prefetch.coincide(tool_name, tool_args):
+                            tool_result = await prefetch.consumir()
+                        else:
+                            # Una escritura puede dejar obsoleto el resultado adelantado
+                            if prefetch is not None and tool_name not in TOOLS_SOLO_LECTURA:
+                                prefetch.descartar()
+                            tool_result = await self._execute_tool(tool_name, tool_args)
 
                         # En lugar de role "tool", añadimos el resultado como un mensaje de usuario
                         # para que Hugging Face no dé error y el modelo pueda usar la info.
-                        self.conversation_history.append({
-                            "role": "user",
-                            "content": (
-                                f"Resultado de la herramienta '{tool_name}' "
-                                f"con argumentos {tool_args}:\n{tool_result}"
-                            )
-                        })
+                        self._agregar_mensaje(
+                            "user",
+                            f"Resultado de la herramienta '{tool_name}' "
+                            f"con argumentos {tool_args}:\n{tool_result}",
+                            resultado_herramienta=True,
+                        )
 
                     turn += 1
                     # Volvemos al principio del bucle: ahora el modelo verá en el historial
@@ -247,17 +386,17 @@ class QwenAgent:
                 else:
                     final_response = assistant_message.content
 
-                    self.conversation_history.append({
-                        "role": "assistant",
-                        "content": final_response
-                    })
+                    self._agregar_mensaje("assistant", final_response)
 
                     return final_response
 
             except Exception as e:
-                # Cualquier error en la llamada a la API se captura aquí
+                # Cualquier error en la llamada a la API (incluido el timeout) se captura aquí
+                if isinstance(e, asyncio.TimeoutError):
+                    e = "el modelo no respondió a tiempo"
                 error_text = f"Lo siento, hubo un error al procesar tu solicitud: {str(e)}"
                 print("❌ Error en chat():", e)
+                self.errores_turno.append(f"Error del modelo: {e}")
 
                 if turn == 0:
                     return error_text
@@ -265,8 +404,111 @@ class QwenAgent:
                     return "He procesado tu solicitud pero encontré un error al generar la respuesta final."
 
         # Si se llega aquí, se alcanzó el máximo de iteraciones
+        self.errores_turno.append(f"Límite de {max_turns} iteraciones alcanzado")
         return "Se alcanzó el límite de iteraciones internas. Por favor, reformula tu pregunta."
 
     def reset_conversation(self):
-        """Reinicia el historial de conversación."""
+        """Reinicia el historial de conversación (y empieza una sesión nueva si se guardan)."""
         self.conversation_history = []
+        if self.sesion is not None:
+            self.sesion.cerrar()
+            self.sesion = SesionGuardada.nueva(self.usuario, self.sesion.directorio)
+
+    def guardar_sesiones(self, directorio: Path = SESIONES_DIR):
+        """Empieza a guardar la conversación en una sesión nueva."""
+        if self.sesion is not None:
+            self.sesion.cerrar()
+        self.sesion = SesionGuardada.nueva(self.usuario, directorio)
+
+    def reanudar_sesion(self, id_sesion: str,
+                        n_mensajes: int = SESION_REANUDAR_MENSAJES) -> SesionGuardada:
+        """
+        Sustituye el historial por el de una sesión guardada (sus últimos
+        n_mensajes y el resumen del resto) y sigue guardando en ella.
+        """
+        directorio = self.sesion.directorio if self.sesion is not None else SESIONES_DIR
+        sesion = SesionGuardada.abrir(id_sesion, directorio)
+        if sesion.meta.get("usuario") != self.usuario:
+            raise ValueError(f"La sesión {id_sesion} es de otro usuario")
+        self.conversation_history = sesion.contexto(n_mensajes)
+        if self.sesion is not None:
+            self.sesion.cerrar()
+        self.sesion = sesion
+        return sesion
+
+
+class QwenAgent:
+    """
+    Envoltorio síncrono sobre AsyncQwenAgent para la CLI.
+
+    Mantiene su propio event loop durante toda la vida del agente, de
+    forma que el cliente HTTP del modelo y la sesión MCP compartida se
+    reutilizan entre mensajes.
+    """
+
+    def __init__(self, agent: Optional[AsyncQwenAgent] = None):
+        self._loop = asyncio.new_event_loop()
+        self._agent = agent or AsyncQwenAgent()
+
+    @property
+    def client(self):
+        return self._agent.client
+
+    @property
+    def conversation_history(self) -> List[Dict]:
+        return self._agent.conversation_history
+
+    @conversation_history.setter
+    def conversation_history(self, value: List[Dict]):
+        self._agent.conversation_history = value
+
+    @property
+    def tools_map(self) -> Dict[str, Any]:
+        return self._agent.tools_map
+
+    @property
+    def tools_schema(self) -> List[Dict]:
+        return self._agent.tools_schema
+
+    @property
+    def usuario(self) -> str:
+        return self._agent.usuario
+
+    def register_tool(self, name: str, function: callable, description: str, parameters: Dict,
+                      por_usuario: bool = False):
+        """Registra una herramienta (ver AsyncQwenAgent.register_tool)."""
+        self._agent.register_tool(name, function, description, parameters, por_usuario)
+
+    def chat(self, user_message: str, max_turns: int = 10) -> str:
+        """Procesa un mensaje del usuario de forma bloqueante."""
+        return self._loop.run_until_complete(self._agent.chat(user_message, max_turns))
+
+    def reset_conversation(self):
+        """Reinicia el historial de conversación."""
+        self._agent.reset_conversation()
+
+    @property
+    def sesion(self) -> Optional[SesionGuardada]:
+        return self._agent.sesion
+
+    def guardar_sesiones(self, directorio: Path = SESIONES_DIR):
+        """Guarda la conversación en disco (ver AsyncQwenAgent.guardar_sesiones)."""
+        self._agent.guardar_sesiones(directorio)
+
+    def reanudar_sesion(self, id_sesion: str,
+                        n_mensajes: int = SESION_REANUDAR_MENSAJES) -> SesionGuardada:
+        """Reanuda una sesión guardada (ver AsyncQwenAgent.reanudar_sesion)."""
+        return self._agent.reanudar_sesion(id_sesion, n_mensajes)
+
+    def close(self):
+        """Cierra la sesión MCP compartida y el event loop del agente."""
+        if self._loop.is_closed():
+            return
+        if self._agent.sesion is not None:
+            self._agent.sesion.cerrar()
+        from mcp_client_wrapper import close_session
+        self._loop.run_until_complete(close_session())
+        close_client = getattr(self.client, "close", None)
+        if close_client is not None and inspect.iscoroutinefunction(close_client):
+            self._loop.run_until_complete(close_client())
+        self._loop.close()
@@ -0,0 +1,196 @@
+"""
+Modo batch: ejecuta muchos prompts de un fichero JSONL sin interacción.
+
+Cada línea de entrada es un objeto JSON:
+    {"id": "q1", "mensaje": "¿Qué tareas tengo?", "usuario": "alu123"}
+(`id` y `usuario` son opcionales; sin `id` se usa el número de línea).
+
+Las líneas que no son JSON válido se registran como error (con su número
+de línea) y el resto del fichero se sigue procesando.
+
+Cada prompt se atiende en su propia sesión (un agente obtenido con
+fork() del agente base, con historial vacío) y hasta `workers` prompts se
+procesan a la vez. Los resultados se escriben en el JSONL de salida según
+terminan, con la latencia y los tokens de cada uno. Si el proceso se
+interrumpe, al relanzarlo se omiten los ids que ya terminaron bien.
+"""
+
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from config import BATCH_WORKERS
+from utils import percentil
+
+
+def leer_entradas(entrada: Path) -> Iterator[Tuple[str, Dict]]:
+    """
+    (id, item) de cada línea no vacía del fichero de entrada. Si una línea
+    no es un objeto JSON, el item es {"_error": ...} con el motivo.
+    """
+    with open(entrada, "r", encoding="utf-8") as f:
+        for n, linea in enumerate(f, start=1):
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                item = json.loads(linea)
+            except json.JSONDecodeError as e:
+                yield str(n), {"_error": f"Línea {n}: JSON no válido ({e})"}
+                continue
+            if not isinstance(item, dict):
+                yield str(n), {"_error": f"Línea {n}: se esperaba un objeto JSON"}
+                continue
+            yield str(item.get("id", n)), item
+
+
+def ids_completados(salida: Path) -> Set[str]:
+    """Ids que ya tienen un resultado correcto en el fichero de salida."""
+    completados: Set[str] = set()
+    if not salida.exists():
+        return completados
+    with open(salida, "r", encoding="utf-8") as f:
+        for linea in f:
+            try:
+                resultado = json.loads(linea)
+            except json.JSONDecodeError:
+                # Última línea a medio escribir si se cortó el proceso
+                continue
+            if isinstance(resultado, dict) and resultado.get("ok") and "id" in resultado:
+                completados.add(str(resultado["id"]))
+    return completados
+
+
+def _termina_a_medias(salida: Path) -> bool:
+    """True si el fichero no está vacío y su última línea no acaba en salto de línea."""
+    try:
+        with open(salida, "rb") as f:
+            f.seek(0, 2)
+            if f.tell() == 0:
+                return False
+            f.seek(-1, 2)
+            return f.read(1) != b"\n"
+    except OSError:
+        return False
+
+
+async def _procesar(agente_base, id_: str, item: Dict) -> Dict:
+    if "_error" in item:
+        return {"id": id_, "ok": False, "error": item["_error"],
+                "latencia_ms": 0.0, "tokens": {}}
+
+    mensaje = item.get("mensaje") or item.get("prompt") or ""
+    agent = agente_base.fork(item.get("usuario"))
+    resultado = {"id": id_, "usuario": agent.usuario, "mensaje": mensaje}
+
+    inicio = time.perf_counter()
+    try:
+        resultado["respuesta"] = await agent.chat(mensaje)
+        # chat() responde aunque falle el modelo o una herramienta
+        resultado["ok"] = not agent.errores_turno
+        if agent.errores_turno:
+            resultado["error"] = "; ".join(agent.errores_turno)
+    except Exception as e:
+        resultado["ok"] = False
+        resultado["error"] = str(e)
+    resultado["latencia_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+    resultado["tokens"] = dict(agent.tokens)
+    return resultado
+
+
+async def ejecutar_batch(agente_base, entrada: Path, salida: Path,
+                         workers: int = BATCH_WORKERS) -> Dict:
+    """
+    Procesa el fichero de entrada y devuelve un resumen con el número de
+    prompts procesados, omitidos, errores, throughput y latencias.
+    """
+    completados = ids_completados(salida)
+    cola: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+    latencias: List[float] = []
+    resumen = {"procesados": 0, "omitidos": 0, "errores": 0, "tokens": 0}
+
+    with open(salida, "a", encoding="utf-8") as out:
+        if _termina_a_medias(salida):
+            # Se cierra la línea cortada para no pegarle el primer resultado
+            out.write("\n")
+
+        async def worker():
+            while True:
+                trabajo = await cola.get()
+                if trabajo is None:
+                    return
+                resultado = await _procesar(agente_base, *trabajo)
+                out.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+                out.flush()
+
+                resumen["procesados"] += 1
+                resumen["errores"] += not resultado["ok"]
+                resumen["tokens"] += resultado["tokens"].get("total_tokens", 0)
+                latencias.append(resultado["latencia_ms"])
+                estado = "✓" if resultado["ok"] else "❌"
+                print(f"{estado} {resultado['id']} ({resultado['latencia_ms']:.0f} ms)")
+
+        inicio = time.perf_counter()
+        tareas = [asyncio.create_task(worker()) for _ in range(workers)]
+        try:
+            # La entrada se lee a medida que hay hueco en la cola
+            for id_, item in leer_entradas(entrada):
+                if id_ in completados:
+                    resumen["omitidos"] += 1
+                    continue
+                await cola.put((id_, item))
+            for _ in tareas:
+                await cola.put(None)
+            await asyncio.gather(*tareas)
+        finally:
+            for tarea in tareas:
+                tarea.cancel()
+        duracion = time.perf_counter() - inicio
+
+    resumen.update({
+        "segundos": round(duracion, 2),
+        "throughput": round(resumen["procesados"] / duracion, 2) if duracion else 0.0,
+        "p50_ms": percentil(latencias, 50),
+        "p95_ms": percentil(latencias, 95),
+    })
+    return resumen
+
+
+def run(entrada: str, salida: Optional[str] = None, workers: int = BATCH_WORKERS,
+        agente_base=None) -> int:
+    """Ejecuta el modo batch completo y muestra el resumen. Devuelve el código de salida."""
+    entrada = Path(entrada)
+    salida = Path(salida) if salida else entrada.with_name(entrada.stem + ".resultados.jsonl")
+
+    base = agente_base
+    if base is None:
+        # Fuera del event loop: el descubrimiento de herramientas usa
+        # asyncio.run y una petición HTTP bloqueante
+        from agent import AsyncQwenAgent
+        from tool_discovery import registrar_tools_mcp
+
+        base = AsyncQwenAgent()
+        registrar_tools_mcp(base)
+
+    async def _main():
+        from mcp_client_wrapper import close_session
+
+        try:
+            return await ejecutar_batch(base, entrada, salida, workers)
+        finally:
+            await close_session()
+            if agente_base is None:
+                await base.client.close()
+
+    resumen = asyncio.run(_main())
+
+    print(f"\nResultados en: {salida}")
+    print(f"Procesados:   {resumen['procesados']} "
+          f"(omitidos por estar completados: {resumen['omitidos']}, errores: {resumen['errores']})")
+    print(f"Tiempo total: {resumen['segundos']:.1f}s")
+    print(f"Throughput:   {resumen['throughput']:.2f} prompts/s")
+    print(f"Latencia:     p50={resumen['p50_ms']:.0f}ms p95={resumen['p95_ms']:.0f}ms")
+    print(f"Tokens:       {resumen['tokens']}")
+    return 1 if resumen["errores"] else 0
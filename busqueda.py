@@ -0,0 +1,108 @@
+"""
+Búsqueda de texto completo sobre las tareas con un índice invertido.
+
+Cada término (sin tildes, en minúsculas y sin la 's' final del plural)
+apunta a las tareas en las que aparece y cuántas veces, contando el
+título doble que la descripción. Las consultas solo recorren las listas
+de sus términos, así que su coste depende del número de coincidencias y
+no del total de tareas. Las coincidencias se ordenan con BM25.
+"""
+
+import heapq
+import math
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils import sin_tildes
+
+# Palabras vacías del español (sin tildes, como quedan tras normalizar)
+STOPWORDS = frozenset("""
+    a al algo algun alguna algunas alguno algunos ante antes aqui asi aun cada como con
+    contra cual cuales cuando de del desde donde dos e el ella ellas ello ellos en entre
+    era es esa esas ese eso esos esta estas este esto estos fue ha hay la las le les lo
+    los mas me mi mis mucho muy nada ni no nos o os otra otro para pero poco por porque
+    que quien se ser si sin sobre son su sus tambien te tengo ti tu tus u un una unas uno
+    unos y ya yo
+""".split())
+
+# Peso de las apariciones en el título frente a la descripción
+PESO_TITULO = 2
+
+# Parámetros de BM25
+_K1 = 1.2
+_B = 0.75
+
+_PALABRA = re.compile(r"\w+")
+
+
+def terminos(texto: str) -> List[str]:
+    """Términos indexables de un texto: sin tildes, sin palabras vacías ni plurales."""
+    resultado = []
+    for palabra in _PALABRA.findall(sin_tildes(texto or "")):
+        if palabra in STOPWORDS or (len(palabra) < 2 and not palabra.isdigit()):
+            continue
+        if len(palabra) > 3 and palabra.endswith("s"):
+            palabra = palabra[:-1]
+        resultado.append(palabra)
+    return resultado
+
+
+class IndiceInvertido:
+    """Índice término -> {id de tarea: frecuencia ponderada}."""
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._longitudes: Dict[int, int] = {}
+        self._longitud_total = 0
+
+    def __len__(self) -> int:
+        return len(self._longitudes)
+
+    def agregar(self, id_tarea: int, titulo: str, descripcion: str = ""):
+        """Indexa (o vuelve a indexar) una tarea."""
+        if id_tarea in self._longitudes:
+            self.quitar(id_tarea)
+        frecuencias: Dict[str, int] = {}
+        for termino in terminos(titulo):
+            frecuencias[termino] = frecuencias.get(termino, 0) + PESO_TITULO
+        for termino in terminos(descripcion):
+            frecuencias[termino] = frecuencias.get(termino, 0) + 1
+        for termino, frecuencia in frecuencias.items():
+            self._postings.setdefault(termino, {})[id_tarea] = frecuencia
+        longitud = sum(frecuencias.values())
+        self._longitudes[id_tarea] = longitud
+        self._longitud_total += longitud
+
+    def quitar(self, id_tarea: int, terminos_tarea: Optional[Iterable[str]] = None):
+        """
+        Quita una tarea del índice. Con `terminos_tarea` solo se miran esas
+        listas; si no, se recorre el vocabulario.
+        """
+        longitud = self._longitudes.pop(id_tarea, None)
+        if longitud is None:
+            return
+        self._longitud_total -= longitud
+        for termino in (terminos_tarea if terminos_tarea is not None else list(self._postings)):
+            lista = self._postings.get(termino)
+            if lista is not None and lista.pop(id_tarea, None) is not None and not lista:
+                del self._postings[termino]
+
+    def buscar(self, consulta: str, limite: int = 10) -> List[Tuple[int, float]]:
+        """(id, puntuación) de las tareas que contienen algún término, de mejor a peor."""
+        n = len(self._longitudes)
+        if not n:
+            return []
+        media = self._longitud_total / n
+        puntuaciones: Dict[int, float] = {}
+        for termino in set(terminos(consulta)):
+            lista = self._postings.get(termino)
+            if not lista:
+                continue
+            idf = math.log(1 + (n - len(lista) + 0.5) / (len(lista) + 0.5))
+            for id_tarea, frecuencia in lista.items():
+                norma = _K1 * (1 - _B + _B * self._longitudes[id_tarea] / media)
+                puntuaciones[id_tarea] = puntuaciones.get(id_tarea, 0.0) + (
+                    idf * frecuencia * (_K1 + 1) / (frecuencia + norma)
+                )
+        # Empates: primero la tarea más antigua (id menor)
+        return heapq.nlargest(limite, puntuaciones.items(), key=lambda p: (p[1], -p[0]))
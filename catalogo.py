@@ -0,0 +1,170 @@
+"""
+Representación compacta en memoria del catálogo de la universidad.
+
+El catálogo de una universidad entera tiene decenas de miles de filas de
+horario en las que se repiten una y otra vez los mismos nombres de
+asignatura, profesor, aula, día y hora. Como dicts de `json.loads` cada
+fila ocupa un dict con su propia copia de cada cadena. Aquí:
+
+  - cada fila es un `Horario` con `__slots__` (sin dict por instancia);
+  - las cadenas se internan al cargar: cada nombre distinto existe una
+    sola vez en memoria y las filas solo guardan referencias;
+  - el fichero se lee en streaming con ijson si está instalado (nunca
+    está el JSON entero en memoria como dicts); si no, con `json`.
+
+Las herramientas siguen recibiendo los mismos dicts de siempre:
+`Horario.a_dict()` los reconstruye con las mismas claves y en el mismo
+orden que tenían en el fichero.
+"""
+
+import json
+import sys
+from operator import attrgetter
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import ijson
+except ImportError:  # opcional: sin él el fichero se carga con json
+    ijson = None
+
+# Campos de una fila de horario que se guardan como atributos
+CAMPOS_HORARIO = ("asignatura", "dia", "hora_inicio", "hora_fin", "aula", "profesor")
+# Campos de una sesión en la vista de una asignatura
+CAMPOS_SESION = ("dia", "hora_inicio", "hora_fin", "aula", "profesor")
+
+_intern = sys.intern
+# Orden de claves de cada fila (casi siempre el mismo): se comparte la
+# tupla y se recuerda si la fila trae campos fuera de CAMPOS_HORARIO
+_ORDENES: Dict[Tuple[str, ...], Tuple[Tuple[str, ...], bool]] = {}
+_LECTORES: Dict[Tuple[str, ...], attrgetter] = {}
+
+
+def _internar(valor):
+    """Interna las cadenas (también dentro de listas y dicts)."""
+    if isinstance(valor, str):
+        return _intern(valor)
+    if isinstance(valor, list):
+        return [_internar(v) for v in valor]
+    if isinstance(valor, dict):
+        return {_intern(k): _internar(v) for k, v in valor.items()}
+    return valor
+
+
+def _orden(claves: Tuple[str, ...]) -> Tuple[Tuple[str, ...], bool]:
+    orden = _ORDENES.get(claves)
+    if orden is None:
+        orden = _ORDENES.setdefault(claves, (
+            tuple(_intern(k) for k in claves),
+            any(k not in CAMPOS_HORARIO for k in claves),
+        ))
+    return orden
+
+
+class Horario:
+    """Una fila de horario (una clase semanal de una asignatura)."""
+
+    __slots__ = CAMPOS_HORARIO + ("_claves", "_extra")
+
+    def __init__(self, fila: Dict):
+        self._claves, con_extra = _orden(tuple(fila))
+        g = fila.get
+        self.asignatura = _internar(g("asignatura"))
+        self.dia = _internar(g("dia"))
+        self.hora_inicio = _internar(g("hora_inicio"))
+        self.hora_fin = _internar(g("hora_fin"))
+        self.aula = _internar(g("aula"))
+        self.profesor = _internar(g("profesor"))
+        self._extra = None
+        if con_extra:
+            self._extra = _internar({k: v for k, v in fila.items() if k not in CAMPOS_HORARIO})
+
+    def get(self, campo: str, defecto=None):
+        if campo not in self._claves:
+            return defecto
+        return getattr(self, campo) if campo in CAMPOS_HORARIO else self._extra[campo]
+
+    def a_dict(self) -> Dict:
+        """La fila como dict, con las claves y el orden del fichero."""
+        if self._extra is None:
+            lector = _LECTORES.get(self._claves)
+            if lector is None:
+                lector = _LECTORES.setdefault(self._claves, attrgetter(*self._claves))
+            valores = lector(self)
+            if len(self._claves) == 1:
+                valores = (valores,)
+            return dict(zip(self._claves, valores))
+        return {c: getattr(self, c) if c in CAMPOS_HORARIO else self._extra[c]
+                for c in self._claves}
+
+    def sesion(self) -> Dict:
+        """La fila sin el nombre de la asignatura (vista de asignatura)."""
+        return {c: getattr(self, c) for c in CAMPOS_SESION}
+
+
+class Catalogo:
+    """
+    Catálogo cargado: horarios como `Horario` y profesores y aulas como
+    dicts (son pocos) con sus cadenas internadas.
+    """
+
+    __slots__ = ("horarios", "profesores", "aulas")
+
+    def __init__(self, horarios: Optional[List[Horario]] = None,
+                 profesores: Optional[List[Dict]] = None,
+                 aulas: Optional[List[Dict]] = None):
+        self.horarios = horarios or []
+        self.profesores = profesores or []
+        self.aulas = aulas or []
+
+    def agregar(self, seccion: str, elemento: Dict):
+        if seccion == "horarios":
+            self.horarios.append(Horario(elemento))
+        elif seccion in ("profesores", "aulas"):
+            getattr(self, seccion).append(_internar(elemento))
+
+
+def _elementos_ijson(ruta: Path) -> Iterator[Tuple[str, Dict]]:
+    """
+    (sección, elemento) de cada objeto de las listas del catálogo. Cada
+    sección se recorre con su propia pasada por el fichero: ijson.items
+    construye los objetos en C y es más rápido que montarlos a partir de
+    los eventos de una sola pasada.
+    """
+    for seccion in ("horarios", "profesores", "aulas"):
+        with open(ruta, "rb") as f:
+            for elemento in ijson.items(f, f"{seccion}.item", use_float=True):
+                yield seccion, elemento
+
+
+def _elementos_json(raw: bytes) -> Iterator[Tuple[str, Dict]]:
+    datos = json.loads(raw)
+    for seccion in ("horarios", "profesores", "aulas"):
+        elementos = datos.pop(seccion, [])
+        # Se van soltando los dicts según se convierten
+        elementos.reverse()
+        while elementos:
+            yield seccion, elementos.pop()
+
+
+def cargar_catalogo(ruta: Path, streaming: Optional[bool] = None) -> Tuple[Catalogo, int]:
+    """
+    Lee el catálogo de `ruta` y devuelve (catálogo, bytes leídos).
+
+    Args:
+        streaming: Forzar (True) o desactivar (False) la lectura con
+            ijson; por defecto se usa si está instalado.
+    """
+    if streaming is None:
+        streaming = ijson is not None
+    catalogo = Catalogo()
+    if streaming:
+        for seccion, elemento in _elementos_ijson(ruta):
+            catalogo.agregar(seccion, elemento)
+        return catalogo, Path(ruta).stat().st_size
+
+    with open(ruta, "rb") as f:
+        raw = f.read()
+    for seccion, elemento in _elementos_json(raw):
+        catalogo.agregar(seccion, elemento)
+    return catalogo, len(raw)
@@ -0,0 +1,274 @@
+"""
+Servicio HTTP de chat multi-sesión.
+
+Cada sesión tiene su propio historial (un AsyncQwenAgent obtenido con
+fork() del agente base, que comparte cliente y herramientas). Las
+sesiones se guardan en un almacén acotado con expulsión LRU y por
+inactividad, y los turnos de chat pasan por un pool con un número máximo
+de turnos en curso y una cola acotada: si la cola está llena se responde
+429 en lugar de acumular peticiones.
+
+Endpoints:
+  POST   /chat                 {"session_id"?: str, "usuario"?: str, "mensaje": str}
+  DELETE /sesiones/{id}        Borra la sesión y su historial
+  GET    /salud                Estado de sesiones y del pool
+"""
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Callable, Optional
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from agent import AsyncQwenAgent
+from config import (
+    CHAT_SERVER_HOST,
+    CHAT_SERVER_PORT,
+    CHAT_POOL_WORKERS,
+    CHAT_POOL_COLA,
+    CHAT_COLA_TIMEOUT,
+    CHAT_MAX_SESIONES,
+    CHAT_SESION_TTL,
+)
+
+
+class PoolSaturado(Exception):
+    """No hay hueco en el pool ni en la cola de espera."""
+
+
+# ==========================
+# POOL DE TURNOS DE CHAT
+# ==========================
+
+class ChatPool:
+    """
+    Limita los turnos de chat (y por tanto las llamadas al modelo) que
+    se ejecutan a la vez. Como mucho `max_cola` peticiones esperan turno;
+    el resto se rechaza inmediatamente con PoolSaturado.
+
+    La espera del lock de la sesión (un turno a la vez por sesión) también
+    cuenta como cola: comparte el límite `max_cola` y el `cola_timeout`.
+    """
+
+    def __init__(self, workers: int, max_cola: int, cola_timeout: float):
+        self.workers = workers
+        self.max_cola = max_cola
+        self.cola_timeout = cola_timeout
+        self._semaforo = asyncio.Semaphore(workers)
+        self.en_curso = 0
+        self.en_cola = 0
+        self.rechazadas = 0
+
+    @asynccontextmanager
+    async def turno(self, lock: Optional[asyncio.Lock] = None):
+        """Espera turno (y, si se indica, el lock de la sesión) y lo ocupa."""
+        ocupado = self._semaforo.locked() or (lock is not None and lock.locked())
+        if ocupado and self.en_cola >= self.max_cola:
+            self.rechazadas += 1
+            raise PoolSaturado()
+
+        loop = asyncio.get_running_loop()
+        limite = loop.time() + self.cola_timeout
+        self.en_cola += 1
+        try:
+            # Primero la sesión, para no ocupar un hueco del pool mientras
+            # otro turno de la misma sesión sigue en curso
+            if lock is not None:
+                await asyncio.wait_for(lock.acquire(), self.cola_timeout)
+            try:
+                await asyncio.wait_for(self._semaforo.acquire(), max(0.0, limite - loop.time()))
+            except BaseException:
+                if lock is not None:
+                    lock.release()
+                raise
+        except asyncio.TimeoutError:
+            self.rechazadas += 1
+            raise PoolSaturado() from None
+        finally:
+            self.en_cola -= 1
+
+        self.en_curso += 1
+        try:
+            yield
+        finally:
+            self.en_curso -= 1
+            self._semaforo.release()
+            if lock is not None:
+                lock.release()
+
+
+# ==========================
+# ALMACÉN DE SESIONES
+# ==========================
+
+class _Sesion:
+    __slots__ = ("agent", "lock", "ultimo_uso")
+
+    def __init__(self, agent: AsyncQwenAgent):
+        self.agent = agent
+        self.lock = asyncio.Lock()
+        self.ultimo_uso = time.monotonic()
+
+
+class SessionStore:
+    """
+    Sesiones de chat en memoria, acotadas por número (LRU) y por tiempo
+    de inactividad.
+    """
+
+    def __init__(self, crear_agente: Callable[[Optional[str]], AsyncQwenAgent],
+                 max_sesiones: int, ttl: float):
+        self._crear_agente = crear_agente
+        self.max_sesiones = max_sesiones
+        self.ttl = ttl
+        self._sesiones: "OrderedDict[str, _Sesion]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._sesiones)
+
+    def obtener(self, session_id: str, usuario: Optional[str] = None) -> _Sesion:
+        """
+        Devuelve la sesión (creándola si no existe) y la marca como reciente.
+        El usuario solo se tiene en cuenta al crear la sesión.
+        """
+        sesion = self._sesiones.get(session_id)
+        if sesion is None:
+            sesion = _Sesion(self._crear_agente(usuario))
+            self._sesiones[session_id] = sesion
+            self._expulsar_sobrantes(session_id)
+        else:
+            self._sesiones.move_to_end(session_id)
+        sesion.ultimo_uso = time.monotonic()
+        return sesion
+
+    def _expulsar_sobrantes(self, nueva: str):
+        """
+        Expulsa las sesiones menos recientes por encima de `max_sesiones`,
+        saltándose las que tienen un turno en curso (como purgar_inactivas):
+        si todas lo tienen, el almacén se pasa del límite hasta que acaben.
+        """
+        sobran = len(self._sesiones) - self.max_sesiones
+        if sobran <= 0:
+            return
+        expulsables = []
+        # Las más antiguas están al principio
+        for session_id, sesion in self._sesiones.items():
+            if session_id != nueva and not sesion.lock.locked():
+                expulsables.append(session_id)
+                if len(expulsables) == sobran:
+                    break
+        for session_id in expulsables:
+            del self._sesiones[session_id]
+
+    def eliminar(self, session_id: str) -> bool:
+        return self._sesiones.pop(session_id, None) is not None
+
+    def purgar_inactivas(self) -> int:
+        """Expulsa las sesiones sin uso durante más de `ttl` segundos."""
+        limite = time.monotonic() - self.ttl
+        expulsadas = 0
+        # Las más antiguas están al principio: basta con recorrer hasta la primera reciente
+        while self._sesiones:
+            session_id, sesion = next(iter(self._sesiones.items()))
+            if sesion.ultimo_uso > limite or sesion.lock.locked():
+                break
+            del self._sesiones[session_id]
+            expulsadas += 1
+        return expulsadas
+
+
+# ==========================
+# APLICACIÓN HTTP
+# ==========================
+
+def crear_app(
+    agente_base: AsyncQwenAgent,
+    workers: int = CHAT_POOL_WORKERS,
+    max_cola: int = CHAT_POOL_COLA,
+    cola_timeout: float = CHAT_COLA_TIMEOUT,
+    max_sesiones: int = CHAT_MAX_SESIONES,
+    ttl_sesion: float = CHAT_SESION_TTL,
+) -> Starlette:
+    """Crea la aplicación Starlette del servicio de chat."""
+    pool = ChatPool(workers, max_cola, cola_timeout)
+    sesiones = SessionStore(agente_base.fork, max_sesiones, ttl_sesion)
+    ultima_purga = [time.monotonic()]
+
+    def purgar_si_toca():
+        ahora = time.monotonic()
+        if ahora - ultima_purga[0] >= min(60.0, ttl_sesion):
+            ultima_purga[0] = ahora
+            sesiones.purgar_inactivas()
+
+    async def chat(request: Request) -> JSONResponse:
+        try:
+            body = await request.json()
+        except Exception:
+            return JSONResponse({"error": "JSON inválido"}, status_code=400)
+
+        mensaje = (body.get("mensaje") or "").strip() if isinstance(body, dict) else ""
+        if not mensaje:
+            return JSONResponse({"error": "Falta 'mensaje'"}, status_code=400)
+
+        session_id = body.get("session_id") or uuid.uuid4().hex
+        purgar_si_toca()
+        sesion = sesiones.obtener(session_id, body.get("usuario"))
+
+        # Un turno a la vez por sesión; el pool limita los turnos globales y
+        # la espera de ambos pasa por su cola (con su límite y su timeout)
+        try:
+            async with pool.turno(sesion.lock):
+                respuesta = await sesion.agent.chat(mensaje)
+                sesion.ultimo_uso = time.monotonic()
+        except PoolSaturado:
+            return JSONResponse(
+                {"error": "Servidor saturado, inténtalo de nuevo en unos segundos"},
+                status_code=429,
+                headers={"Retry-After": "1"},
+            )
+
+        return JSONResponse({"session_id": session_id, "respuesta": respuesta})
+
+    async def eliminar_sesion(request: Request) -> JSONResponse:
+        session_id = request.path_params["session_id"]
+        if not sesiones.eliminar(session_id):
+            return JSONResponse({"error": "Sesión no encontrada"}, status_code=404)
+        return JSONResponse({"success": True})
+
+    async def salud(request: Request) -> JSONResponse:
+        return JSONResponse({
+            "sesiones": len(sesiones),
+            "en_curso": pool.en_curso,
+            "en_cola": pool.en_cola,
+            "rechazadas": pool.rechazadas,
+            "workers": pool.workers,
+        })
+
+    app = Starlette(routes=[
+        Route("/chat", chat, methods=["POST"]),
+        Route("/sesiones/{session_id}", eliminar_sesion, methods=["DELETE"]),
+        Route("/salud", salud, methods=["GET"]),
+    ])
+    app.state.pool = pool
+    app.state.sesiones = sesiones
+    return app
+
+
+def run(host: str = CHAT_SERVER_HOST, port: int = CHAT_SERVER_PORT,
+        agente_base: Optional[AsyncQwenAgent] = None):
+    """Arranca el servicio de chat con uvicorn."""
+    import uvicorn
+
+    if agente_base is None:
+        from tool_discovery import registrar_tools_mcp
+
+        agente_base = AsyncQwenAgent()
+        registrar_tools_mcp(agente_base)
+
+    uvicorn.run(crear_app(agente_base), host=host, port=port)
@@ -0,0 +1,265 @@
+"""
+Límites de concurrencia por grupo de herramientas del servidor MCP.
+
+Cada grupo (calendario, tareas, catálogo) tiene su propio pool de hilos,
+del tamaño de su límite, donde se ejecuta el trabajo bloqueante de sus
+herramientas (E/S de ficheros, llamadas a la API de Google). Así el event
+loop del servidor nunca se bloquea y una API lenta solo puede ocupar los
+hilos de su grupo: las consultas al catálogo siguen respondiendo aunque
+Google Calendar tarde.
+
+Si un grupo tiene todos sus hilos ocupados, la llamada espera turno como
+mucho el timeout de cola del grupo; después se rechaza con un error en
+lugar de acumular peticiones sin límite.
+
+Además, las llamadas idénticas simultáneas a herramientas de lectura
+(misma herramienta y mismos argumentos, usuario incluido) se unifican: la
+primera se ejecuta y las demás esperan su resultado sin ocupar hilos. Un
+cambio en unos datos (las tareas de un usuario, el catálogo o el
+calendario) solo separa de las lecturas en curso a las que dependen de
+ellos.
+"""
+
+import asyncio
+import inspect
+import json
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from fastmcp.exceptions import ToolError
+
+from config import (
+    TOOLS_LIMITE_CALENDARIO,
+    TOOLS_LIMITE_TAREAS,
+    TOOLS_LIMITE_CATALOGO,
+    TOOLS_COLA_TIMEOUT_CALENDARIO,
+    TOOLS_COLA_TIMEOUT_TAREAS,
+    TOOLS_COLA_TIMEOUT_CATALOGO,
+    TOOLS_UNIFICAR_LECTURAS,
+    USUARIO_POR_DEFECTO,
+)
+from metrics import REGISTRY
+
+GRUPO_ESPERA = REGISTRY.histogram(
+    "mcp_grupo_espera_cola_segundos",
+    "Tiempo que una herramienta espera un hilo libre de su grupo",
+    ("grupo",),
+)
+GRUPO_RECHAZADAS = REGISTRY.counter(
+    "mcp_grupo_rechazadas_total",
+    "Llamadas rechazadas por superar el timeout de cola de su grupo",
+    ("grupo",),
+)
+GRUPO_OCUPADOS = REGISTRY.gauge(
+    "mcp_grupo_hilos_ocupados",
+    "Hilos de cada grupo ejecutando una herramienta",
+    ("grupo",),
+)
+LECTURAS_UNIFICADAS = REGISTRY.counter(
+    "mcp_tool_unificadas_total",
+    "Llamadas que reutilizaron la ejecución en curso de otra idéntica",
+    ("tool",),
+)
+
+
+class GrupoTools:
+    """
+    Pool de hilos y límite de llamadas simultáneas de un grupo.
+
+    Args:
+        nombre: Nombre del grupo (etiqueta de las métricas).
+        limite: Llamadas que se ejecutan a la vez (y tamaño del pool).
+        timeout_cola: Segundos máximos esperando turno antes de rechazar.
+    """
+
+    def __init__(self, nombre: str, limite: int, timeout_cola: float):
+        self.nombre = nombre
+        self.limite = limite
+        self.timeout_cola = timeout_cola
+        self.executor = ThreadPoolExecutor(max_workers=limite,
+                                           thread_name_prefix=f"tools-{nombre}")
+        # Un semáforo por event loop (los de asyncio quedan ligados a su loop)
+        self._semaforos: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._espera = GRUPO_ESPERA.labels(nombre)
+        self._rechazadas = GRUPO_RECHAZADAS.labels(nombre)
+        self._ocupados = GRUPO_OCUPADOS.labels(nombre)
+
+    def _semaforo(self, loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+        semaforo = self._semaforos.get(loop)
+        if semaforo is None:
+            semaforo = asyncio.Semaphore(self.limite)
+            self._semaforos[loop] = semaforo
+        return semaforo
+
+    async def ejecutar(self, func: Callable, *args, **kwargs):
+        """Ejecuta func(*args, **kwargs) en un hilo del grupo cuando haya turno."""
+        loop = asyncio.get_running_loop()
+        semaforo = self._semaforo(loop)
+
+        inicio = time.perf_counter()
+        try:
+            await asyncio.wait_for(semaforo.acquire(), self.timeout_cola)
+        except asyncio.TimeoutError:
+            self._rechazadas.inc()
+            raise ToolError(
+                f"Servidor ocupado: no hubo turno para una herramienta de {self.nombre} "
+                f"en {self.timeout_cola:g}s. Inténtalo de nuevo en unos segundos."
+            ) from None
+        self._espera.observe(time.perf_counter() - inicio)
+
+        def liberar(_futuro):
+            self._ocupados.dec()
+            try:
+                loop.call_soon_threadsafe(semaforo.release)
+            except RuntimeError:
+                # El loop ya se cerró: el semáforo no se volverá a usar
+                pass
+
+        # El turno se libera cuando el hilo termina de verdad, aunque quien
+        # llamó se haya cancelado antes (un hilo no se puede interrumpir)
+        self._ocupados.inc()
+        futuro = self.executor.submit(partial(func, *args, **kwargs))
+        futuro.add_done_callback(liberar)
+        return await asyncio.wrap_future(futuro)
+
+
+GRUPOS: Dict[str, GrupoTools] = {
+    "calendario": GrupoTools("calendario", TOOLS_LIMITE_CALENDARIO, TOOLS_COLA_TIMEOUT_CALENDARIO),
+    "tareas": GrupoTools("tareas", TOOLS_LIMITE_TAREAS, TOOLS_COLA_TIMEOUT_TAREAS),
+    "catalogo": GrupoTools("catalogo", TOOLS_LIMITE_CATALOGO, TOOLS_COLA_TIMEOUT_CATALOGO),
+}
+
+
+def limitar(grupo: str):
+    """
+    Convierte una herramienta síncrona en asíncrona que se ejecuta en el
+    pool de su grupo, respetando su límite y su timeout de cola.
+    """
+    grupo_tools = GRUPOS[grupo]
+
+    def decorador(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await grupo_tools.ejecutar(func, *args, **kwargs)
+
+        return wrapper
+
+    return decorador
+
+
+# ========== UNIFICACIÓN DE LECTURAS IDÉNTICAS ==========
+
+class Unificador:
+    """
+    Ejecuciones en curso de herramientas de lectura, por clave.
+
+    Una llamada cuya clave ya se está ejecutando espera esa ejecución en
+    lugar de lanzar otra. Las claves llevan la generación de los datos de
+    los que depende la herramienta (ver `generaciones`): tras un cambio en
+    ellos (`invalidar`) las llamadas nuevas ya no se unen a las lecturas
+    que empezaron antes, que podrían devolver datos anteriores.
+
+    Las generaciones van por dominio: "tareas" (una por usuario),
+    "catalogo" y "calendario".
+    """
+
+    def __init__(self):
+        # Un diccionario por event loop (las tareas quedan ligadas a su loop)
+        self._en_curso: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, asyncio.Task]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._generaciones: Dict[Tuple[str, Optional[str]], int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _clave_dominio(dominio: str, usuario: Optional[str]) -> Tuple[str, Optional[str]]:
+        # Solo las tareas son de cada usuario
+        return (dominio, (usuario or USUARIO_POR_DEFECTO) if dominio == "tareas" else None)
+
+    def invalidar(self, dominio: str, usuario: Optional[str] = None):
+        """
+        Los datos del dominio (del usuario, en "tareas") han cambiado. Se
+        puede llamar desde cualquier hilo.
+        """
+        clave = self._clave_dominio(dominio, usuario)
+        with self._lock:
+            self._generaciones[clave] = self._generaciones.get(clave, 0) + 1
+
+    def generaciones(self, dominios: Tuple[str, ...], usuario: Optional[str]) -> Tuple[int, ...]:
+        """Generación actual de cada dominio (para las claves de `ejecutar`)."""
+        with self._lock:
+            return tuple(
+                self._generaciones.get(self._clave_dominio(d, usuario), 0) for d in dominios
+            )
+
+    async def ejecutar(self, clave: Hashable, func: Callable, *args, **kwargs):
+        """
+        Devuelve (resultado, unida): el resultado de `await func(*args,
+        **kwargs)`, compartido con las demás llamadas con la misma clave
+        mientras se ejecuta, y si esta llamada se unió a una ejecución
+        que ya estaba en curso.
+        """
+        loop = asyncio.get_running_loop()
+        en_curso = self._en_curso.get(loop)
+        if en_curso is None:
+            en_curso = self._en_curso.setdefault(loop, {})
+
+        tarea = en_curso.get(clave)
+        unida = tarea is not None
+        if not unida:
+            tarea = loop.create_task(func(*args, **kwargs))
+            en_curso[clave] = tarea
+
+            def terminar(t: asyncio.Task):
+                if en_curso.get(clave) is t:
+                    del en_curso[clave]
+                # Evita el aviso de "excepción no recuperada" si todos
+                # los que esperaban se cancelaron
+                if not t.cancelled():
+                    t.exception()
+
+            tarea.add_done_callback(terminar)
+
+        # Cancelar una llamada no cancela la ejecución que comparten las demás
+        return await asyncio.shield(tarea), unida
+
+
+UNIFICADOR = Unificador()
+
+
+def unificar(*dominios: str):
+    """
+    Unifica las llamadas idénticas simultáneas a una herramienta de
+    lectura asíncrona (se aplica sobre @limitar): la clave es el nombre de
+    la herramienta y todos sus argumentos, con los valores por defecto,
+    más la generación de los dominios de datos que lee ("tareas",
+    "catalogo", "calendario"; las tareas, las del argumento `usuario`).
+    """
+    def decorador(func):
+        nombre = func.__name__
+        firma = inspect.signature(func)
+        unificadas = LECTURAS_UNIFICADAS.labels(nombre)
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not TOOLS_UNIFICAR_LECTURAS:
+                return await func(*args, **kwargs)
+            argumentos = firma.bind(*args, **kwargs)
+            argumentos.apply_defaults()
+            generaciones = UNIFICADOR.generaciones(dominios, argumentos.arguments.get("usuario"))
+            clave = (nombre, generaciones,
+                     json.dumps(argumentos.arguments, sort_keys=True, default=str))
+            resultado, unida = await UNIFICADOR.ejecutar(clave, func, *args, **kwargs)
+            if unida:
+                unificadas.inc()
+            return resultado
+
+        return wrapper
+
+    return decorador
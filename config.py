@@ -9,13 +9,35 @@ load_dotenv()
 # ==========================
 
 BASE_DIR = Path(__file__).parent
-DATA_DIR = BASE_DIR / "data"
+# Directorio de datos (se puede cambiar, p. ej. para pruebas de carga con datos temporales)
+DATA_DIR = Path(os.getenv("DATA_DIR", BASE_DIR / "data"))
 TAREAS_FILE = DATA_DIR / "tareas.json"
 UNIVERSIDAD_FILE = DATA_DIR / "universidad.json"
 
+# Tareas de cada usuario (el usuario por defecto sigue usando TAREAS_FILE)
+USUARIOS_DIR = DATA_DIR / "usuarios"
+
+# Ficheros CSV/ICS que las herramientas MCP pueden importar y exportar
+FICHEROS_DIR = DATA_DIR / "ficheros"
+
+# Conversaciones guardadas de la CLI (una por sesión, ver sesiones.py)
+SESIONES_DIR = DATA_DIR / "sesiones"
+
 # Asegurar que existe el directorio de datos
 DATA_DIR.mkdir(exist_ok=True)
 
+# ==========================
+# USUARIOS (MULTI-TENANT)
+# ==========================
+
+USUARIO_POR_DEFECTO = "default"
+
+# Usuario con el que la CLI llama a las herramientas de tareas
+USUARIO_ID = os.getenv("USUARIO_ID", USUARIO_POR_DEFECTO)
+
+# Stores de tareas por usuario que el servidor MCP mantiene abiertos en memoria
+MAX_USUARIOS_EN_CACHE = int(os.getenv("MAX_USUARIOS_EN_CACHE", 256))
+
 # ==========================
 # HUGGING FACE / MODELO
 # ==========================
@@ -23,6 +45,32 @@ DATA_DIR.mkdir(exist_ok=True)
 HF_TOKEN = os.getenv("HF_TOKEN")
 MODEL_NAME = os.getenv("MODEL_NAME", "Qwen/Qwen2.5-72B-Instruct")
 
+# Backend del modelo: "hf" (Inference API) u "openai" (servidor compatible
+# con la API de OpenAI, p. ej. vLLM o llama.cpp server en la red local)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "hf")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "http://localhost:8001/v1")
+LLM_API_KEY = os.getenv("LLM_API_KEY")
+# Conexiones keep-alive del pool HTTP del backend "openai"
+LLM_MAX_CONEXIONES = int(os.getenv("LLM_MAX_CONEXIONES", 20))
+
+# Tiempo máximo (segundos) para cada llamada al modelo y a cada herramienta
+MODEL_TIMEOUT = float(os.getenv("MODEL_TIMEOUT", 60))
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", 30))
+
+# Modelos de reserva, en orden, separados por comas (se prueban si falla MODEL_NAME)
+MODEL_FALLBACKS = [m.strip() for m in os.getenv("MODEL_FALLBACKS", "").split(",") if m.strip()]
+# Plazo total (segundos) de una llamada al modelo, incluidos reintentos y reservas
+MODEL_DEADLINE = float(os.getenv("MODEL_DEADLINE", 90))
+# Reintentos por modelo ante errores transitorios (timeouts, 429, 5xx, red)
+MODEL_REINTENTOS = int(os.getenv("MODEL_REINTENTOS", 2))
+MODEL_BACKOFF_BASE = float(os.getenv("MODEL_BACKOFF_BASE", 0.5))
+MODEL_BACKOFF_MAX = float(os.getenv("MODEL_BACKOFF_MAX", 8))
+# Petición de cobertura: si el modelo tarda más que su p95 se lanza la misma
+# llamada al siguiente modelo de la lista y se usa la primera respuesta
+MODEL_HEDGE = os.getenv("MODEL_HEDGE", "0") == "1"
+# Retraso de la cobertura mientras no hay muestras suficientes para el p95
+MODEL_HEDGE_DELAY = float(os.getenv("MODEL_HEDGE_DELAY", 10))
+
 # ==========================
 # MCP (FASTMCP)
 # ==========================
@@ -31,6 +79,80 @@ MODEL_NAME = os.getenv("MODEL_NAME", "Qwen/Qwen2.5-72B-Instruct")
 MCP_PORT = int(os.getenv("MCP_PORT", 8000))
 MCP_URL = f"http://localhost:{MCP_PORT}/mcp"
 
+# Caché en disco de los schemas de herramientas descubiertos en el servidor
+TOOLS_CACHE_FILE = BASE_DIR / ".cache" / "tools_schema.json"
+
+# Llamadas simultáneas por grupo de herramientas del servidor (cada grupo
+# tiene su propio pool de hilos) y segundos máximos esperando turno
+TOOLS_LIMITE_CALENDARIO = int(os.getenv("TOOLS_LIMITE_CALENDARIO", 4))
+TOOLS_LIMITE_TAREAS = int(os.getenv("TOOLS_LIMITE_TAREAS", 8))
+TOOLS_LIMITE_CATALOGO = int(os.getenv("TOOLS_LIMITE_CATALOGO", 16))
+TOOLS_COLA_TIMEOUT_CALENDARIO = float(os.getenv("TOOLS_COLA_TIMEOUT_CALENDARIO", 10))
+TOOLS_COLA_TIMEOUT_TAREAS = float(os.getenv("TOOLS_COLA_TIMEOUT_TAREAS", 5))
+TOOLS_COLA_TIMEOUT_CATALOGO = float(os.getenv("TOOLS_COLA_TIMEOUT_CATALOGO", 2))
+
+# Las llamadas idénticas simultáneas a herramientas de lectura comparten
+# una sola ejecución (ver concurrencia.unificar)
+TOOLS_UNIFICAR_LECTURAS = os.getenv("TOOLS_UNIFICAR_LECTURAS", "1") == "1"
+
+# Respuestas de herramientas de lectura versionadas (if_version) que el
+# cliente guarda en memoria; 0 desactiva la caché y las consultas condicionales
+MCP_CACHE_VERSIONADA_MAX = int(os.getenv("MCP_CACHE_VERSIONADA_MAX", 256))
+
+# Cada cuántos segundos el servidor MCP mira si universidad.json ha cambiado
+# en disco para recargar el catálogo y avisar a los clientes (0 = no mirar;
+# se sigue comprobando al consultarlo)
+CATALOGO_VIGILAR_SEGUNDOS = float(os.getenv("CATALOGO_VIGILAR_SEGUNDOS", 5))
+
+# Recorta las descripciones de herramientas a una frase para ahorrar tokens
+TOOLS_DESCRIPCIONES_COMPACTAS = os.getenv("TOOLS_DESCRIPCIONES_COMPACTAS", "0") == "1"
+# Enviar al modelo solo las herramientas relevantes para cada mensaje. Ahorra
+# tokens, pero el bloque de herramientas (el principio del prompt) cambia
+# entre turnos y se pierde la caché de prefijos del servidor: por eso no
+# está activado por defecto
+TOOLS_SELECCION_POR_TURNO = os.getenv("TOOLS_SELECCION_POR_TURNO", "0") == "1"
+# Adelantar la herramienta de lectura más probable mientras responde el modelo
+PREFETCH_TOOLS = os.getenv("PREFETCH_TOOLS", "0") == "1"
+
+# ==========================
+# SERVICIO HTTP DE CHAT (MODO SERVIDOR)
+# ==========================
+
+CHAT_SERVER_HOST = os.getenv("CHAT_SERVER_HOST", "127.0.0.1")
+CHAT_SERVER_PORT = int(os.getenv("CHAT_SERVER_PORT", 8080))
+
+# Turnos de chat que se ejecutan a la vez y peticiones que pueden esperar
+CHAT_POOL_WORKERS = int(os.getenv("CHAT_POOL_WORKERS", 8))
+CHAT_POOL_COLA = int(os.getenv("CHAT_POOL_COLA", 32))
+
+# Segundos máximos esperando turno antes de responder 429
+CHAT_COLA_TIMEOUT = float(os.getenv("CHAT_COLA_TIMEOUT", 30))
+
+# Sesiones en memoria como máximo y segundos de inactividad antes de expulsarlas
+CHAT_MAX_SESIONES = int(os.getenv("CHAT_MAX_SESIONES", 1000))
+CHAT_SESION_TTL = float(os.getenv("CHAT_SESION_TTL", 1800))
+
+# ==========================
+# SESIONES GUARDADAS DE LA CLI (/sesiones, /reanudar)
+# ==========================
+
+# Guardar cada conversación de la CLI para poder reanudarla después
+SESIONES_GUARDAR = os.getenv("SESIONES_GUARDAR", "1") == "1"
+# Mensajes recientes que se cargan al reanudar (el resto va en el resumen)
+SESION_REANUDAR_MENSAJES = int(os.getenv("SESION_REANUDAR_MENSAJES", 20))
+# Preguntas (con su respuesta) que se guardan en el resumen de cada sesión
+SESION_RESUMEN_MAX = int(os.getenv("SESION_RESUMEN_MAX", 10))
+# Cada cuántos mensajes se guardan los metadatos de la sesión (también al
+# cerrarla; si el proceso se corta, se reconstruyen del .jsonl al abrirla)
+SESION_META_CADA = int(os.getenv("SESION_META_CADA", 20))
+
+# ==========================
+# MODO BATCH (--batch)
+# ==========================
+
+# Prompts del fichero de entrada que se procesan a la vez
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", 4))
+
 # ==========================
 # SYSTEM PROMPT DEL MODELO
 # ==========================
@@ -80,3 +202,45 @@ GOOGLE_CALENDAR_TOKEN_FILE = BASE_DIR / "credentials" / "google_token.pickle"
 
 # ID de calendario a usar (por defecto el principal)
 GOOGLE_CALENDAR_CALENDAR_ID = "primary"
+
+# Calendarios que se consultan, separados por comas (clases, exámenes,
+# personal...). Los eventos nuevos se crean en el primero
+GOOGLE_CALENDAR_CALENDAR_IDS = [
+    c.strip()
+    for c in os.getenv("GOOGLE_CALENDAR_CALENDAR_IDS", GOOGLE_CALENDAR_CALENDAR_ID).split(",")
+    if c.strip()
+] or [GOOGLE_CALENDAR_CALENDAR_ID]
+
+# Calendarios que se consultan a la vez y segundos máximos de espera por
+# cada uno (si uno tarda más, se responde con los demás)
+GOOGLE_CALENDAR_WORKERS = int(os.getenv("GOOGLE_CALENDAR_WORKERS", 4))
+GOOGLE_CALENDAR_TIMEOUT = float(os.getenv("GOOGLE_CALENDAR_TIMEOUT", 5))
+
+# ==========================
+# AGENDA UNIFICADA (mi_agenda)
+# ==========================
+
+# Segundos que se reutiliza la agenda de un día (los cambios en las tareas,
+# el horario o los eventos creados desde el asistente la invalidan antes)
+AGENDA_CACHE_TTL = float(os.getenv("AGENDA_CACHE_TTL", 300))
+# Días (por usuario) que se guardan en la caché como máximo
+AGENDA_CACHE_MAX_DIAS = int(os.getenv("AGENDA_CACHE_MAX_DIAS", 4096))
+# Días que puede abarcar una consulta
+AGENDA_MAX_DIAS = int(os.getenv("AGENDA_MAX_DIAS", 31))
+# Eventos de Google Calendar que se leen como máximo por consulta (entre
+# todos los calendarios); si hay más, la agenda avisa de que está incompleta
+AGENDA_MAX_EVENTOS = int(os.getenv("AGENDA_MAX_EVENTOS", 2500))
+
+# ==========================
+# TRAZAS (SPANS POR ETAPA)
+# ==========================
+
+# Desactivado por defecto: los spans no miden nada y no tienen coste
+# apreciable. Con 1 se miden las etapas para /stats (y TRACE_FILE)
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "0") == "1"
+
+# Fichero JSONL opcional donde se escribe cada span (vacío = no se escribe)
+TRACE_FILE = Path(os.getenv("TRACE_FILE")) if os.getenv("TRACE_FILE") else None
+
+# Número máximo de muestras que se guardan en memoria por etapa
+TRACE_MAX_MUESTRAS = int(os.getenv("TRACE_MAX_MUESTRAS", 2000))
@@ -1,19 +1,226 @@
-﻿import json
+﻿import bisect
+import hashlib
+import itertools
+import json
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Dict, Optional
-from datetime import datetime
-from config import TAREAS_FILE, UNIVERSIDAD_FILE
-from utils import normalizar_fecha_futura
+from typing import Callable, List, Dict, Optional, Tuple
+from datetime import datetime, date, timedelta
+from config import (
+    TAREAS_FILE,
+    UNIVERSIDAD_FILE,
+    USUARIOS_DIR,
+    USUARIO_POR_DEFECTO,
+    MAX_USUARIOS_EN_CACHE,
+)
+from utils import (
+    normalizar_fecha_futura,
+    normalizador_fechas_futuras,
+    es_fecha_valida,
+    dia_semana,
+    sin_tildes,
+)
+from busqueda import IndiceInvertido, terminos
+from catalogo import Catalogo, Horario, cargar_catalogo
+from import_export import (
+    detectar_formato,
+    leer_entradas,
+    escribir_csv,
+    escribir_tareas_ics,
+    escribir_horarios_ics,
+)
+from tracing import trazar
+from metrics import REGISTRY
+
+# Bytes leídos/escritos en los ficheros JSON
+DATOS_IO_BYTES = REGISTRY.counter(
+    "datos_io_bytes_total",
+    "Bytes leídos y escritos por DataManager en los ficheros JSON",
+    ("operacion", "fichero"),
+)
+
+# Identificadores de usuario que se pueden usar tal cual como nombre de fichero
+_USUARIO_SEGURO = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+# Clave de orden de las tareas con fecha no válida (van al final y nunca vencen)
+_FECHA_SIN_VALIDAR = "9999-12-31"
+
+# Versiones de los datos (stores de tareas y catálogo): crecen con cada
+# escritura y no se repiten entre stores, aunque un usuario salga de la caché
+# y se vuelva a abrir. Empiezan en la hora de arranque en microsegundos para
+# que tampoco se repitan tras reiniciar el servidor: un cliente que guarda
+# una versión de antes del reinicio nunca recibe "sin_cambios" por error
+_VERSIONES = itertools.count(time.time_ns() // 1000)
+
+
+def _firma_fichero(ruta: Path) -> Optional[Tuple[int, int]]:
+    """(mtime en ns, tamaño) de un fichero, o None si no se puede leer."""
+    try:
+        st = ruta.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _entrada_indice(tarea: Dict) -> Tuple[str, int]:
+    """(fecha de vencimiento 'YYYY-MM-DD', id) para el índice de vencimientos"""
+    fecha = tarea.get("fecha_vencimiento") or ""
+    return (fecha if es_fecha_valida(fecha) else _FECHA_SIN_VALIDAR, tarea["id"])
+
+
+# Columnas de los CSV exportados
+COLUMNAS_TAREAS = ("id", "titulo", "descripcion", "fecha_vencimiento", "prioridad",
+                   "completada", "fecha_creacion")
+COLUMNAS_HORARIOS = ("asignatura", "dia", "hora_inicio", "hora_fin", "aula", "profesor")
+
+
+def _clave_tarea(titulo: str, fecha_vencimiento: str) -> Tuple[str, str]:
+    """Clave para detectar tareas duplicadas al importar"""
+    return (" ".join(titulo.casefold().split()), fecha_vencimiento)
+
+
+def _con_vencimiento(tarea: Dict, hoy: date) -> Dict:
+    """Copia de la tarea con los campos `vencida` y `dias_restantes`"""
+    fecha = _entrada_indice(tarea)[0]
+    resultado = dict(tarea)
+    if fecha == _FECHA_SIN_VALIDAR:
+        resultado["vencida"] = False
+        resultado["dias_restantes"] = None
+    else:
+        dias = (date.fromisoformat(fecha) - hoy).days
+        resultado["vencida"] = dias < 0
+        resultado["dias_restantes"] = dias
+    return resultado
+
+
+class TareasStore:
+    """
+    Tareas de un único usuario, cargadas en memoria.
+
+    Las lecturas se sirven desde memoria; cada modificación se escribe
+    inmediatamente en el fichero JSON del usuario.
+
+    Mantiene además un índice ordenado (fecha de vencimiento, id) de las
+    tareas pendientes, de modo que las consultas por rango de fechas
+    cuestan O(log n + k). Quien modifique las tareas debe llamar a
+    `indexar`/`desindexar` con el lock tomado.
+
+    `version` cambia en cada `guardar`, así que sirve para invalidar
+    cualquier dato derivado de las tareas (p. ej. la agenda).
+    
+    El índice de texto de título y descripción (ver busqueda.py) se crea
+    con la primera búsqueda y desde entonces `indexar`/`desindexar` lo
+    mantienen al día.
+    """
+
+    def __init__(self, dm: "DataManager", filepath: Path, usuario: str = USUARIO_POR_DEFECTO):
+        self._dm = dm
+        self.filepath = filepath
+        self.usuario = usuario
+        self.lock = threading.Lock()
+
+        if filepath.exists():
+            self.data = dm._load_json(filepath)
+        else:
+            self.data = {"tareas": [], "next_id": 1}
+            dm._save_json(filepath, self.data)
+
+        self.version = next(_VERSIONES)
+        self._por_id: Dict[int, Dict] = {t["id"]: t for t in self.data["tareas"]}
+        self._indice: List[Tuple[str, int]] = sorted(
+            _entrada_indice(t) for t in self.data["tareas"] if not t["completada"]
+        )
+        self._texto: Optional[IndiceInvertido] = None
+
+    def guardar(self):
+        self._dm._save_json(self.filepath, self.data)
+        self.version = next(_VERSIONES)
+        self._dm._notificar_cambio("tareas", self.usuario)
+
+    def buscar(self, id_tarea: int) -> Optional[Dict]:
+        return self._por_id.get(id_tarea)
+
+    def indexar(self, tarea: Dict):
+        """Añade una tarea nueva (pendiente) al índice"""
+        self._por_id[tarea["id"]] = tarea
+        if not tarea["completada"]:
+            bisect.insort(self._indice, _entrada_indice(tarea))
+        if self._texto is not None:
+            self._texto.agregar(tarea["id"], tarea["titulo"], tarea.get("descripcion") or "")
+
+    def desindexar(self, tarea: Dict, eliminada: bool = False):
+        """Quita la tarea del índice de pendientes (y del mapa por id si se elimina)"""
+        entrada = _entrada_indice(tarea)
+        i = bisect.bisect_left(self._indice, entrada)
+        if i < len(self._indice) and self._indice[i] == entrada:
+            del self._indice[i]
+        if eliminada:
+            self._por_id.pop(tarea["id"], None)
+            if self._texto is not None:
+                self._texto.quitar(tarea["id"], terminos(tarea["titulo"])
+                                   + terminos(tarea.get("descripcion") or ""))
+
+    def pendientes(self, desde: Optional[str] = None, hasta: Optional[str] = None,
+                   limite: Optional[int] = None) -> List[Dict]:
+        """
+        Tareas pendientes con desde <= fecha de vencimiento < hasta, ordenadas
+        por fecha (fechas 'YYYY-MM-DD'; None = sin límite).
+        """
+        i = bisect.bisect_left(self._indice, (desde,)) if desde else 0
+        j = bisect.bisect_left(self._indice, (hasta,)) if hasta else len(self._indice)
+        if limite is not None:
+            j = min(j, i + limite)
+        return [self._por_id[id_tarea] for _, id_tarea in self._indice[i:j]]
+    
+    def buscar_texto(self, consulta: str, limite: int) -> List[Tuple[Dict, float]]:
+        """(tarea, puntuación) de las que mejor coinciden con la consulta"""
+        if self._texto is None:
+            self._texto = IndiceInvertido()
+            for t in self.data["tareas"]:
+                self._texto.agregar(t["id"], t["titulo"], t.get("descripcion") or "")
+        return [(self._por_id[id_tarea], puntuacion)
+                for id_tarea, puntuacion in self._texto.buscar(consulta, limite)]
+
 
 class DataManager:
-    def __init__(self):
+    def __init__(self, max_usuarios: int = MAX_USUARIOS_EN_CACHE):
+        self.max_usuarios = max_usuarios
         self._init_files()
+
+        # Catálogo de la universidad: se carga una vez y lo comparten todos los usuarios
+        # en forma compacta (ver catalogo.py)
+        self._catalogo: Optional[Catalogo] = None
+        self._catalogo_lock = threading.Lock()
+        self._version_catalogo = next(_VERSIONES)
+        # (mtime, tamaño) de universidad.json cuando se leyó (ver comprobar_catalogo)
+        self._firma_catalogo: Optional[Tuple[int, int]] = None
+        # Vistas derivadas que se calculan al cargar el catálogo (ver _indexar_catalogo)
+        self._horarios_por_dia: Dict[int, List[Horario]] = {}
+        self._asignaturas: Dict[str, Dict] = {}
+
+        # Tareas por usuario: caché LRU de stores abiertos
+        self._stores: "OrderedDict[str, TareasStore]" = OrderedDict()
+        # Todos los stores vivos, también los que salieron de la caché pero
+        # algún hilo sigue usando: así nunca hay dos stores (con dos locks)
+        # para el mismo fichero
+        self._stores_vivos: "weakref.WeakValueDictionary[str, TareasStore]" = (
+            weakref.WeakValueDictionary()
+        )
+        self._stores_lock = threading.Lock()
+        # Un lock por usuario mientras se abre su store, para no leer el
+        # fichero a la vez que otro hilo lo crea
+        self._cargas: Dict[str, threading.Lock] = {}
+
+        # Funciones a las que se avisa de cada cambio: oyente(conjunto, usuario)
+        self._oyentes: List[Callable[[str, Optional[str]], None]] = []
     
     def _init_files(self):
         """Inicializa los archivos JSON si no existen"""
-        # Archivo de tareas
-        if not TAREAS_FILE.exists():
-            self._save_json(TAREAS_FILE, {"tareas": [], "next_id": 1})
+        USUARIOS_DIR.mkdir(parents=True, exist_ok=True)
         
         # Archivo de universidad (datos de ejemplo)
         if not UNIVERSIDAD_FILE.exists():
@@ -97,61 +304,263 @@ class DataManager:
                 ]
             })
     
+    @trazar("datos.load_json")
     def _load_json(self, filepath: Path) -> dict:
         """Carga un archivo JSON"""
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        with open(filepath, 'rb') as f:
+            raw = f.read()
+        DATOS_IO_BYTES.labels("lectura", filepath.name).inc(len(raw))
+        return json.loads(raw)
     
+    @trazar("datos.save_json")
     def _save_json(self, filepath: Path, data: dict):
         """Guarda datos en un archivo JSON"""
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        raw = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+        with open(filepath, 'wb') as f:
+            f.write(raw)
+        DATOS_IO_BYTES.labels("escritura", filepath.name).inc(len(raw))
+    
+    # ========== CATÁLOGO Y USUARIOS ==========
+    
+    @trazar("datos.cargar_catalogo")
+    def _cargar_catalogo(self) -> Catalogo:
+        catalogo, leidos = cargar_catalogo(UNIVERSIDAD_FILE)
+        DATOS_IO_BYTES.labels("lectura", UNIVERSIDAD_FILE.name).inc(leidos)
+        return catalogo
+    
+    def _get_catalogo(self) -> Catalogo:
+        """
+        Devuelve el catálogo de la universidad (solo lectura, compartido),
+        volviendo a leerlo si universidad.json ha cambiado en disco.
+        """
+        self.comprobar_catalogo()
+        if self._catalogo is None:
+            with self._catalogo_lock:
+                if self._catalogo is None:
+                    # La firma se toma antes de leer: si el fichero cambia
+                    # mientras tanto, la próxima comprobación lo recarga
+                    firma = _firma_fichero(UNIVERSIDAD_FILE)
+                    catalogo = self._cargar_catalogo()
+                    self._indexar_catalogo(catalogo)
+                    self._catalogo = catalogo
+                    self._firma_catalogo = firma
+        return self._catalogo
+    
+    def comprobar_catalogo(self) -> bool:
+        """
+        Recarga el catálogo (nueva versión y aviso a los oyentes) si
+        universidad.json ha cambiado desde que se leyó. Devuelve si cambió.
+        """
+        firma = _firma_fichero(UNIVERSIDAD_FILE)
+        with self._catalogo_lock:
+            if self._firma_catalogo is None or firma == self._firma_catalogo:
+                return False
+            self._firma_catalogo = firma
+        self.recargar_catalogo()
+        return True
+    
+    def _indexar_catalogo(self, catalogo: Catalogo):
+        """
+        Calcula las vistas derivadas del catálogo:
+          - clases de cada día de la semana (lunes = 0), por hora de inicio;
+          - cada asignatura ya unida con sus sesiones y los registros
+            completos de sus profesores y aulas (clave: nombre sin tildes).
+        Las vistas guardan referencias a las filas, no copias.
+        """
+        por_dia: Dict[int, List[Horario]] = {}
+        for h in sorted(catalogo.horarios, key=lambda h: h.hora_inicio):
+            dia = dia_semana(h.dia)
+            if dia is not None:
+                por_dia.setdefault(dia, []).append(h)
+        
+        profesores = {p["nombre"]: p for p in catalogo.profesores}
+        aulas = {a["codigo"].upper(): a for a in catalogo.aulas}
+        asignaturas: Dict[str, Dict] = {}
+        for h in catalogo.horarios:
+            vista = asignaturas.setdefault(sin_tildes(h.asignatura), {
+                "asignatura": h.asignatura,
+                "sesiones": [],
+                "profesores": [],
+                "aulas": [],
+            })
+            vista["sesiones"].append(h)
+            nombre = h.profesor
+            if nombre and all(p["nombre"] != nombre for p in vista["profesores"]):
+                vista["profesores"].append(profesores.get(nombre, {"nombre": nombre}))
+            codigo = h.aula
+            if codigo and all(a["codigo"] != codigo for a in vista["aulas"]):
+                vista["aulas"].append(aulas.get(codigo.upper(), {"codigo": codigo}))
+        
+        for vista in asignaturas.values():
+            vista["sesiones"].sort(key=lambda s: (dia_semana(s.dia) or 0, s.hora_inicio))
+        
+        self._horarios_por_dia = por_dia
+        self._asignaturas = asignaturas
+    
+    def recargar_catalogo(self):
+        """Descarta el catálogo en memoria para que se vuelva a leer del disco"""
+        with self._catalogo_lock:
+            self._catalogo = None
+            self._version_catalogo = next(_VERSIONES)
+        self._notificar_cambio("catalogo", None)
+    
+    # ========== VERSIONES Y AVISOS DE CAMBIOS ==========
+    
+    def version(self, conjunto: str, usuario: str = USUARIO_POR_DEFECTO) -> int:
+        """
+        Versión actual de un conjunto de datos ("catalogo" o "tareas" del
+        usuario). Solo crece: cambia cada vez que cambian los datos.
+        """
+        if conjunto == "catalogo":
+            self.comprobar_catalogo()
+            return self._version_catalogo
+        if conjunto == "tareas":
+            return self._get_store(usuario).version
+        raise ValueError(f"Conjunto de datos desconocido: {conjunto!r}")
+    
+    def versiones(self, usuario: str = USUARIO_POR_DEFECTO) -> Dict[str, int]:
+        """Versión actual del catálogo y de las tareas del usuario"""
+        return {
+            "catalogo": self.version("catalogo"),
+            "tareas": self.version("tareas", usuario),
+        }
+    
+    def al_cambiar(self, oyente: Callable[[str, Optional[str]], None]):
+        """
+        Registra una función a la que se llama tras cada cambio con
+        (conjunto, usuario); usuario es None para el catálogo. Se llama
+        desde el hilo que hizo el cambio, así que debe ser rápida.
+        """
+        self._oyentes.append(oyente)
+    
+    def _notificar_cambio(self, conjunto: str, usuario: Optional[str]):
+        for oyente in self._oyentes:
+            oyente(conjunto, usuario)
+    
+    def _ruta_tareas(self, usuario: str) -> Path:
+        """Fichero de tareas de un usuario (el usuario por defecto usa TAREAS_FILE)"""
+        if usuario == USUARIO_POR_DEFECTO:
+            return TAREAS_FILE
+        if _USUARIO_SEGURO.match(usuario) and usuario not in (".", ".."):
+            nombre = usuario
+        else:
+            nombre = hashlib.sha256(usuario.encode("utf-8")).hexdigest()[:32]
+        return USUARIOS_DIR / f"{nombre}.json"
+    
+    def _get_store(self, usuario: str) -> TareasStore:
+        """
+        Devuelve el store de tareas del usuario, abriéndolo si no está en caché.
+        
+        Al salir de la caché LRU un store no se descarta mientras algún hilo
+        lo siga usando: se reutiliza esa misma instancia (cada cambio ya está
+        guardado en disco, así que cuando nadie lo usa se puede volver a abrir).
+        """
+        usuario = usuario or USUARIO_POR_DEFECTO
+        with self._stores_lock:
+            store = self._stores.get(usuario) or self._stores_vivos.get(usuario)
+            if store is not None:
+                self._cachear_store(usuario, store)
+                return store
+            carga = self._cargas.setdefault(usuario, threading.Lock())
+        
+        # Se carga fuera del lock global para no bloquear a otros usuarios
+        with carga:
+            with self._stores_lock:
+                store = self._stores.get(usuario) or self._stores_vivos.get(usuario)
+                if store is not None:
+                    self._cachear_store(usuario, store)
+                    return store
+            
+            store = TareasStore(self, self._ruta_tareas(usuario), usuario)
+            
+            with self._stores_lock:
+                self._cachear_store(usuario, store)
+                self._cargas.pop(usuario, None)
+        return store
+    
+    def _cachear_store(self, usuario: str, store: TareasStore):
+        """Pone el store al principio de la caché LRU (con _stores_lock tomado)"""
+        self._stores[usuario] = store
+        self._stores.move_to_end(usuario)
+        self._stores_vivos[usuario] = store
+        while len(self._stores) > self.max_usuarios:
+            self._stores.popitem(last=False)
     
     # ========== HORARIOS ==========
     
+    @trazar("datos.get_horario")
     def get_horario(self, asignatura: str) -> List[Dict]:
         """Obtiene el horario de una asignatura"""
-        data = self._load_json(UNIVERSIDAD_FILE)
+        data = self._get_catalogo()
         asignatura_lower = asignatura.lower()
         
         horarios = [
-            h for h in data["horarios"]
-            if asignatura_lower in h["asignatura"].lower()
+            h.a_dict() for h in data.horarios
+            if asignatura_lower in h.asignatura.lower()
         ]
         
         return horarios
     
+    @trazar("datos.get_todos_horarios")
     def get_todos_horarios(self) -> List[Dict]:
         """Obtiene todos los horarios"""
-        data = self._load_json(UNIVERSIDAD_FILE)
-        return data["horarios"]
+        data = self._get_catalogo()
+        return [h.a_dict() for h in data.horarios]
+    
+    def horarios_del_dia(self, fecha: date) -> List[Dict]:
+        """Clases que se imparten el día de la semana de `fecha`, por hora de inicio"""
+        self._get_catalogo()
+        return [h.a_dict() for h in self._horarios_por_dia.get(fecha.weekday(), [])]
+    
+    @trazar("datos.get_asignatura")
+    def get_asignatura(self, nombre: str) -> Optional[Dict]:
+        """
+        Vista completa de una asignatura: sesiones, profesores y aulas.
+        Busca primero el nombre exacto y si no, por nombre parcial (sin
+        distinguir mayúsculas ni tildes).
+        """
+        self._get_catalogo()
+        clave = sin_tildes(nombre)
+        vista = self._asignaturas.get(clave)
+        if vista is None:
+            vista = next(
+                (v for nombre_asignatura, v in self._asignaturas.items() if clave in nombre_asignatura),
+                None,
+            )
+        if vista is None:
+            return None
+        
+        return {**vista, "sesiones": [s.sesion() for s in vista["sesiones"]]}
     
     # ========== PROFESORES ==========
     
+    @trazar("datos.get_profesor")
     def get_profesor(self, nombre: str) -> Optional[Dict]:
         """Busca un profesor por nombre"""
-        data = self._load_json(UNIVERSIDAD_FILE)
+        data = self._get_catalogo()
         nombre_lower = nombre.lower()
         
-        for prof in data["profesores"]:
+        for prof in data.profesores:
             if nombre_lower in prof["nombre"].lower():
                 return prof
         
         return None
     
+    @trazar("datos.get_todos_profesores")
     def get_todos_profesores(self) -> List[Dict]:
         """Obtiene todos los profesores"""
-        data = self._load_json(UNIVERSIDAD_FILE)
-        return data["profesores"]
+        data = self._get_catalogo()
+        return data.profesores
     
     # ========== AULAS ==========
     
+    @trazar("datos.get_aula")
     def get_aula(self, codigo: str) -> Optional[Dict]:
         """Obtiene información de un aula"""
-        data = self._load_json(UNIVERSIDAD_FILE)
+        data = self._get_catalogo()
         codigo_upper = codigo.upper()
         
-        for aula in data["aulas"]:
+        for aula in data.aulas:
             if codigo_upper == aula["codigo"].upper():
                 return aula
         
@@ -159,63 +568,239 @@ class DataManager:
     
     # ========== TAREAS (CRUD) ==========
     
+    @trazar("datos.crear_tarea")
     def crear_tarea(self, titulo: str, fecha_vencimiento: str, 
-                    descripcion: str = "", prioridad: str = "media") -> Dict:
+                    descripcion: str = "", prioridad: str = "media",
+                    usuario: str = USUARIO_POR_DEFECTO) -> Dict:
         """Crea una nueva tarea"""
-        data = self._load_json(TAREAS_FILE)
+        store = self._get_store(usuario)
         fecha_vencimiento = normalizar_fecha_futura(fecha_vencimiento)
-        nueva_tarea = {
-            "id": data["next_id"],
-            "titulo": titulo,
-            "descripcion": descripcion,
-            "fecha_vencimiento": fecha_vencimiento,
-            "fecha_creacion": datetime.now().strftime("%Y-%m-%d %H:%M"),
-            "completada": False,
-            "prioridad": prioridad
-        }
-        
-        data["tareas"].append(nueva_tarea)
-        data["next_id"] += 1
         
-        self._save_json(TAREAS_FILE, data)
-        
-        return nueva_tarea
+        with store.lock:
+            data = store.data
+            nueva_tarea = {
+                "id": data["next_id"],
+                "titulo": titulo,
+                "descripcion": descripcion,
+                "fecha_vencimiento": fecha_vencimiento,
+                "fecha_creacion": datetime.now().strftime("%Y-%m-%d %H:%M"),
+                "completada": False,
+                "prioridad": prioridad
+            }
+            
+            data["tareas"].append(nueva_tarea)
+            data["next_id"] += 1
+            store.indexar(nueva_tarea)
+            
+            store.guardar()
+            return dict(nueva_tarea)
     
-    def listar_tareas(self, filtro: str = "pendientes") -> List[Dict]:
-        """Lista tareas según filtro"""
-        data = self._load_json(TAREAS_FILE)
-        tareas = data["tareas"]
+    @trazar("datos.listar_tareas")
+    def listar_tareas(self, filtro: str = "pendientes",
+                      usuario: str = USUARIO_POR_DEFECTO) -> List[Dict]:
+        """Lista tareas según filtro (copias: los escritores pueden cambiar las originales)"""
+        store = self._get_store(usuario)
         
-        if filtro == "completadas":
-            return [t for t in tareas if t["completada"]]
-        elif filtro == "pendientes":
-            return [t for t in tareas if not t["completada"]]
-        else:  # "todas"
-            return tareas
+        with store.lock:
+            tareas = store.data["tareas"]
+            if filtro == "completadas":
+                return [dict(t) for t in tareas if t["completada"]]
+            elif filtro == "pendientes":
+                return [dict(t) for t in tareas if not t["completada"]]
+            else:  # "todas"
+                return [dict(t) for t in tareas]
     
-    def completar_tarea(self, id_tarea: int) -> Dict:
+    @trazar("datos.completar_tarea")
+    def completar_tarea(self, id_tarea: int,
+                        usuario: str = USUARIO_POR_DEFECTO) -> Dict:
         """Marca una tarea como completada"""
-        data = self._load_json(TAREAS_FILE)
+        store = self._get_store(usuario)
         
-        for tarea in data["tareas"]:
-            if tarea["id"] == id_tarea:
+        with store.lock:
+            tarea = store.buscar(id_tarea)
+            if tarea is not None:
+                store.desindexar(tarea)
                 tarea["completada"] = True
                 tarea["fecha_completada"] = datetime.now().strftime("%Y-%m-%d %H:%M")
-                self._save_json(TAREAS_FILE, data)
-                return {"success": True, "tarea": tarea}
+                store.guardar()
+                return {"success": True, "tarea": dict(tarea)}
         
         return {"success": False, "error": "Tarea no encontrada"}
     
-    def eliminar_tarea(self, id_tarea: int) -> Dict:
+    @trazar("datos.eliminar_tarea")
+    def eliminar_tarea(self, id_tarea: int,
+                       usuario: str = USUARIO_POR_DEFECTO) -> Dict:
         """Elimina una tarea"""
-        data = self._load_json(TAREAS_FILE)
+        store = self._get_store(usuario)
         
-        tareas_filtradas = [t for t in data["tareas"] if t["id"] != id_tarea]
+        with store.lock:
+            data = store.data
+            tarea = store.buscar(id_tarea)
+            
+            if tarea is None:
+                return {"success": False, "error": "Tarea no encontrada"}
+            
+            data["tareas"] = [t for t in data["tareas"] if t["id"] != id_tarea]
+            store.desindexar(tarea, eliminada=True)
+            store.guardar()
         
-        if len(tareas_filtradas) == len(data["tareas"]):
-            return {"success": False, "error": "Tarea no encontrada"}
+        return {"success": True, "message": f"Tarea {id_tarea} eliminada"}
+    
+    @trazar("datos.buscar_tareas")
+    def buscar_tareas(self, consulta: str, limite: int = 10,
+                      usuario: str = USUARIO_POR_DEFECTO) -> List[Dict]:
+        """
+        Tareas (pendientes o completadas) cuyo título o descripción coincide
+        con la consulta, de más a menos relevante, con su `relevancia`
+        """
+        store = self._get_store(usuario)
         
-        data["tareas"] = tareas_filtradas
-        self._save_json(TAREAS_FILE, data)
+        with store.lock:
+            resultados = store.buscar_texto(consulta, limite)
+            return [{**t, "relevancia": round(puntuacion, 3)} for t, puntuacion in resultados]
+    
+    # ========== TAREAS POR FECHA DE VENCIMIENTO ==========
+    
+    @trazar("datos.proximas_tareas")
+    def proximas_tareas(self, n: int = 5, dias: Optional[int] = None,
+                        usuario: str = USUARIO_POR_DEFECTO) -> List[Dict]:
+        """
+        Próximas n tareas pendientes (desde hoy) ordenadas por fecha de
+        vencimiento, opcionalmente solo las que vencen en los próximos `dias`
+        """
+        hoy = date.today()
+        hasta = (hoy + timedelta(days=dias + 1)).isoformat() if dias is not None else None
+        store = self._get_store(usuario)
         
-        return {"success": True, "message": f"Tarea {id_tarea} eliminada"}
+        with store.lock:
+            tareas = store.pendientes(desde=hoy.isoformat(), hasta=hasta, limite=n)
+            return [_con_vencimiento(t, hoy) for t in tareas]
+    
+    @trazar("datos.tareas_entre")
+    def tareas_entre(self, desde: date, hasta: date,
+                     usuario: str = USUARIO_POR_DEFECTO) -> List[Dict]:
+        """Tareas pendientes que vencen entre desde y hasta (ambos incluidos), por fecha"""
+        store = self._get_store(usuario)
+        
+        with store.lock:
+            tareas = store.pendientes(desde=desde.isoformat(),
+                                      hasta=(hasta + timedelta(days=1)).isoformat())
+            return [dict(t) for t in tareas]
+    
+    @trazar("datos.tareas_vencidas")
+    def tareas_vencidas(self, usuario: str = USUARIO_POR_DEFECTO) -> List[Dict]:
+        """Tareas pendientes cuya fecha de vencimiento ya pasó (la más antigua primero)"""
+        hoy = date.today()
+        store = self._get_store(usuario)
+        
+        with store.lock:
+            tareas = store.pendientes(hasta=hoy.isoformat())
+            return [_con_vencimiento(t, hoy) for t in tareas]
+    
+    # ========== IMPORTACIÓN / EXPORTACIÓN (CSV, ICS) ==========
+    
+    @trazar("datos.importar_tareas")
+    def importar_tareas(self, ruta, formato: Optional[str] = None,
+                        usuario: str = USUARIO_POR_DEFECTO) -> Dict:
+        """
+        Importa tareas de un fichero CSV o ICS leyéndolo en streaming.
+        Las fechas se normalizan como en crear_tarea, se omiten las tareas
+        duplicadas (mismo título y fecha) y se guarda una sola vez al final.
+        
+        Las tareas se añaden al store solo cuando se ha leído el fichero
+        entero: si la lectura falla a medias (UnicodeDecodeError, csv.Error)
+        no se importa ninguna.
+        """
+        ruta = Path(ruta)
+        formato = detectar_formato(ruta, formato)
+        normalizar = normalizador_fechas_futuras()
+        store = self._get_store(usuario)
+        importadas = duplicadas = invalidas = 0
+        errores: List[str] = []
+        nuevas: List[Dict] = []
+        ahora = datetime.now().strftime("%Y-%m-%d %H:%M")
+        
+        with open(ruta, "r", encoding="utf-8-sig", newline="") as f, store.lock:
+            data = store.data
+            vistas = {_clave_tarea(t["titulo"], t["fecha_vencimiento"]) for t in data["tareas"]}
+            
+            for n, entrada in enumerate(leer_entradas(f, formato), start=1):
+                titulo = (entrada.get("titulo") or "").strip()
+                try:
+                    if not titulo:
+                        raise ValueError("falta el título")
+                    fecha = normalizar(entrada["fecha_vencimiento"])
+                except ValueError as e:
+                    invalidas += 1
+                    if len(errores) < 10:
+                        errores.append(f"Entrada {n}: {e}")
+                    continue
+                
+                clave = _clave_tarea(titulo, fecha)
+                if clave in vistas:
+                    duplicadas += 1
+                    continue
+                vistas.add(clave)
+                
+                nuevas.append({
+                    "titulo": titulo,
+                    "descripcion": entrada.get("descripcion") or "",
+                    "fecha_vencimiento": fecha,
+                    "fecha_creacion": ahora,
+                    "completada": False,
+                    "prioridad": entrada["prioridad"]
+                })
+            
+            # Fichero leído entero: se añaden todas a la vez
+            for tarea in nuevas:
+                tarea["id"] = data["next_id"]
+                data["next_id"] += 1
+                data["tareas"].append(tarea)
+                store.indexar(tarea)
+            importadas = len(nuevas)
+            
+            if importadas:
+                store.guardar()
+        
+        return {
+            "success": True,
+            "importadas": importadas,
+            "duplicadas": duplicadas,
+            "invalidas": invalidas,
+            "errores": errores,
+        }
+    
+    @trazar("datos.exportar_tareas")
+    def exportar_tareas(self, ruta, formato: Optional[str] = None, filtro: str = "todas",
+                        usuario: str = USUARIO_POR_DEFECTO) -> Dict:
+        """Exporta las tareas del usuario (según filtro) a CSV o ICS"""
+        ruta = Path(ruta)
+        formato = detectar_formato(ruta, formato)
+        tareas = self.listar_tareas(filtro, usuario=usuario)
+        
+        with open(ruta, "w", encoding="utf-8", newline="") as f:
+            if formato == "csv":
+                escribir_csv(f, tareas, COLUMNAS_TAREAS)
+            else:
+                escribir_tareas_ics(f, tareas)
+        
+        return {"success": True, "exportadas": len(tareas), "ruta": str(ruta)}
+    
+    @trazar("datos.exportar_horarios")
+    def exportar_horarios(self, ruta, formato: Optional[str] = None) -> Dict:
+        """
+        Exporta los horarios del catálogo a CSV o ICS (eventos semanales).
+        Los horarios no se importan: el catálogo es de solo lectura.
+        """
+        ruta = Path(ruta)
+        formato = detectar_formato(ruta, formato)
+        horarios = self._get_catalogo().horarios
+        filas = (h.a_dict() for h in horarios)
+        
+        with open(ruta, "w", encoding="utf-8", newline="") as f:
+            if formato == "csv":
+                escribir_csv(f, filas, COLUMNAS_HORARIOS)
+            else:
+                escribir_horarios_ics(f, filas)
+        
+        return {"success": True, "exportados": len(horarios), "ruta": str(ruta)}
@@ -2,23 +2,86 @@
 
 from __future__ import annotations
 
-from datetime import datetime
-from typing import List, Dict, Optional
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from itertools import islice
+from typing import List, Dict, Optional, Sequence
 
+import contextvars
+import heapq
+import logging
 import os
 import pickle
-
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
+import threading
+import time
 
 from config import (
     GOOGLE_CALENDAR_SCOPES,
     GOOGLE_CALENDAR_CREDENTIALS_FILE,
     GOOGLE_CALENDAR_TOKEN_FILE,
-    GOOGLE_CALENDAR_CALENDAR_ID,
+    GOOGLE_CALENDAR_CALENDAR_IDS,
+    GOOGLE_CALENDAR_WORKERS,
+    GOOGLE_CALENDAR_TIMEOUT,
     TIMEZONE,
 )
+from tracing import trazar
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Llamadas a la API de Google Calendar (por operación y resultado)
+CALENDAR_API_LLAMADAS = REGISTRY.counter(
+    "calendar_api_llamadas_total",
+    "Llamadas a la API de Google Calendar",
+    ("operacion", "resultado"),
+)
+# Calendarios que se dejaron fuera de una consulta por no responder a tiempo
+CALENDAR_TIMEOUTS = REGISTRY.counter(
+    "calendar_timeouts_total",
+    "Consultas a un calendario que superaron GOOGLE_CALENDAR_TIMEOUT",
+    ("calendario",),
+)
+
+
+def _ejecutar(operacion: str, request):
+    """Ejecuta una petición de la API contando éxitos y errores."""
+    try:
+        resultado = request.execute()
+    except Exception:
+        CALENDAR_API_LLAMADAS.labels(operacion, "error").inc()
+        raise
+    CALENDAR_API_LLAMADAS.labels(operacion, "ok").inc()
+    return resultado
+
+
+def _zona_horaria():
+    try:
+        from zoneinfo import ZoneInfo
+        return ZoneInfo(TIMEZONE)
+    except Exception:
+        return timezone.utc
+
+
+_ZONA = _zona_horaria()
+_FIN = datetime.max.replace(tzinfo=timezone.utc)
+
+# Eventos por página al listar (el máximo que admite la API es 2500)
+_TAM_PAGINA = 250
+
+
+def _clave_inicio(evento: Dict) -> datetime:
+    """
+    Inicio de un evento como datetime con zona, para ordenar eventos de
+    calendarios distintos ('YYYY-MM-DDTHH:MM:SS+hh:mm', o 'YYYY-MM-DD' en
+    los de todo el día, que empiezan a medianoche en TIMEZONE).
+    """
+    try:
+        inicio = datetime.fromisoformat(evento.get("start") or "")
+    except ValueError:
+        return _FIN
+    if inicio.tzinfo is None:
+        inicio = inicio.replace(tzinfo=_ZONA)
+    return inicio
 
 
 class GoogleCalendarClient:
@@ -27,15 +90,73 @@ class GoogleCalendarClient:
 
     Encapsula:
     - Autenticación
-    - Listado de eventos
+    - Listado de eventos (de uno o varios calendarios)
     - Creación de eventos
     - Eliminación de eventos
+
+    Con varios calendarios, cada uno se consulta a la vez en un pool de
+    hilos acotado y sus eventos (ya ordenados por la API) se mezclan en
+    una sola lista por orden de inicio. Un calendario que no responde en
+    `timeout` segundos (desde que empieza su petición) se deja fuera de esa
+    consulta. Un hilo no se puede interrumpir, así que mientras su petición
+    siga en curso no se le envía otra: las consultas siguientes lo omiten
+    (y lo cuentan como timeout) en lugar de ocupar más hilos con él.
+
+    Los objetos `service` de googleapiclient no se pueden compartir entre
+    hilos, así que cada hilo crea el suyo con las mismas credenciales.
+
+    Args:
+        service: Servicio de la API ya construido (se comparte entre
+            hilos; p. ej. uno falso en pruebas). Por defecto se autentica
+            con OAuth.
+        calendar_ids: Calendarios que se consultan (por defecto
+            GOOGLE_CALENDAR_CALENDAR_IDS); los eventos se crean en el primero.
+        workers: Calendarios que se consultan a la vez.
+        timeout: Segundos máximos de espera por calendario.
     """
 
-    def __init__(self) -> None:
-        self.service = self._get_service()
+    def __init__(
+        self,
+        service=None,
+        calendar_ids: Optional[Sequence[str]] = None,
+        workers: int = GOOGLE_CALENDAR_WORKERS,
+        timeout: float = GOOGLE_CALENDAR_TIMEOUT,
+    ) -> None:
+        self.calendar_ids = list(calendar_ids or GOOGLE_CALENDAR_CALENDAR_IDS)
+        self.timeout = timeout
+        self._service = service
+        self._creds = self._get_credentials() if service is None else None
+        self._local = threading.local()
+        # Última petición de cada calendario (para no encolar otra si sigue en curso)
+        self._en_curso: Dict[str, Future] = {}
+        self._en_curso_lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        if len(self.calendar_ids) > 1:
+            self._pool = ThreadPoolExecutor(
+                max_workers=max(1, min(workers, len(self.calendar_ids))),
+                thread_name_prefix="calendar",
+            )
+
+    @property
+    def service(self):
+        """Servicio de la API para el hilo actual."""
+        if self._service is not None:
+            return self._service
+        service = getattr(self._local, "service", None)
+        if service is None:
+            # Import diferido: las librerías de Google tardan en cargarse
+            from googleapiclient.discovery import build
+
+            service = build("calendar", "v3", credentials=self._creds)
+            self._local.service = service
+        return service
+
+    def _get_credentials(self):
+        # Import diferido: las librerías de Google tardan en cargarse y solo
+        # hacen falta cuando se usa el calendario por primera vez
+        from google.auth.transport.requests import Request
+        from google_auth_oauthlib.flow import InstalledAppFlow
 
-    def _get_service(self):
         creds = None
 
         # token.pickle / token.json (token ya generado previamente)
@@ -58,10 +179,9 @@ class GoogleCalendarClient:
             with open(GOOGLE_CALENDAR_TOKEN_FILE, "wb") as token:
                 pickle.dump(creds, token)
 
-        service = build("calendar", "v3", credentials=creds)
-        return service
+        return creds
 
-    def _parse_to_iso(self, fecha_hora: str) -> str:
+    def _parse_to_iso(self, fecha_hora: str, ajustar_anio: bool = True) -> str:
         """
         Convierte 'YYYY-MM-DD HH:MM' a ISO 8601 y ajusta el año para que
         la fecha/hora resultante sea como mínimo en el presente o futuro.
@@ -71,8 +191,13 @@ class GoogleCalendarClient:
         - '2024-05-10 09:00' -> '2025-05-10T09:00:00'
         - '2025-01-01 08:00' -> '2026-01-01T08:00:00' (si ya pasó)
         - '2026-03-01 12:00' -> se respeta como está
+
+        Con ajustar_anio=False la fecha se respeta siempre (consultas de
+        días concretos, que pueden ser hoy o pasados).
         """
         dt = datetime.strptime(fecha_hora, "%Y-%m-%d %H:%M")
+        if not ajustar_anio:
+            return dt.isoformat()
         ahora = datetime.now()
 
         # Si el año es menor que el actual, súbelo al año actual
@@ -85,50 +210,144 @@ class GoogleCalendarClient:
 
         return dt.isoformat()
 
+    @trazar("calendar.list_events")
     def list_events(
         self,
         fecha_inicio: str,
         fecha_fin: str,
         max_resultados: int = 10,
+        ajustar_anio: bool = True,
     ) -> List[Dict]:
         """
         Lista eventos entre fecha_inicio y fecha_fin (formato 'YYYY-MM-DD HH:MM').
+
+        Con varios calendarios los eventos llevan además `calendar_id` y
+        se devuelven los `max_resultados` primeros de todos ellos.
+        """
+        time_min = self._parse_to_iso(fecha_inicio, ajustar_anio)
+        time_max = self._parse_to_iso(fecha_fin, ajustar_anio)
+
+        if self._pool is None:
+            return self._listar_calendario(self.calendar_ids[0], time_min, time_max, max_resultados)
+
+        # Cada lista ya viene ordenada por inicio: basta con mezclarlas
+        listas = self._listar_calendarios(time_min, time_max, max_resultados)
+        return list(islice(heapq.merge(*listas, key=_clave_inicio), max_resultados))
+
+    def _listar_calendarios(self, time_min: str, time_max: str,
+                            max_resultados: int) -> List[List[Dict]]:
+        """
+        Eventos de cada calendario, consultados a la vez. Los que fallan o
+        no responden a tiempo se omiten; si fallan todos, se lanza el error.
+
+        El timeout de cada calendario cuenta desde que empieza su petición.
+        Una petición que aún no ha conseguido hilo pasado `timeout` desde la
+        consulta se cancela (todavía se puede) y cuenta como timeout.
         """
-        time_min = self._parse_to_iso(fecha_inicio)
-        time_max = self._parse_to_iso(fecha_fin)
-
-        events_result = (
-            self.service.events()
-            .list(
-                calendarId=GOOGLE_CALENDAR_CALENDAR_ID,
-                timeMin=time_min,
-                timeMax=time_max,
-                maxResults=max_resultados,
-                singleEvents=True,
-                orderBy="startTime",
+        llamada = time.monotonic()
+        inicios: Dict[str, float] = {}
+        futuros: Dict[str, Future] = {}
+        errores = []
+
+        def listar(calendar_id: str) -> List[Dict]:
+            inicios[calendar_id] = time.monotonic()
+            return self._listar_calendario(calendar_id, time_min, time_max, max_resultados)
+
+        for calendar_id in self.calendar_ids:
+            with self._en_curso_lock:
+                anterior = self._en_curso.get(calendar_id)
+                if anterior is None or anterior.done():
+                    futuros[calendar_id] = self._en_curso[calendar_id] = self._pool.submit(
+                        # Copia del contexto para que los spans cuelguen de la consulta
+                        contextvars.copy_context().run, listar, calendar_id,
+                    )
+                    continue
+            # Sigue ocupado con una consulta anterior que no respondió
+            CALENDAR_TIMEOUTS.labels(calendar_id).inc()
+            logger.warning("El calendario %s sigue sin responder a una consulta anterior", calendar_id)
+            errores.append(TimeoutError(
+                f"El calendario {calendar_id} sigue sin responder a una consulta anterior"
+            ))
+
+        listas = []
+        pendientes = set(futuros)
+        while pendientes:
+            ahora = time.monotonic()
+            limites = {c: inicios.get(c, llamada) + self.timeout for c in pendientes}
+            for calendar_id in list(pendientes):
+                futuro = futuros[calendar_id]
+                if futuro.done():
+                    pendientes.discard(calendar_id)
+                    try:
+                        listas.append(futuro.result())
+                    except Exception as e:
+                        logger.warning("Error al consultar el calendario %s: %s", calendar_id, e)
+                        errores.append(e)
+                elif limites[calendar_id] <= ahora:
+                    pendientes.discard(calendar_id)
+                    # Si ya empezó no se puede interrumpir: su resultado se descarta
+                    futuro.cancel()
+                    CALENDAR_TIMEOUTS.labels(calendar_id).inc()
+                    logger.warning("El calendario %s no respondió en %gs", calendar_id, self.timeout)
+                    errores.append(TimeoutError(
+                        f"El calendario {calendar_id} no respondió en {self.timeout:g}s"
+                    ))
+            if pendientes:
+                espera = min(limites[c] for c in pendientes) - ahora
+                wait([futuros[c] for c in pendientes], timeout=max(0.0, espera),
+                     return_when=FIRST_COMPLETED)
+
+        if not listas and errores:
+            raise errores[0]
+        return listas
+
+    @trazar("calendar.list_calendar")
+    def _listar_calendario(self, calendar_id: str, time_min: str, time_max: str,
+                           max_resultados: int) -> List[Dict]:
+        """
+        Eventos de un calendario, ordenados por inicio. La API los devuelve
+        por páginas: se siguen los nextPageToken hasta tener max_resultados.
+        """
+        events = []
+        page_token = None
+        while True:
+            events_result = _ejecutar(
+                "list",
+                self.service.events().list(
+                    calendarId=calendar_id,
+                    timeMin=time_min,
+                    timeMax=time_max,
+                    maxResults=min(_TAM_PAGINA, max_resultados - len(events)),
+                    singleEvents=True,
+                    orderBy="startTime",
+                    pageToken=page_token,
+                ),
             )
-            .execute()
-        )
+            events += events_result.get("items", [])
+            page_token = events_result.get("nextPageToken")
+            if not page_token or len(events) >= max_resultados:
+                break
 
-        events = events_result.get("items", [])
         simplified = []
 
         for e in events:
-            simplified.append(
-                {
-                    "id": e.get("id"),
-                    "summary": e.get("summary"),
-                    "description": e.get("description"),
-                    "location": e.get("location"),
-                    "start": e.get("start", {}).get("dateTime")
-                    or e.get("start", {}).get("date"),
-                    "end": e.get("end", {}).get("dateTime")
-                    or e.get("end", {}).get("date"),
-                }
-            )
+            evento = {
+                "id": e.get("id"),
+                "summary": e.get("summary"),
+                "description": e.get("description"),
+                "location": e.get("location"),
+                "start": e.get("start", {}).get("dateTime")
+                or e.get("start", {}).get("date"),
+                "end": e.get("end", {}).get("dateTime")
+                or e.get("end", {}).get("date"),
+            }
+            if self._pool is not None:
+                evento["calendar_id"] = calendar_id
+            simplified.append(evento)
 
         return simplified
 
+    @trazar("calendar.create_event")
     def create_event(
         self,
         titulo: str,
@@ -138,7 +357,7 @@ class GoogleCalendarClient:
         ubicacion: Optional[str] = None,
     ) -> Dict:
         """
-        Crea un evento en Google Calendar.
+        Crea un evento en Google Calendar (en el primer calendario configurado).
         Las fechas se reciben como 'YYYY-MM-DD HH:MM'.
         """
         start_iso = self._parse_to_iso(fecha_inicio)
@@ -158,10 +377,11 @@ class GoogleCalendarClient:
             },
         }
 
-        event = (
-            self.service.events()
-            .insert(calendarId=GOOGLE_CALENDAR_CALENDAR_ID, body=event_body)
-            .execute()
+        event = _ejecutar(
+            "insert",
+            self.service.events().insert(
+                calendarId=self.calendar_ids[0], body=event_body
+            ),
         )
 
         return {
@@ -170,13 +390,18 @@ class GoogleCalendarClient:
             "summary": event.get("summary"),
         }
 
-    def delete_event(self, event_id: str) -> Dict:
+    @trazar("calendar.delete_event")
+    def delete_event(self, event_id: str, calendar_id: Optional[str] = None) -> Dict:
         """
-        Elimina un evento por su ID de Google Calendar.
+        Elimina un evento por su ID de Google Calendar (por defecto del
+        primer calendario configurado).
         """
-        self.service.events().delete(
-            calendarId=GOOGLE_CALENDAR_CALENDAR_ID,
-            eventId=event_id,
-        ).execute()
+        _ejecutar(
+            "delete",
+            self.service.events().delete(
+                calendarId=calendar_id or self.calendar_ids[0],
+                eventId=event_id,
+            ),
+        )
 
         return {"status": "deleted", "id": event_id}
@@ -0,0 +1,236 @@
+"""
+Lectura y escritura en streaming de tareas y horarios en CSV e ICS.
+
+Los lectores son generadores que recorren el fichero línea a línea (sin
+cargarlo entero) y producen un dict por entrada; los escritores reciben
+un iterable y escriben según avanzan. DataManager los usa para importar
+y exportar (ver DataManager.importar_tareas / exportar_tareas).
+"""
+
+import csv
+import re
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, TextIO
+
+from utils import dia_semana, sin_tildes
+
+FORMATOS = ("csv", "ics")
+
+# Nombres de columna aceptados en los CSV (sin tildes, en minúsculas)
+_COLUMNAS = {
+    "titulo": ("titulo", "title", "summary", "nombre", "tarea", "asunto"),
+    "fecha_vencimiento": ("fecha_vencimiento", "fecha", "vencimiento", "due", "due_date",
+                          "date", "deadline", "entrega"),
+    "descripcion": ("descripcion", "description", "detalles", "notas"),
+    "prioridad": ("prioridad", "priority"),
+}
+
+_PRIORIDADES = {"alta": "alta", "high": "alta", "media": "media", "medium": "media",
+                "normal": "media", "baja": "baja", "low": "baja"}
+
+
+def detectar_formato(ruta: Path, formato: Optional[str] = None) -> str:
+    """Formato indicado o, si no, el de la extensión del fichero."""
+    formato = (formato or ruta.suffix.lstrip(".")).lower()
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato!r} (usa csv o ics)")
+    return formato
+
+
+def _fecha_iso(valor: str) -> str:
+    """'2025-12-15', '15/12/2025', '20251215', '20251215T235900Z' -> '2025-12-15'."""
+    valor = valor.strip()
+    m = re.match(r"^(\d{4})-?(\d{2})-?(\d{2})", valor)
+    if m:
+        return f"{m.group(1)}-{m.group(2)}-{m.group(3)}"
+    m = re.match(r"^(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})", valor)
+    if m:
+        return f"{m.group(3)}-{int(m.group(2)):02d}-{int(m.group(1)):02d}"
+    return valor
+
+
+# ==========================
+# CSV
+# ==========================
+
+def leer_csv(f: TextIO) -> Iterator[Dict]:
+    """Entradas de un CSV con cabecera (columnas en español o inglés)."""
+    muestra = f.read(4096)
+    f.seek(0)
+    try:
+        dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+    except csv.Error:
+        dialecto = csv.excel
+
+    lector = csv.reader(f, dialecto)
+    cabecera = [sin_tildes(c) for c in next(lector, [])]
+    posiciones = {}
+    for campo, alias in _COLUMNAS.items():
+        for i, nombre in enumerate(cabecera):
+            if nombre in alias:
+                posiciones[campo] = i
+                break
+
+    for fila in lector:
+        if not any(fila):
+            continue
+        yield {
+            campo: fila[i].strip() if i < len(fila) else ""
+            for campo, i in posiciones.items()
+        }
+
+
+def escribir_csv(f: TextIO, filas: Iterable[Dict], columnas: Iterable[str]):
+    escritor = csv.DictWriter(f, fieldnames=list(columnas), extrasaction="ignore")
+    escritor.writeheader()
+    for fila in filas:
+        escritor.writerow(fila)
+
+
+# ==========================
+# ICS (iCalendar)
+# ==========================
+
+def _lineas_desplegadas(f: TextIO) -> Iterator[str]:
+    """Líneas lógicas de un ICS (une las líneas plegadas, RFC 5545 §3.1)."""
+    actual = None
+    for linea in f:
+        linea = linea.rstrip("\r\n")
+        if linea[:1] in (" ", "\t") and actual is not None:
+            actual += linea[1:]
+            continue
+        if actual is not None:
+            yield actual
+        actual = linea
+    if actual is not None:
+        yield actual
+
+
+def _desescapar(texto: str) -> str:
+    return re.sub(r"\\([\\;,nN])", lambda m: "\n" if m.group(1) in "nN" else m.group(1), texto)
+
+
+def _escapar(texto: str) -> str:
+    return (texto.replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\n", "\\n"))
+
+
+def _prioridad_ics(valor: str) -> str:
+    try:
+        n = int(valor)
+    except ValueError:
+        return "media"
+    if n == 0:
+        return "media"
+    return "alta" if n <= 4 else "media" if n == 5 else "baja"
+
+
+def leer_ics(f: TextIO) -> Iterator[Dict]:
+    """Entradas de los VEVENT/VTODO de un ICS (fecha: DUE o, si no hay, DTSTART)."""
+    componente = None
+    for linea in _lineas_desplegadas(f):
+        nombre, _, valor = linea.partition(":")
+        propiedad = nombre.split(";", 1)[0].upper()
+
+        if propiedad == "BEGIN" and valor.upper() in ("VEVENT", "VTODO"):
+            componente = {}
+        elif componente is None:
+            continue
+        elif propiedad == "END" and valor.upper() in ("VEVENT", "VTODO"):
+            yield {
+                "titulo": componente.get("SUMMARY", ""),
+                "fecha_vencimiento": componente.get("DUE") or componente.get("DTSTART", ""),
+                "descripcion": componente.get("DESCRIPTION", ""),
+                "prioridad": _prioridad_ics(componente.get("PRIORITY", "0")),
+            }
+            componente = None
+        elif propiedad in ("SUMMARY", "DESCRIPTION"):
+            componente[propiedad] = _desescapar(valor).strip()
+        elif propiedad in ("DUE", "DTSTART", "PRIORITY"):
+            componente[propiedad] = valor.strip()
+
+
+def _plegar(linea: str) -> str:
+    """Pliega una línea ICS a 75 octetos como pide el RFC 5545."""
+    datos = linea.encode("utf-8")
+    if len(datos) <= 75:
+        return linea + "\r\n"
+    partes, limite = [], 75
+    while datos:
+        corte = min(limite, len(datos))
+        # No partir un carácter UTF-8 por la mitad
+        while corte < len(datos) and (datos[corte] & 0xC0) == 0x80:
+            corte -= 1
+        partes.append(datos[:corte].decode("utf-8"))
+        datos = datos[corte:]
+        limite = 74
+    return "\r\n ".join(partes) + "\r\n"
+
+
+def _escribir_ics(f: TextIO, componentes: Iterable[Iterable[str]]):
+    f.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Asistente Universidad//ES\r\n")
+    for lineas in componentes:
+        for linea in lineas:
+            f.write(_plegar(linea))
+    f.write("END:VCALENDAR\r\n")
+
+
+def escribir_tareas_ics(f: TextIO, tareas: Iterable[Dict]):
+    """Cada tarea como un VTODO con DUE de fecha completa."""
+    prioridades = {"alta": 1, "media": 5, "baja": 9}
+
+    def componentes():
+        for t in tareas:
+            yield [
+                "BEGIN:VTODO",
+                f"UID:tarea-{t['id']}@asistente-universidad",
+                f"SUMMARY:{_escapar(t['titulo'])}",
+                f"DUE;VALUE=DATE:{t['fecha_vencimiento'].replace('-', '')}",
+                f"DESCRIPTION:{_escapar(t.get('descripcion') or '')}",
+                f"PRIORITY:{prioridades.get(t.get('prioridad'), 5)}",
+                f"STATUS:{'COMPLETED' if t.get('completada') else 'NEEDS-ACTION'}",
+                "END:VTODO",
+            ]
+
+    _escribir_ics(f, componentes())
+
+
+def escribir_horarios_ics(f: TextIO, horarios: Iterable[Dict], hoy: Optional[date] = None):
+    """Cada clase como un VEVENT semanal a partir de su próximo día lectivo."""
+    hoy = hoy or date.today()
+
+    def componentes():
+        for n, h in enumerate(horarios, start=1):
+            dia = dia_semana(h["dia"])
+            if dia is None:
+                continue
+            fecha = hoy + timedelta(days=(dia - hoy.weekday()) % 7)
+            inicio = h["hora_inicio"].replace(":", "")
+            fin = h["hora_fin"].replace(":", "")
+            yield [
+                "BEGIN:VEVENT",
+                f"UID:horario-{n}-{fecha:%Y%m%d}@asistente-universidad",
+                f"SUMMARY:{_escapar(h['asignatura'])}",
+                f"DTSTART:{fecha:%Y%m%d}T{inicio}00",
+                f"DTEND:{fecha:%Y%m%d}T{fin}00",
+                "RRULE:FREQ=WEEKLY",
+                f"LOCATION:{_escapar(h.get('aula', ''))}",
+                f"DESCRIPTION:{_escapar(h.get('profesor', ''))}",
+                "END:VEVENT",
+            ]
+
+    _escribir_ics(f, componentes())
+
+
+# ==========================
+# API DE ALTO NIVEL
+# ==========================
+
+def leer_entradas(f: TextIO, formato: str) -> Iterator[Dict]:
+    """Entradas (titulo, fecha_vencimiento, descripcion, prioridad) del fichero."""
+    entradas = leer_csv(f) if formato == "csv" else leer_ics(f)
+    for entrada in entradas:
+        entrada["fecha_vencimiento"] = _fecha_iso(entrada.get("fecha_vencimiento", ""))
+        entrada["prioridad"] = _PRIORIDADES.get(sin_tildes(entrada.get("prioridad") or ""), "media")
+        yield entrada
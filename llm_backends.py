@@ -0,0 +1,231 @@
+"""
+Backends de modelo intercambiables.
+
+Todos exponen la interfaz de `chat_completion` que usa el agente (la de
+`huggingface_hub.AsyncInferenceClient`): devuelven un objeto con
+`choices[0].message` (`content`, `tool_calls`) y `usage`, o, con
+`stream=True`, un iterador asíncrono de fragmentos con `choices[0].delta`.
+
+  - HFBackend:           Inference API de Hugging Face.
+  - OpenAICompatBackend: cualquier servidor compatible con la API de
+                         OpenAI (vLLM, llama.cpp server...) a través de un
+                         pool de conexiones HTTP keep-alive compartido.
+
+Se elige con LLM_BACKEND en config.py (ver `crear_backend`).
+"""
+
+import json
+from types import SimpleNamespace
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from config import (
+    HF_TOKEN,
+    MODEL_NAME,
+    MODEL_TIMEOUT,
+    LLM_BACKEND,
+    LLM_BASE_URL,
+    LLM_API_KEY,
+    LLM_MAX_CONEXIONES,
+)
+
+
+class LLMBackend:
+    """Interfaz común de los backends de modelo."""
+
+    async def chat_completion(self, messages: List[Dict], model: Optional[str] = None,
+                              tools: Optional[List[Dict]] = None, stream: bool = False,
+                              **kwargs):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+# ==========================
+# HUGGING FACE
+# ==========================
+
+class HFBackend(LLMBackend):
+    """Inference API de Hugging Face (AsyncInferenceClient)."""
+
+    def __init__(self, model: str = MODEL_NAME, token: Optional[str] = HF_TOKEN):
+        from huggingface_hub import AsyncInferenceClient
+
+        self.client = AsyncInferenceClient(model=model, token=token)
+
+    async def chat_completion(self, messages, model=None, tools=None, stream=False, **kwargs):
+        if model is not None:
+            kwargs["model"] = model
+        return await self.client.chat_completion(
+            messages=messages, tools=tools, stream=stream, **kwargs
+        )
+
+    async def close(self):
+        close = getattr(self.client, "close", None)
+        if close is not None:
+            await close()
+
+
+# ==========================
+# API COMPATIBLE CON OPENAI
+# ==========================
+
+def _a_objeto(valor):
+    """Convierte dicts/listas JSON en SimpleNamespace anidados."""
+    if isinstance(valor, dict):
+        return SimpleNamespace(**{k: _a_objeto(v) for k, v in valor.items()})
+    if isinstance(valor, list):
+        return [_a_objeto(v) for v in valor]
+    return valor
+
+
+def _respuesta(data: Dict):
+    """Respuesta de /chat/completions con los campos que espera el agente."""
+    for choice in data.get("choices", []):
+        message = choice.setdefault("message", {})
+        message.setdefault("content", None)
+        message["tool_calls"] = message.get("tool_calls") or None
+    data.setdefault("usage", None)
+    return _a_objeto(data)
+
+
+class OpenAICompatBackend(LLMBackend):
+    """
+    Servidor compatible con la API de OpenAI.
+
+    Usa un único `httpx.AsyncClient` con conexiones keep-alive, de modo
+    que las llamadas sucesivas (y concurrentes, hasta `max_conexiones`)
+    reutilizan las conexiones TCP abiertas con el servidor.
+
+    Args:
+        base_url: URL base de la API (p. ej. "http://10.0.0.5:8001/v1").
+        api_key: Token opcional (cabecera Authorization: Bearer).
+        model: Modelo por defecto si la llamada no indica otro.
+        timeout: Timeout de cada petición HTTP, en segundos.
+        max_conexiones: Tamaño del pool de conexiones.
+        transport: Transporte httpx alternativo (p. ej. para pruebas).
+    """
+
+    def __init__(
+        self,
+        base_url: str = LLM_BASE_URL,
+        api_key: Optional[str] = LLM_API_KEY,
+        model: str = MODEL_NAME,
+        timeout: Optional[float] = MODEL_TIMEOUT,
+        max_conexiones: int = LLM_MAX_CONEXIONES,
+        transport=None,
+    ):
+        import httpx
+
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.model = model
+        self.http = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_conexiones,
+                max_keepalive_connections=max_conexiones,
+            ),
+            transport=transport,
+        )
+
+    def _payload(self, messages, model, tools, stream, kwargs) -> Dict:
+        payload = {"model": model or self.model, "messages": messages, "stream": stream}
+        if tools:
+            payload["tools"] = tools
+        else:
+            # Sin herramientas algunos servidores rechazan tool_choice
+            kwargs.pop("tool_choice", None)
+        payload.update({k: v for k, v in kwargs.items() if v is not None})
+        return payload
+
+    async def chat_completion(self, messages, model=None, tools=None, stream=False, **kwargs):
+        payload = self._payload(messages, model, tools, stream, kwargs)
+        if stream:
+            return self._stream(payload)
+
+        response = await self.http.post("/chat/completions", json=payload)
+        response.raise_for_status()
+        return _respuesta(response.json())
+
+    async def _stream(self, payload: Dict) -> AsyncIterator:
+        """Fragmentos de una respuesta en streaming (Server-Sent Events)."""
+        async with self.http.stream("POST", "/chat/completions", json=payload) as response:
+            response.raise_for_status()
+            async for linea in response.aiter_lines():
+                if not linea.startswith("data:"):
+                    continue
+                datos = linea[len("data:"):].strip()
+                # Se lee la respuesta hasta el final (sin break) para que la
+                # conexión vuelva al pool en lugar de cerrarse
+                if datos != "[DONE]":
+                    yield _a_objeto(json.loads(datos))
+
+    async def close(self):
+        await self.http.aclose()
+
+
+# ==========================
+# UTILIDADES
+# ==========================
+
+async def acumular_stream(fragmentos: AsyncIterator,
+                          al_recibir_texto: Optional[Callable[[str], None]] = None):
+    """
+    Reconstruye una respuesta completa (como la de `stream=False`) a partir
+    de los fragmentos de un streaming, incluidas las tool calls, que llegan
+    troceadas por índice. `al_recibir_texto` recibe cada trozo de texto.
+    """
+    contenido: List[str] = []
+    tool_calls: Dict[int, Dict] = {}
+    usage = None
+
+    async for fragmento in fragmentos:
+        usage = getattr(fragmento, "usage", None) or usage
+        if not getattr(fragmento, "choices", None):
+            continue
+        delta = fragmento.choices[0].delta
+
+        texto = getattr(delta, "content", None)
+        if texto:
+            contenido.append(texto)
+            if al_recibir_texto is not None:
+                al_recibir_texto(texto)
+
+        for parcial in getattr(delta, "tool_calls", None) or []:
+            indice = getattr(parcial, "index", None)
+            if indice is None:
+                indice = len(tool_calls)
+            call = tool_calls.setdefault(indice, {"id": None, "name": "", "arguments": ""})
+            call["id"] = getattr(parcial, "id", None) or call["id"]
+            funcion = getattr(parcial, "function", None)
+            if funcion is not None:
+                call["name"] += getattr(funcion, "name", None) or ""
+                argumentos = getattr(funcion, "arguments", None) or ""
+                call["arguments"] += argumentos if isinstance(argumentos, str) else json.dumps(argumentos)
+
+    calls = [
+        SimpleNamespace(
+            id=c["id"],
+            type="function",
+            function=SimpleNamespace(name=c["name"], arguments=c["arguments"]),
+        )
+        for _, c in sorted(tool_calls.items())
+    ]
+    message = SimpleNamespace(
+        role="assistant",
+        content="".join(contenido) or None,
+        tool_calls=calls or None,
+    )
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+def crear_backend(nombre: str = LLM_BACKEND) -> LLMBackend:
+    """Crea el backend configurado: "hf" (por defecto) u "openai"."""
+    nombre = (nombre or "hf").lower()
+    if nombre == "hf":
+        return HFBackend()
+    if nombre == "openai":
+        return OpenAICompatBackend()
+    raise ValueError(f"LLM_BACKEND desconocido: {nombre!r} (usa 'hf' u 'openai')")
@@ -5,12 +5,19 @@ Asistente Universitario Personal con Qwen2.5-72B-Instruct + FastMCP (modo servid
 
 from rich.console import Console
 from rich.panel import Panel
-from rich.markdown import Markdown
 from rich import print as rprint  # noqa: F401
+from typing import TYPE_CHECKING, Optional
+import argparse
 import sys
+import threading
 
-from agent import QwenAgent
-from mcp_client_wrapper import call_mcp_tool
+from tracing import tracer
+
+# Las dependencias pesadas (huggingface_hub, fastmcp, rich.markdown) se
+# importan solo cuando se usan por primera vez para que el prompt
+# aparezca cuanto antes.
+if TYPE_CHECKING:
+    from agent import QwenAgent
 
 
 console = Console()
@@ -28,356 +35,287 @@ def print_banner():
     console.print(banner, style="bold cyan")
 
 
-# ==============================
-# WRAPPERS QUE LLAMAN AL MCP SERVER
-# ==============================
-
-def tool_consultar_horario(asignatura: str):
-    return call_mcp_tool("consultar_horario", asignatura=asignatura)
-
-
-def tool_consultar_todos_horarios():
-    return call_mcp_tool("consultar_todos_horarios")
+def print_stats():
+    """
+    Muestra p50/p95 por etapa (con el trazado activado), los tokens
+    consumidos en la sesión y los contadores de prompt y herramientas
+    """
+    stats = tracer.estadisticas()
+    if not tracer.habilitado:
+        console.print("[yellow]Tiempos por etapa desactivados (se activan con TRACE_ENABLED=1).[/yellow]")
+    elif not stats:
+        console.print("[yellow]Todavía no hay datos de tiempos en esta sesión.[/yellow]")
+    else:
+        from rich.table import Table
+
+        table = Table(title="Tiempos por etapa (ms)", border_style="blue")
+        table.add_column("Etapa")
+        table.add_column("N", justify="right")
+        table.add_column("p50", justify="right")
+        table.add_column("p95", justify="right")
+        table.add_column("máx", justify="right")
+        table.add_column("total", justify="right")
+
+        for etapa, s in stats.items():
+            table.add_row(
+                etapa,
+                str(s["n"]),
+                f"{s['p50']:.1f}",
+                f"{s['p95']:.1f}",
+                f"{s['max']:.1f}",
+                f"{s['total']:.1f}",
+            )
+
+        console.print(table)
+
+    tokens = tracer.tokens()
+    if tokens:
+        console.print(
+            f"Tokens: prompt={tokens.get('prompt_tokens', 0)} "
+            f"completion={tokens.get('completion_tokens', 0)} "
+            f"total={tokens.get('total_tokens', 0)}"
+        )
+    contadores = tracer.contadores()
+    ahorrados = contadores.get("tokens_ahorrados_seleccion_tools")
+    if ahorrados:
+        console.print(f"Tokens de herramientas ahorrados (estimados): {ahorrados:.0f}")
+    lanzados = contadores.get("prefetch_lanzados")
+    if lanzados:
+        aciertos = contadores.get("prefetch_aciertos", 0)
+        console.print(
+            f"Prefetch de herramientas: {aciertos:.0f}/{lanzados:.0f} aciertos "
+            f"({100 * aciertos / lanzados:.0f}%), "
+            f"{contadores.get('prefetch_ms_ahorrados', 0):.0f} ms ahorrados"
+        )
+    prompt_bytes = contadores.get("prompt_bytes")
+    if prompt_bytes:
+        estables = contadores.get("prompt_bytes_prefijo_estable", 0)
+        console.print(
+            f"Prefijo del prompt reutilizable: {100 * estables / prompt_bytes:.1f}% "
+            f"({estables:.0f} de {prompt_bytes:.0f} bytes)"
+        )
+    cambios_tools = contadores.get("prompt_tools_cambiadas")
+    if cambios_tools:
+        console.print(
+            f"[bold red]❌ Prefijo no estable: el bloque de herramientas cambió en "
+            f"{cambios_tools:.0f} peticiones (TOOLS_SELECCION_POR_TURNO=1)[/bold red]"
+        )
+    if tracer.fichero:
+        console.print(f"Trazas JSONL en: {tracer.fichero}")
+    console.print()
 
 
-def tool_buscar_profesor(nombre: str):
-    return call_mcp_tool("buscar_profesor", nombre=nombre)
+def print_sesiones(actual: Optional[str] = None):
+    """Muestra las conversaciones guardadas del usuario (la más reciente primero)"""
+    from config import USUARIO_ID
+    from sesiones import listar_sesiones
 
+    sesiones = listar_sesiones(USUARIO_ID)
+    if not sesiones:
+        console.print("[yellow]No hay sesiones guardadas.[/yellow]\n")
+        return
 
-def tool_consultar_aula(codigo_aula: str):
-    return call_mcp_tool("consultar_aula", codigo_aula=codigo_aula)
+    from rich.table import Table
 
+    table = Table(title="Sesiones guardadas", border_style="blue")
+    table.add_column("Id")
+    table.add_column("Última actividad")
+    table.add_column("Mensajes", justify="right")
+    table.add_column("Primera pregunta")
 
-def tool_crear_tarea(
-    titulo: str,
-    fecha_vencimiento: str,
-    descripcion: str = "",
-    prioridad: str = "media",
-):
-    return call_mcp_tool(
-        "crear_tarea",
-        titulo=titulo,
-        fecha_vencimiento=fecha_vencimiento,
-        descripcion=descripcion,
-        prioridad=prioridad,
-    )
+    for meta in sesiones:
+        id_sesion = meta["id"] + (" (actual)" if meta["id"] == actual else "")
+        table.add_row(id_sesion, meta["actualizada"], str(meta["mensajes"]), meta["titulo"])
 
+    console.print(table)
+    console.print("Usa /reanudar <id> para continuar una de ellas.\n")
 
-def tool_listar_tareas(filtro: str = "pendientes"):
-    return call_mcp_tool("listar_tareas", filtro=filtro)
 
+# ==============================
+# MAIN CLI
+# ==============================
 
-def tool_completar_tarea(id_tarea: int):
-    return call_mcp_tool("completar_tarea", id_tarea=id_tarea)
+class AgenteDiferido:
+    """
+    Construye el agente en un hilo en segundo plano, de forma que los
+    imports pesados y la creación del cliente ocurren mientras el usuario
+    escribe su primer mensaje en lugar de retrasar el prompt.
+    """
 
+    def __init__(self):
+        self._agent = None
+        self._error = None
+        self._thread = threading.Thread(target=self._construir, daemon=True)
 
-def tool_eliminar_tarea(id_tarea: int):
-    return call_mcp_tool("eliminar_tarea", id_tarea=id_tarea)
+    def iniciar(self):
+        self._thread.start()
 
+    def _construir(self):
+        try:
+            from agent import QwenAgent
+            from config import SESIONES_GUARDAR
+            from tool_discovery import registrar_tools_mcp
+
+            agent = QwenAgent()
+            registrar_tools_mcp(agent)
+            if SESIONES_GUARDAR:
+                agent.guardar_sesiones()
+            self._agent = agent
+        except Exception as e:
+            self._error = e
 
-def tool_listar_eventos_calendario(
-    fecha_inicio: str,
-    fecha_fin: str,
-    max_resultados: int = 10,
-):
-    return call_mcp_tool(
-        "listar_eventos_calendario",
-        fecha_inicio=fecha_inicio,
-        fecha_fin=fecha_fin,
-        max_resultados=max_resultados,
-    )
+    @property
+    def listo(self) -> bool:
+        return self._agent is not None
 
+    def obtener(self) -> "QwenAgent":
+        """Espera a que el agente esté construido y lo devuelve."""
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._agent
 
-def tool_crear_evento_calendario(
-    titulo: str,
-    fecha_inicio: str,
-    fecha_fin: str,
-    descripcion: str | None = None,
-    ubicacion: str | None = None,
-):
-    return call_mcp_tool(
-        "crear_evento_calendario",
-        titulo=titulo,
-        fecha_inicio=fecha_inicio,
-        fecha_fin=fecha_fin,
-        descripcion=descripcion,
-        ubicacion=ubicacion,
-    )
 
+def print_init_error(e: Exception):
+    console.print(f"[bold red]❌ Error al inicializar:[/bold red] {e}")
+    console.print("\n[yellow]Verifica que:[/yellow]")
+    console.print("  1. Tienes un token válido de Hugging Face en .env")
+    console.print("  2. El token tiene acceso al modelo Qwen2.5-72B-Instruct")
+    console.print("  3. Tienes conexión a internet")
 
-def tool_eliminar_evento_calendario(event_id: str):
-    return call_mcp_tool("eliminar_evento_calendario", event_id=event_id)
 
+def importar_exportar(args) -> int:
+    """Modo --importar / --exportar: opera sobre los ficheros sin abrir el chat."""
+    import csv
 
-# ==============================
-# REGISTRO DE HERRAMIENTAS EN EL AGENTE
-# ==============================
+    from config import USUARIO_ID
+    from data_manager import DataManager
 
-def register_tools(agent: QwenAgent):
-    """Registra todas las herramientas MCP (vía cliente) en el agente"""
-
-    # ----- Consulta de datos universitarios -----
-
-    agent.register_tool(
-        name="consultar_horario",
-        function=tool_consultar_horario,
-        description="Consulta el horario de una asignatura específica",
-        parameters={
-            "type": "object",
-            "properties": {
-                "asignatura": {
-                    "type": "string",
-                    "description": "Nombre de la asignatura"
-                }
-            },
-            "required": ["asignatura"]
-        }
+    dm = DataManager()
+    usuario = args.usuario or USUARIO_ID
+    try:
+        if args.importar:
+            r = dm.importar_tareas(args.importar, args.formato, usuario=usuario)
+            console.print(
+                f"[green]✓ {r['importadas']} tareas importadas[/green] "
+                f"({r['duplicadas']} duplicadas, {r['invalidas']} inválidas)"
+            )
+            for error in r["errores"]:
+                console.print(f"  [yellow]{error}[/yellow]")
+        else:
+            if args.horarios:
+                r = dm.exportar_horarios(args.exportar, args.formato)
+                n = r["exportados"]
+            else:
+                r = dm.exportar_tareas(args.exportar, args.formato, usuario=usuario)
+                n = r["exportadas"]
+            console.print(f"[green]✓ {n} elementos exportados a {r['ruta']}[/green]")
+    except (OSError, ValueError, csv.Error) as e:
+        console.print(f"[bold red]❌ Error:[/bold red] {e}")
+        return 1
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Asistente Universitario Personal")
+    parser.add_argument(
+        "--server",
+        action="store_true",
+        help="Arranca el servicio HTTP de chat multi-sesión en lugar de la CLI",
     )
-
-    agent.register_tool(
-        name="consultar_todos_horarios",
-        function=tool_consultar_todos_horarios,
-        description="Obtiene el horario completo de todas las asignaturas",
-        parameters={"type": "object", "properties": {}}
+    parser.add_argument("--host", default=None, help="Host del servicio HTTP (con --server)")
+    parser.add_argument("--port", type=int, default=None, help="Puerto del servicio HTTP (con --server)")
+    parser.add_argument(
+        "--batch",
+        metavar="INPUT_JSONL",
+        default=None,
+        help="Ejecuta sin interacción los prompts de un fichero JSONL",
     )
-
-    agent.register_tool(
-        name="buscar_profesor",
-        function=tool_buscar_profesor,
-        description="Busca información sobre un profesor",
-        parameters={
-            "type": "object",
-            "properties": {
-                "nombre": {
-                    "type": "string",
-                    "description": "Nombre del profesor a buscar"
-                }
-            },
-            "required": ["nombre"]
-        }
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Con --batch: fichero JSONL de resultados (por defecto <input>.resultados.jsonl)",
     )
-
-    agent.register_tool(
-        name="consultar_aula",
-        function=tool_consultar_aula,
-        description="Obtiene información sobre un aula",
-        parameters={
-            "type": "object",
-            "properties": {
-                "codigo_aula": {
-                    "type": "string",
-                    "description": "Código del aula (ej: A-201)"
-                }
-            },
-            "required": ["codigo_aula"]
-        }
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Con --batch: prompts que se procesan a la vez",
     )
-
-    # ----- Gestión de tareas -----
-
-    agent.register_tool(
-        name="crear_tarea",
-        function=tool_crear_tarea,
-        description="Crea una nueva tarea o recordatorio",
-        parameters={
-            "type": "object",
-            "properties": {
-                "titulo": {
-                    "type": "string",
-                    "description": "Título de la tarea"
-                },
-                "fecha_vencimiento": {
-                    "type": "string",
-                    "description": "Fecha de vencimiento (YYYY-MM-DD)"
-                },
-                "descripcion": {
-                    "type": "string",
-                    "description": "Descripción de la tarea (opcional)"
-                },
-                "prioridad": {
-                    "type": "string",
-                    "enum": ["baja", "media", "alta"],
-                    "description": "Prioridad de la tarea"
-                }
-            },
-            "required": ["titulo", "fecha_vencimiento"]
-        }
+    parser.add_argument(
+        "--importar",
+        metavar="FICHERO",
+        default=None,
+        help="Importa tareas desde un fichero CSV o ICS y termina",
     )
-
-    agent.register_tool(
-        name="listar_tareas",
-        function=tool_listar_tareas,
-        description="Lista las tareas según un filtro",
-        parameters={
-            "type": "object",
-            "properties": {
-                "filtro": {
-                    "type": "string",
-                    "enum": ["todas", "pendientes", "completadas"],
-                    "description": "Filtro para las tareas"
-                }
-            }
-        }
+    parser.add_argument(
+        "--exportar",
+        metavar="FICHERO",
+        default=None,
+        help="Exporta las tareas (o con --horarios, el horario) a CSV o ICS y termina",
     )
-
-    agent.register_tool(
-        name="completar_tarea",
-        function=tool_completar_tarea,
-        description="Marca una tarea como completada",
-        parameters={
-            "type": "object",
-            "properties": {
-                "id_tarea": {
-                    "type": "integer",
-                    "description": "ID de la tarea a completar"
-                }
-            },
-            "required": ["id_tarea"]
-        }
+    parser.add_argument(
+        "--horarios",
+        action="store_true",
+        help="Con --exportar: exporta el horario de clases en lugar de las tareas",
     )
-
-    agent.register_tool(
-        name="eliminar_tarea",
-        function=tool_eliminar_tarea,
-        description="Elimina una tarea",
-        parameters={
-            "type": "object",
-            "properties": {
-                "id_tarea": {
-                    "type": "integer",
-                    "description": "ID de la tarea a eliminar"
-                }
-            },
-            "required": ["id_tarea"]
-        }
+    parser.add_argument(
+        "--formato",
+        choices=("csv", "ics"),
+        default=None,
+        help="Con --importar/--exportar: formato (por defecto, el de la extensión)",
     )
-
-    # ----- Google Calendar -----
-
-    agent.register_tool(
-        name="listar_eventos_calendario",
-        function=tool_listar_eventos_calendario,
-        description=(
-            "Lista eventos del Google Calendar del usuario entre dos fechas y horas. "
-            "Úsalo cuando el usuario quiera saber qué tiene en su calendario "
-            "en un rango de tiempo concreto."
-        ),
-        parameters={
-            "type": "object",
-            "properties": {
-                "fecha_inicio": {
-                    "type": "string",
-                    "description": (
-                        "Fecha y hora de inicio en formato 'YYYY-MM-DD HH:MM'. "
-                        "Ejemplo: '2025-11-28 09:00'"
-                    )
-                },
-                "fecha_fin": {
-                    "type": "string",
-                    "description": (
-                        "Fecha y hora de fin en formato 'YYYY-MM-DD HH:MM'. "
-                        "Ejemplo: '2025-11-28 23:59'"
-                    )
-                },
-                "max_resultados": {
-                    "type": "integer",
-                    "description": "Número máximo de eventos a devolver (por defecto 10)",
-                    "default": 10
-                }
-            },
-            "required": ["fecha_inicio", "fecha_fin"]
-        }
+    parser.add_argument(
+        "--usuario",
+        default=None,
+        help="Con --importar/--exportar: usuario de las tareas (por defecto USUARIO_ID)",
     )
-
-    agent.register_tool(
-        name="crear_evento_calendario",
-        function=tool_crear_evento_calendario,
-        description=(
-            "Crea un nuevo evento en Google Calendar. "
-            "Siempre debes convertir expresiones como 'hoy', 'mañana' o "
-            "'el viernes que viene' a una fecha completa usando la fecha "
-            "actual que se indica en el mensaje de sistema. "
-            "Las fechas deben ir en formato 'YYYY-MM-DD HH:MM'. "
-            "Nunca utilices años anteriores al año actual salvo que el "
-            "usuario lo pida explícitamente."
-        ),
-        parameters={
-            "type": "object",
-            "properties": {
-                "titulo": {
-                    "type": "string",
-                    "description": "Título del evento (ej: 'Examen de IA')"
-                },
-                "fecha_inicio": {
-                    "type": "string",
-                    "description": (
-                        "Fecha y hora de inicio en formato 'YYYY-MM-DD HH:MM'. "
-                        "Ejemplo: '2025-12-15 10:00'"
-                    )
-                },
-                "fecha_fin": {
-                    "type": "string",
-                    "description": (
-                        "Fecha y hora de fin en formato 'YYYY-MM-DD HH:MM'. "
-                        "Ejemplo: '2025-12-15 12:00'"
-                    )
-                },
-                "descripcion": {
-                    "type": "string",
-                    "description": "Descripción del evento (opcional)"
-                },
-                "ubicacion": {
-                    "type": "string",
-                    "description": "Ubicación del evento (opcional, ej: 'Aula A-201')"
-                }
-            },
-            "required": ["titulo", "fecha_inicio", "fecha_fin"]
-        }
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Mide el arranque en frío hasta el primer prompt y desglosa el tiempo de imports",
     )
-
-    agent.register_tool(
-        name="eliminar_evento_calendario",
-        function=tool_eliminar_evento_calendario,
-        description=(
-            "Elimina un evento del Google Calendar por su ID. "
-            "Úsalo cuando el usuario indique claramente qué evento quiere borrar."
-        ),
-        parameters={
-            "type": "object",
-            "properties": {
-                "event_id": {
-                    "type": "string",
-                    "description": (
-                        "ID del evento en Google Calendar. Normalmente se obtiene "
-                        "usando listar_eventos_calendario."
-                    )
-                }
-            },
-            "required": ["event_id"]
-        }
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=None,
+        help="Con --profile-startup: termina con error si el arranque supera este tiempo",
     )
+    # Uso interno de --profile-startup: termina justo antes del primer prompt
+    parser.add_argument("--exit-at-prompt", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
 
 
-# ==============================
-# MAIN CLI
-# ==============================
-
 def main():
-    print_banner()
+    args = parse_args()
 
-    console.print("\n[yellow]⏳ Inicializando agente Qwen2.5-72B...[/yellow]")
+    if args.server:
+        import chat_server
 
-    try:
-        agent = QwenAgent()
-        register_tools(agent)
-        console.print("[green]✓ Agente listo![/green]\n")
-    except Exception as e:
-        console.print(f"[bold red]❌ Error al inicializar:[/bold red] {e}")
-        console.print("\n[yellow]Verifica que:[/yellow]")
-        console.print("  1. Tienes un token válido de Hugging Face en .env")
-        console.print("  2. El token tiene acceso al modelo Qwen2.5-72B-Instruct")
-        console.print("  3. Tienes conexión a internet")
-        sys.exit(1)
+        chat_server.run(
+            host=args.host or chat_server.CHAT_SERVER_HOST,
+            port=args.port or chat_server.CHAT_SERVER_PORT,
+        )
+        return
+
+    if args.batch:
+        import batch_runner
+
+        sys.exit(batch_runner.run(
+            args.batch,
+            args.output,
+            workers=args.workers or batch_runner.BATCH_WORKERS,
+        ))
+
+    if args.importar or args.exportar:
+        sys.exit(importar_exportar(args))
+
+    if args.profile_startup:
+        from startup_profiler import perfilar_arranque
+
+        sys.exit(perfilar_arranque(__file__, budget_ms=args.budget_ms))
+
+    print_banner()
 
     console.print(Panel.fit(
         "[bold]Comandos / ejemplos:[/bold]\n\n"
@@ -396,6 +334,9 @@ def main():
         "      - 'Crea un evento mañana a las 10:00 para estudiar MCP'\n"
         "      - 'Borra el evento del calendario que creaste para hoy'\n\n"
         "  /reset - Reinicia la conversación\n"
+        "  /sesiones - Lista las conversaciones guardadas\n"
+        "  /reanudar <id> - Continúa una conversación guardada\n"
+        "  /stats - Tiempos por etapa (p50/p95) y tokens de la sesión\n"
         "  /salir - Termina el programa",
         title="Ayuda",
         border_style="blue"
@@ -403,6 +344,13 @@ def main():
 
     console.print()
 
+    if args.exit_at_prompt:
+        return
+
+    # El agente se construye en segundo plano mientras se escribe el primer mensaje
+    agente = AgenteDiferido()
+    agente.iniciar()
+
     # Loop conversacional
     while True:
         try:
@@ -413,17 +361,50 @@ def main():
                 break
 
             if user_input.lower() == "/reset":
-                agent.reset_conversation()
+                if agente.listo:
+                    agente.obtener().reset_conversation()
                 console.print("[green]✓ Conversación reiniciada[/green]\n")
                 continue
 
+            if user_input.lower() == "/stats":
+                print_stats()
+                continue
+
+            if user_input.lower() == "/sesiones":
+                sesion = agente.obtener().sesion if agente.listo else None
+                print_sesiones(sesion.id if sesion is not None else None)
+                continue
+
+            if user_input.lower().startswith("/reanudar"):
+                id_sesion = user_input[len("/reanudar"):].strip()
+                if not id_sesion:
+                    console.print("[yellow]Uso: /reanudar <id> (ver /sesiones)[/yellow]\n")
+                    continue
+                try:
+                    sesion = agente.obtener().reanudar_sesion(id_sesion)
+                except ValueError as e:
+                    console.print(f"[bold red]❌ {e}[/bold red]\n")
+                    continue
+                console.print(
+                    f"[green]✓ Sesión {sesion.id} reanudada[/green] "
+                    f"({sesion.meta['mensajes']} mensajes; «{sesion.meta['titulo']}»)\n"
+                )
+                continue
+
             if not user_input:
                 continue
 
             console.print()
             with console.status("[bold yellow]🤔 Pensando...", spinner="dots"):
+                try:
+                    agent = agente.obtener()
+                except Exception as e:
+                    print_init_error(e)
+                    sys.exit(1)
                 response = agent.chat(user_input)
 
+            from rich.markdown import Markdown
+
             console.print("[bold magenta]Asistente:[/bold magenta]")
             console.print(Panel(
                 Markdown(response),
@@ -442,6 +423,9 @@ def main():
         except Exception as e:
             console.print(f"\n[bold red]❌ Error:[/bold red] {e}\n")
 
+    if agente.listo:
+        agente.obtener().close()
+
 
 if __name__ == "__main__":
     main()
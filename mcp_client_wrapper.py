@@ -1,6 +1,232 @@
 import asyncio
+import json
+import logging
+import weakref
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
 from fastmcp import Client
-from config import MCP_URL
+from config import MCP_URL, TOOL_TIMEOUT, MCP_CACHE_VERSIONADA_MAX
+from metrics import REGISTRY
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSIONADA = REGISTRY.counter(
+    "mcp_cliente_cache_versionada_total",
+    "Lecturas versionadas servidas sin llamar (local), confirmadas por el "
+    "servidor (sin_cambios) o con datos nuevos (datos)",
+    ("resultado",),
+)
+
+
+class MCPSession:
+    """
+    Sesión MCP compartida: mantiene una única conexión abierta con el
+    servidor y la reutiliza para todas las llamadas a tools que se hagan
+    desde el mismo event loop. Admite llamadas concurrentes.
+
+    Además guarda las respuestas de las tools de lectura versionadas (las
+    que aceptan `if_version`, ver call_tool_versionada) y se suscribe a los
+    avisos de cambio de sus recursos para saber cuándo dejan de valer.
+    """
+
+    def __init__(self, url: str = MCP_URL, max_cache: int = MCP_CACHE_VERSIONADA_MAX):
+        self.url = url
+        self._client: Optional[Client] = None
+        self._lock = asyncio.Lock()
+
+        # (tool, argumentos) -> (versión, datos, recurso, generación)
+        self.max_cache = max_cache
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[int, object, str, int]]" = OrderedDict()
+        # Avisos recibidos por recurso: una entrada vale mientras no cambie
+        self._generaciones: Dict[str, int] = {}
+        self._avisos = 0
+        self._uris: Set[str] = set()
+        self._escuchando: Set[str] = set()
+        self._escucha: Optional[asyncio.Task] = None
+        self._sin_escucha = False
+
+    async def _get_client(self) -> Client:
+        if self._client is not None and self._client.is_connected():
+            return self._client
+
+        async with self._lock:
+            if self._client is None or not self._client.is_connected():
+                client = Client(self.url)
+                await client.__aenter__()
+                self._client = client
+        return self._client
+
+    async def call_tool(self, tool_name: str, arguments: dict,
+                        timeout: Optional[float] = TOOL_TIMEOUT):
+        """Llama a una tool del servidor con un timeout opcional."""
+        client = await self._get_client()
+        with tracer.span("mcp.call_tool", tool=tool_name):
+            return await asyncio.wait_for(
+                client.call_tool(name=tool_name, arguments=arguments),
+                timeout,
+            )
+
+    # ========== LECTURAS VERSIONADAS ==========
+
+    def _avisar(self, uri: str):
+        self._generaciones[uri] = self._generaciones.get(uri, 0) + 1
+        self._avisos += 1
+
+    async def _escuchar(self, uris):
+        """Recibe los avisos de cambio de `uris` hasta que se cancele o caiga."""
+        try:
+            from mcp.client.subscriptions import listen, ListenNotSupportedError
+            from mcp.types import METHOD_NOT_FOUND
+        except ImportError:
+            self._sin_escucha = True
+            return
+
+        try:
+            client = await self._get_client()
+            async with listen(client.session, resource_subscriptions=sorted(uris)) as suscripcion:
+                aceptadas = set(suscripcion.honored.resource_subscriptions or ())
+                # Lo que cambiara antes de la confirmación no se ha avisado
+                for uri in aceptadas:
+                    self._avisar(uri)
+                self._escuchando = aceptadas
+                async for evento in suscripcion:
+                    uri = getattr(evento, "uri", None)
+                    if uri is not None:
+                        self._avisar(uri)
+        except asyncio.CancelledError:
+            raise
+        except ListenNotSupportedError:
+            self._sin_escucha = True
+        except Exception as e:
+            if getattr(e, "code", None) == METHOD_NOT_FOUND:
+                self._sin_escucha = True
+            else:
+                logger.debug("Suscripción a avisos de cambio terminada: %s", e)
+        finally:
+            if self._escucha is asyncio.current_task():
+                self._escuchando = set()
+
+    def _asegurar_escucha(self, recurso: str):
+        """Abre (o amplía) la suscripción para que incluya `recurso`."""
+        if self._sin_escucha:
+            return
+        viva = self._escucha is not None and not self._escucha.done()
+        if viva and recurso in self._uris:
+            return
+        self._uris.add(recurso)
+        if viva:
+            self._escucha.cancel()
+        self._escucha = asyncio.create_task(self._escuchar(frozenset(self._uris)))
+
+    async def call_tool_versionada(self, tool_name: str, arguments: dict,
+                                   timeout: Optional[float] = TOOL_TIMEOUT):
+        """
+        Llama a una tool de lectura que acepta `if_version` y devuelve sus
+        datos, reutilizando la última respuesta guardada cuando se puede:
+
+          - si el recurso tiene la suscripción de avisos abierta y no ha
+            llegado ningún aviso desde que se guardó, sin llamar al servidor;
+          - si no, con una llamada condicional (if_version): si los datos no
+            han cambiado el servidor responde solo "sin_cambios".
+        """
+        if self.max_cache <= 0:
+            return await self.call_tool(tool_name, arguments, timeout)
+
+        clave = (tool_name, json.dumps(arguments, sort_keys=True, ensure_ascii=False))
+        entrada = self._cache.get(clave)
+        if entrada is not None:
+            version, datos, recurso, generacion = entrada
+            if recurso in self._escuchando and self._generaciones.get(recurso, 0) == generacion:
+                self._cache.move_to_end(clave)
+                CACHE_VERSIONADA.labels("local").inc()
+                return datos
+
+        # Los avisos se cuentan antes de llamar: si llega uno durante la
+        # llamada, la respuesta se guarda como ya invalidada
+        avisos = self._avisos
+        generacion = self._generaciones.get(entrada[2], 0) if entrada is not None else 0
+        resultado = await self.call_tool(
+            tool_name, {**arguments, "if_version": entrada[0] if entrada is not None else 0}, timeout
+        )
+        respuesta = getattr(resultado, "data", resultado)
+        if not isinstance(respuesta, dict) or "version" not in respuesta:
+            # Servidor sin lecturas versionadas
+            return resultado
+
+        recurso = respuesta["recurso"]
+        if entrada is None or entrada[2] != recurso:
+            generacion = self._generaciones.get(recurso, 0) if self._avisos == avisos else -1
+        if respuesta.get("sin_cambios") and entrada is not None:
+            CACHE_VERSIONADA.labels("sin_cambios").inc()
+            datos = entrada[1]
+        else:
+            CACHE_VERSIONADA.labels("datos").inc()
+            datos = respuesta.get("datos")
+
+        self._cache[clave] = (respuesta["version"], datos, recurso, generacion)
+        self._cache.move_to_end(clave)
+        while len(self._cache) > self.max_cache:
+            self._cache.popitem(last=False)
+        self._asegurar_escucha(recurso)
+        return datos
+
+    async def close(self):
+        """Cierra la conexión con el servidor (si estaba abierta)."""
+        escucha, self._escucha = self._escucha, None
+        if escucha is not None:
+            escucha.cancel()
+            try:
+                await escucha
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._escuchando = set()
+        self._uris = set()
+
+        client, self._client = self._client, None
+        if client is not None:
+            await client.__aexit__(None, None, None)
+
+
+# Una sesión por event loop: la conexión de fastmcp queda ligada al loop
+# en el que se abrió.
+_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, MCPSession]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_session() -> MCPSession:
+    """Devuelve la sesión MCP compartida del event loop actual."""
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None:
+        session = MCPSession()
+        _sessions[loop] = session
+    return session
+
+
+async def close_session():
+    """Cierra la sesión MCP compartida del event loop actual."""
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
+
+async def call_mcp_tool_async(tool_name: str, **kwargs):
+    """
+    Llama a una tool usando la sesión MCP compartida del loop actual.
+    Es la variante que deben usar las herramientas del agente asíncrono.
+    """
+    return await get_session().call_tool(tool_name, kwargs)
+
+
+async def call_mcp_tool_versionada_async(tool_name: str, **kwargs):
+    """
+    Como call_mcp_tool_async, para las tools de lectura con `if_version`:
+    devuelve los datos reutilizando la caché de la sesión si no han cambiado.
+    """
+    return await get_session().call_tool_versionada(tool_name, kwargs)
 
 
 async def _call_mcp_tool_async(tool_name: str, arguments: dict):
@@ -18,6 +244,9 @@ async def _call_mcp_tool_async(tool_name: str, arguments: dict):
 
 def call_mcp_tool(tool_name: str, **kwargs):
     """
-    Wrapper sincrono para poder usarlo desde las herramientas del agente.
+    Wrapper sincrono para poder usarlo desde código sin event loop.
+    Abre una conexión nueva en cada llamada; desde el agente asíncrono
+    es preferible call_mcp_tool_async.
     """
-    return asyncio.run(_call_mcp_tool_async(tool_name, kwargs))
+    with tracer.span("mcp.call_tool", tool=tool_name):
+        return asyncio.run(_call_mcp_tool_async(tool_name, kwargs))
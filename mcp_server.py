@@ -1,49 +1,262 @@
 ﻿from fastmcp import FastMCP
-from typing import List, Dict
-
+from functools import wraps
+import csv
+import inspect
+import logging
+from typing import Annotated, Callable, List, Dict, Literal, Optional
+import threading
+import time
+from pathlib import Path
+
+from pydantic import Field
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+
+from agenda import Agenda
+from concurrencia import UNIFICADOR, limitar, unificar
 from data_manager import DataManager
 from google_calendar_client import GoogleCalendarClient
-from config import MCP_PORT
+from config import CATALOGO_VIGILAR_SEGUNDOS, MCP_PORT, USUARIO_POR_DEFECTO, FICHEROS_DIR
+from metrics import REGISTRY
+from notificaciones import Notificador, URI_CATALOGO, PLANTILLA_TAREAS, uri_datos, usuario_de_uri
+
+logger = logging.getLogger(__name__)
 
 # Inicializar servidor MCP
 mcp = FastMCP("Universidad Assistant")
 dm = DataManager()
-calendar_client = GoogleCalendarClient()
+
+# El cliente de Google Calendar (y su autenticación OAuth) se crea la
+# primera vez que se usa una herramienta de calendario
+calendar_client: Optional[GoogleCalendarClient] = None
+
+_calendar_lock = threading.Lock()
+
+
+def get_calendar_client() -> GoogleCalendarClient:
+    global calendar_client
+    if calendar_client is None:
+        with _calendar_lock:
+            if calendar_client is None:
+                calendar_client = GoogleCalendarClient()
+    return calendar_client
+
+
+agenda = Agenda(dm, get_calendar_client)
+
+# Avisos de cambios a los clientes suscritos (ver notificaciones.py)
+notificador = Notificador()
+notificador.registrar(mcp)
+dm.al_cambiar(notificador.publicar)
+# Tras un cambio, las lecturas nuevas de esos datos no se unen a las que ya
+# estaban en curso
+dm.al_cambiar(UNIFICADOR.invalidar)
+
+
+def _vigilar_catalogo():
+    """Recarga el catálogo (y avisa a los suscritos) cuando se edita universidad.json."""
+    while True:
+        time.sleep(CATALOGO_VIGILAR_SEGUNDOS)
+        try:
+            dm.comprobar_catalogo()
+        except Exception as e:
+            logger.warning("Error al comprobar el catálogo: %s", e)
+
+# ========== MÉTRICAS ==========
+
+TOOL_LLAMADAS = REGISTRY.counter(
+    "mcp_tool_llamadas_total", "Llamadas a cada herramienta MCP", ("tool",)
+)
+TOOL_ERRORES = REGISTRY.counter(
+    "mcp_tool_errores_total", "Llamadas a herramientas que lanzaron una excepción", ("tool",)
+)
+TOOL_EN_CURSO = REGISTRY.gauge(
+    "mcp_tool_en_curso", "Llamadas a herramientas en ejecución", ("tool",)
+)
+TOOL_DURACION = REGISTRY.histogram(
+    "mcp_tool_duracion_segundos", "Latencia de cada herramienta MCP", ("tool",)
+)
+
+
+def instrumentar(func):
+    """
+    Registra llamadas, errores, llamadas en curso y latencia de una tool
+    (síncrona o asíncrona; en las limitadas por grupo la latencia incluye
+    la espera en cola). Las series se resuelven una sola vez al decorar.
+    """
+    nombre = func.__name__
+    llamadas = TOOL_LLAMADAS.labels(nombre)
+    errores = TOOL_ERRORES.labels(nombre)
+    en_curso = TOOL_EN_CURSO.labels(nombre)
+    duracion = TOOL_DURACION.labels(nombre)
+
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def wrapper_async(*args, **kwargs):
+            llamadas.inc()
+            en_curso.inc()
+            inicio = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                errores.inc()
+                raise
+            finally:
+                duracion.observe(time.perf_counter() - inicio)
+                en_curso.dec()
+
+        return wrapper_async
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        llamadas.inc()
+        en_curso.inc()
+        inicio = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            errores.inc()
+            raise
+        finally:
+            duracion.observe(time.perf_counter() - inicio)
+            en_curso.dec()
+
+    return wrapper
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics_endpoint(request: Request) -> PlainTextResponse:
+    """Expone las métricas del servidor en formato de texto de Prometheus."""
+    return PlainTextResponse(
+        REGISTRY.exportar(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+# ========== VERSIONES DE LOS DATOS ==========
+
+@mcp.resource(URI_CATALOGO, mime_type="application/json")
+def version_catalogo() -> Dict:
+    """Versión actual del catálogo (horarios, profesores y aulas)."""
+    return {"conjunto": "catalogo", "version": dm.version("catalogo")}
+
+
+@mcp.resource(PLANTILLA_TAREAS, mime_type="application/json")
+def version_tareas(usuario: str) -> Dict:
+    """Versión actual de las tareas de un usuario."""
+    return {"conjunto": "tareas", "version": dm.version("tareas", usuario_de_uri(usuario))}
+
+
+IfVersion = Annotated[Optional[int], Field(
+    description="Versión de los datos que ya tiene el cliente (campo 'version' "
+                "de una respuesta anterior); si no han cambiado solo se "
+                "responde sin_cambios",
+    ge=0,
+)]
+
+
+def _condicional(conjunto: str, usuario: Optional[str], if_version: Optional[int],
+                 leer: Callable):
+    """
+    Respuesta de una herramienta de lectura con `if_version`.
+
+    Sin if_version devuelve los datos tal cual. Con él, devuelve
+    {"sin_cambios": True, "version", "recurso"} si el cliente ya tiene la
+    versión actual, o {"version", "recurso", "datos"} si no. La versión se
+    lee antes que los datos: si cambian entre medias, el cliente se queda
+    con una versión antigua y vuelve a pedirlos la próxima vez.
+    """
+    if if_version is None:
+        return leer()
+    version = dm.version(conjunto, usuario or USUARIO_POR_DEFECTO)
+    recurso = uri_datos(conjunto, usuario)
+    if if_version == version:
+        return {"sin_cambios": True, "version": version, "recurso": recurso}
+    return {"version": version, "recurso": recurso, "datos": leer()}
+
 
 # ========== HERRAMIENTAS DE CONSULTA ==========
 
+# Las descripciones de las herramientas y de sus parámetros son las que ve
+# el modelo: el agente las descubre con list_tools (ver tool_discovery.py).
+#
+# Todas se ejecutan en el pool de hilos de su grupo (@limitar, ver
+# concurrencia.py): calendario, tareas o catálogo. En las de solo lectura
+# (@unificar, con los datos que leen) las llamadas idénticas simultáneas
+# comparten una ejecución.
+#
+# Las que aceptan `if_version` son consultas condicionales (ver
+# _condicional); el agente lo rellena y no se muestra al modelo.
+
 @mcp.tool()
-def consultar_horario(asignatura: str) -> List[Dict]:
+@instrumentar
+@unificar("catalogo")
+@limitar("catalogo")
+def consultar_horario(
+    asignatura: Annotated[str, Field(description="Nombre de la asignatura")],
+    if_version: IfVersion = None,
+) -> List[Dict] | Dict:
     """
-    Consulta el horario de clases de una asignatura específica.
-
-    Args:
-        asignatura: Nombre de la asignatura a consultar
+    Consulta el horario de una asignatura específica.
 
     Returns:
         Lista con los horarios de la asignatura
     """
-    return dm.get_horario(asignatura)
+    return _condicional("catalogo", None, if_version, lambda: dm.get_horario(asignatura))
 
 
 @mcp.tool()
-def consultar_todos_horarios() -> List[Dict]:
+@instrumentar
+@unificar("catalogo")
+@limitar("catalogo")
+def consultar_todos_horarios(
+    if_version: IfVersion = None,
+) -> List[Dict] | Dict:
     """
     Obtiene el horario completo de todas las asignaturas.
 
     Returns:
         Lista con todos los horarios
     """
-    return dm.get_todos_horarios()
+    return _condicional("catalogo", None, if_version, dm.get_todos_horarios)
 
 
 @mcp.tool()
-def buscar_profesor(nombre: str) -> Dict:
+@instrumentar
+@unificar("catalogo")
+@limitar("catalogo")
+def consultar_asignatura(
+    asignatura: Annotated[str, Field(description="Nombre completo o parcial de la asignatura")],
+    if_version: IfVersion = None,
+) -> Dict:
     """
-    Busca información sobre un profesor por su nombre.
+    Devuelve todo lo que hay sobre una asignatura en una sola consulta:
+    sus sesiones (día, hora y aula), los datos completos de sus profesores
+    (email, despacho, tutorías) y de sus aulas (edificio, capacidad,
+    equipamiento). Úsalo para preguntas como "¿dónde y con quién tengo
+    Bases de Datos?" en lugar de encadenar consultar_horario,
+    buscar_profesor y consultar_aula.
+
+    Returns:
+        Asignatura con sesiones, profesores y aulas, o error
+    """
+    def leer():
+        vista = dm.get_asignatura(asignatura)
+        if vista:
+            return vista
+        return {"error": f"Asignatura '{asignatura}' no encontrada"}
+
+    return _condicional("catalogo", None, if_version, leer)
 
-    Args:
-        nombre: Nombre completo o parcial del profesor
+
+@mcp.tool()
+@instrumentar
+@unificar("catalogo")
+@limitar("catalogo")
+def buscar_profesor(
+    nombre: Annotated[str, Field(description="Nombre completo o parcial del profesor a buscar")],
+) -> Dict:
+    """
+    Busca información sobre un profesor por su nombre.
 
     Returns:
         Información del profesor (email, despacho, tutorías) o error
@@ -55,13 +268,15 @@ def buscar_profesor(nombre: str) -> Dict:
 
 
 @mcp.tool()
-def consultar_aula(codigo_aula: str) -> Dict:
+@instrumentar
+@unificar("catalogo")
+@limitar("catalogo")
+def consultar_aula(
+    codigo_aula: Annotated[str, Field(description="Código del aula (ej: A-201)")],
+) -> Dict:
     """
     Obtiene información sobre un aula específica.
 
-    Args:
-        codigo_aula: Código del aula (ej: "A-201")
-
     Returns:
         Información del aula (edificio, capacidad, equipamiento) o error
     """
@@ -73,90 +288,283 @@ def consultar_aula(codigo_aula: str) -> Dict:
 
 # ========== HERRAMIENTAS DE GESTIÓN DE TAREAS ==========
 
+# El parámetro `usuario` lo rellena el agente; no se muestra al modelo.
+
 @mcp.tool()
+@instrumentar
+@limitar("tareas")
 def crear_tarea(
-    titulo: str,
-    fecha_vencimiento: str,
-    descripcion: str = "",
-    prioridad: str = "media",
+    titulo: Annotated[str, Field(description="Título de la tarea")],
+    fecha_vencimiento: Annotated[str, Field(description="Fecha de vencimiento (YYYY-MM-DD)")],
+    descripcion: Annotated[str, Field(description="Descripción de la tarea (opcional)")] = "",
+    prioridad: Annotated[
+        Literal["baja", "media", "alta"], Field(description="Prioridad de la tarea")
+    ] = "media",
+    usuario: str = USUARIO_POR_DEFECTO,
 ) -> Dict:
     """
     Crea una nueva tarea o recordatorio académico.
 
-    Args:
-        titulo: Título de la tarea
-        fecha_vencimiento: Fecha de vencimiento en formato YYYY-MM-DD
-        descripcion: Descripción opcional de la tarea
-        prioridad: Prioridad de la tarea (baja, media, alta)
-
     Returns:
         Información de la tarea creada
     """
-    return dm.crear_tarea(titulo, fecha_vencimiento, descripcion, prioridad)
+    return dm.crear_tarea(titulo, fecha_vencimiento, descripcion, prioridad,
+                          usuario=usuario)
 
 
 @mcp.tool()
-def listar_tareas(filtro: str = "pendientes") -> List[Dict]:
+@instrumentar
+@unificar("tareas")
+@limitar("tareas")
+def listar_tareas(
+    filtro: Annotated[
+        Literal["todas", "pendientes", "completadas"],
+        Field(description="Filtro para las tareas"),
+    ] = "pendientes",
+    if_version: IfVersion = None,
+    usuario: str = USUARIO_POR_DEFECTO,
+) -> List[Dict] | Dict:
     """
     Lista las tareas del estudiante según un filtro.
 
-    Args:
-        filtro: Tipo de tareas a mostrar ("todas", "pendientes", "completadas")
-
     Returns:
         Lista de tareas según el filtro aplicado
     """
-    return dm.listar_tareas(filtro)
+    return _condicional("tareas", usuario, if_version,
+                        lambda: dm.listar_tareas(filtro, usuario=usuario))
 
 
 @mcp.tool()
-def completar_tarea(id_tarea: int) -> Dict:
+@instrumentar
+@unificar("tareas")
+@limitar("tareas")
+def proximas_tareas(
+    n: Annotated[int, Field(description="Número máximo de tareas a devolver", ge=1, le=50)] = 5,
+    dias: Annotated[Optional[int], Field(
+        description="Solo las que vencen en los próximos N días (ej: 7 para esta semana)",
+        ge=0,
+    )] = None,
+    usuario: str = USUARIO_POR_DEFECTO,
+) -> List[Dict]:
     """
-    Marca una tarea como completada.
+    Devuelve las próximas tareas pendientes, ya ordenadas por fecha de
+    vencimiento (la más cercana primero). Úsalo para preguntas como
+    "¿qué entregas tengo esta semana?" en lugar de listar_tareas.
+
+    Returns:
+        Tareas con los campos `vencida` y `dias_restantes`
+    """
+    return dm.proximas_tareas(n, dias, usuario=usuario)
 
-    Args:
-        id_tarea: ID de la tarea a completar
+
+@mcp.tool()
+@instrumentar
+@unificar("tareas")
+@limitar("tareas")
+def buscar_tareas(
+    consulta: Annotated[str, Field(
+        description="Palabras a buscar en el título y la descripción (ej: 'práctica PLN')"
+    )],
+    limite: Annotated[int, Field(description="Número máximo de tareas a devolver", ge=1, le=50)] = 10,
+    usuario: str = USUARIO_POR_DEFECTO,
+) -> List[Dict]:
+    """
+    Busca tareas por su contenido (título y descripción), sin distinguir
+    tildes ni mayúsculas, y las devuelve de más a menos relevante. Úsalo
+    para localizar una tarea concreta ("la práctica de PLN", "entrega de
+    bases de datos") en lugar de listar todas.
+
+    Returns:
+        Tareas que coinciden, con el campo `relevancia`
+    """
+    return dm.buscar_tareas(consulta, limite, usuario=usuario)
+
+
+@mcp.tool()
+@instrumentar
+@unificar("tareas")
+@limitar("tareas")
+def tareas_vencidas(
+    usuario: str = USUARIO_POR_DEFECTO,
+) -> List[Dict]:
+    """
+    Devuelve las tareas pendientes cuya fecha de vencimiento ya ha pasado,
+    ordenadas de la más antigua a la más reciente.
+
+    Returns:
+        Tareas con `vencida` = true y `dias_restantes` negativo
+    """
+    return dm.tareas_vencidas(usuario=usuario)
+
+
+@mcp.tool()
+@instrumentar
+@limitar("tareas")
+def completar_tarea(
+    id_tarea: Annotated[int, Field(description="ID de la tarea a completar")],
+    usuario: str = USUARIO_POR_DEFECTO,
+) -> Dict:
+    """
+    Marca una tarea como completada.
 
     Returns:
         Confirmación de la operación
     """
-    return dm.completar_tarea(id_tarea)
+    return dm.completar_tarea(id_tarea, usuario=usuario)
 
 
 @mcp.tool()
-def eliminar_tarea(id_tarea: int) -> Dict:
+@instrumentar
+@limitar("tareas")
+def eliminar_tarea(
+    id_tarea: Annotated[int, Field(description="ID de la tarea a eliminar")],
+    usuario: str = USUARIO_POR_DEFECTO,
+) -> Dict:
     """
     Elimina una tarea permanentemente.
 
-    Args:
-        id_tarea: ID de la tarea a eliminar
-
     Returns:
         Confirmación de la eliminación
     """
-    return dm.eliminar_tarea(id_tarea)
+    return dm.eliminar_tarea(id_tarea, usuario=usuario)
+
+
+# ========== AGENDA UNIFICADA ==========
+
+@mcp.tool()
+@instrumentar
+@unificar("catalogo", "tareas", "calendario")
+@limitar("calendario")
+def mi_agenda(
+    fecha_inicio: Annotated[str, Field(description="Primer día (YYYY-MM-DD)")],
+    fecha_fin: Annotated[Optional[str], Field(
+        description="Último día, incluido (YYYY-MM-DD). Si se omite, solo fecha_inicio"
+    )] = None,
+    usuario: str = USUARIO_POR_DEFECTO,
+) -> Dict:
+    """
+    Devuelve en una sola lista, por orden cronológico, todo lo que tiene el
+    estudiante esos días: clases del horario, entregas de tareas pendientes
+    y eventos de Google Calendar. Úsalo para preguntas como "¿qué tengo
+    mañana?" o "¿cómo tengo la semana?" en lugar de consultar por separado
+    horarios, tareas y calendario.
+
+    Returns:
+        Elementos con tipo (clase, tarea o evento), fecha, hora_inicio,
+        hora_fin y titulo, más los datos propios de cada tipo, y "avisos"
+        si falta algo (Google Calendar no responde o hay más eventos de los
+        que se leen, con "truncada": true)
+    """
+    try:
+        return agenda.consultar(fecha_inicio, fecha_fin, usuario=usuario)
+    except ValueError as e:
+        return {"error": str(e)}
+
+
+# ========== IMPORTACIÓN / EXPORTACIÓN DE FICHEROS ==========
+
+# Las herramientas solo acceden a ficheros dentro de FICHEROS_DIR
+
+def _ruta_fichero(nombre: str) -> Path:
+    FICHEROS_DIR.mkdir(parents=True, exist_ok=True)
+    base = FICHEROS_DIR.resolve()
+    ruta = (base / nombre).resolve()
+    if not ruta.is_relative_to(base):
+        raise ValueError(f"El fichero debe estar dentro de {FICHEROS_DIR}")
+    return ruta
+
+
+@mcp.tool()
+@instrumentar
+@limitar("tareas")
+def importar_tareas(
+    fichero: Annotated[str, Field(description="Nombre del fichero .csv o .ics (en data/ficheros)")],
+    usuario: str = USUARIO_POR_DEFECTO,
+) -> Dict:
+    """
+    Importa de golpe todas las tareas/entregas de un fichero CSV o ICS
+    (por ejemplo, exportado del campus virtual). Omite las duplicadas.
+
+    Returns:
+        Número de tareas importadas, duplicadas e inválidas
+    """
+    try:
+        return dm.importar_tareas(_ruta_fichero(fichero), usuario=usuario)
+    except (OSError, ValueError, csv.Error) as e:
+        return {"success": False, "error": str(e)}
+
+
+@mcp.tool()
+@instrumentar
+@limitar("tareas")
+def exportar_tareas(
+    fichero: Annotated[str, Field(description="Nombre del fichero .csv o .ics de destino")],
+    filtro: Annotated[
+        Literal["todas", "pendientes", "completadas"],
+        Field(description="Tareas a exportar"),
+    ] = "todas",
+    usuario: str = USUARIO_POR_DEFECTO,
+) -> Dict:
+    """
+    Exporta las tareas a un fichero CSV o ICS (en data/ficheros).
+
+    Returns:
+        Número de tareas exportadas y ruta del fichero
+    """
+    try:
+        return dm.exportar_tareas(_ruta_fichero(fichero), filtro=filtro, usuario=usuario)
+    except (OSError, ValueError) as e:
+        return {"success": False, "error": str(e)}
+
+
+@mcp.tool()
+@instrumentar
+@limitar("catalogo")
+def exportar_horarios(
+    fichero: Annotated[str, Field(description="Nombre del fichero .csv o .ics de destino")],
+) -> Dict:
+    """
+    Exporta el horario de clases a CSV o a ICS (eventos semanales que se
+    pueden añadir a cualquier calendario).
+
+    Returns:
+        Número de clases exportadas y ruta del fichero
+    """
+    try:
+        return dm.exportar_horarios(_ruta_fichero(fichero))
+    except (OSError, ValueError) as e:
+        return {"success": False, "error": str(e)}
 
 
 # ========== HERRAMIENTAS DE GOOGLE CALENDAR ==========
 
 @mcp.tool()
+@instrumentar
+@unificar("calendario")
+@limitar("calendario")
 def listar_eventos_calendario(
-    fecha_inicio: str,
-    fecha_fin: str,
-    max_resultados: int = 10,
+    fecha_inicio: Annotated[str, Field(description=(
+        "Fecha y hora de inicio en formato 'YYYY-MM-DD HH:MM'. "
+        "Ejemplo: '2025-11-28 09:00'"
+    ))],
+    fecha_fin: Annotated[str, Field(description=(
+        "Fecha y hora de fin en formato 'YYYY-MM-DD HH:MM'. "
+        "Ejemplo: '2025-11-28 23:59'"
+    ))],
+    max_resultados: Annotated[int, Field(
+        description="Número máximo de eventos a devolver (por defecto 10)"
+    )] = 10,
 ) -> list[dict]:
     """
-    Lista eventos del Google Calendar asociado entre dos fechas.
-
-    Parámetros:
-    - fecha_inicio: fecha y hora inicio en formato 'YYYY-MM-DD HH:MM'
-    - fecha_fin: fecha y hora fin en formato 'YYYY-MM-DD HH:MM'
-    - max_resultados: número máximo de eventos a recuperar.
+    Lista eventos del Google Calendar del usuario entre dos fechas y horas.
+    Úsalo cuando el usuario quiera saber qué tiene en su calendario en un
+    rango de tiempo concreto.
 
     Devuelve:
-    - Lista de eventos con id, summary, description, location, start, end.
+    - Lista de eventos con id, summary, description, location, start, end
+      (y calendar_id si hay varios calendarios), ordenados por inicio.
     """
-    return calendar_client.list_events(
+    return get_calendar_client().list_events(
         fecha_inicio=fecha_inicio,
         fecha_fin=fecha_fin,
         max_resultados=max_resultados,
@@ -164,48 +572,99 @@ def listar_eventos_calendario(
 
 
 @mcp.tool()
+@instrumentar
+@limitar("calendario")
 def crear_evento_calendario(
-    titulo: str,
-    fecha_inicio: str,
-    fecha_fin: str,
-    descripcion: str | None = None,
-    ubicacion: str | None = None,
+    titulo: Annotated[str, Field(description="Título del evento (ej: 'Examen de IA')")],
+    fecha_inicio: Annotated[str, Field(description=(
+        "Fecha y hora de inicio en formato 'YYYY-MM-DD HH:MM'. "
+        "Ejemplo: '2025-12-15 10:00'"
+    ))],
+    fecha_fin: Annotated[str, Field(description=(
+        "Fecha y hora de fin en formato 'YYYY-MM-DD HH:MM'. "
+        "Ejemplo: '2025-12-15 12:00'"
+    ))],
+    descripcion: Annotated[
+        str | None, Field(description="Descripción del evento (opcional)")
+    ] = None,
+    ubicacion: Annotated[
+        str | None, Field(description="Ubicación del evento (opcional, ej: 'Aula A-201')")
+    ] = None,
 ) -> dict:
     """
     Crea un nuevo evento en Google Calendar.
-
-    Parámetros:
-    - titulo: título del evento.
-    - fecha_inicio: 'YYYY-MM-DD HH:MM'
-    - fecha_fin: 'YYYY-MM-DD HH:MM'
-    - descripcion: texto opcional describiendo el evento.
-    - ubicacion: ubicación opcional del evento.
+    Siempre debes convertir expresiones como 'hoy', 'mañana' o 'el viernes
+    que viene' a una fecha completa usando la fecha actual que se indica
+    en el mensaje de sistema. Las fechas deben ir en formato
+    'YYYY-MM-DD HH:MM'. Nunca utilices años anteriores al año actual salvo
+    que el usuario lo pida explícitamente.
 
     Devuelve:
     - Un diccionario con id, summary y htmlLink del evento creado.
     """
-    return calendar_client.create_event(
+    evento = get_calendar_client().create_event(
         titulo=titulo,
         fecha_inicio=fecha_inicio,
         fecha_fin=fecha_fin,
         descripcion=descripcion,
         ubicacion=ubicacion,
     )
+    agenda.invalidar_calendario()
+    UNIFICADOR.invalidar("calendario")
+    return evento
 
 
 @mcp.tool()
-def eliminar_evento_calendario(event_id: str) -> dict:
+@instrumentar
+@limitar("calendario")
+def eliminar_evento_calendario(
+    event_id: Annotated[str, Field(description=(
+        "ID del evento en Google Calendar. Normalmente se obtiene "
+        "usando listar_eventos_calendario."
+    ))],
+    calendar_id: Annotated[Optional[str], Field(description=(
+        "Calendario del evento (campo calendar_id de listar_eventos_calendario). "
+        "Si se omite, el calendario principal"
+    ))] = None,
+) -> dict:
     """
-    Elimina un evento de Google Calendar por su ID.
-
-    Parámetros:
-    - event_id: identificador del evento en Google Calendar,
-      normalmente obtenido de listar_eventos_calendario.
+    Elimina un evento del Google Calendar por su ID.
+    Úsalo cuando el usuario indique claramente qué evento quiere borrar.
 
     Devuelve:
     - Un diccionario con el estado de la operación.
     """
-    return calendar_client.delete_event(event_id)
+    resultado = get_calendar_client().delete_event(event_id, calendar_id)
+    agenda.invalidar_calendario()
+    UNIFICADOR.invalidar("calendario")
+    return resultado
+
+
+# ========== HUELLA DEL ESQUEMA DE HERRAMIENTAS ==========
+
+_tools_hash: Optional[str] = None
+
+
+async def calcular_tools_hash() -> str:
+    """
+    Hash estable de la lista de herramientas (nombre, descripción y schema)
+    tal y como la ve un cliente MCP. Se calcula una vez por proceso.
+    """
+    global _tools_hash
+    if _tools_hash is None:
+        from fastmcp import Client
+        from tool_discovery import hash_tools, tool_a_dict
+
+        async with Client(mcp) as client:
+            tools = await client.list_tools()
+        _tools_hash = hash_tools([tool_a_dict(t) for t in tools])
+    return _tools_hash
+
+
+@mcp.custom_route("/tools-hash", methods=["GET"])
+async def tools_hash_endpoint(request: Request) -> PlainTextResponse:
+    """Permite a los clientes validar su caché de schemas sin hacer list_tools."""
+    return PlainTextResponse(await calcular_tools_hash())
 
 
 # ==========================
@@ -213,7 +672,10 @@ def eliminar_evento_calendario(event_id: str) -> dict:
 # ==========================
 
 if __name__ == "__main__":
-    # Servidor MCP HTTP en localhost:MCP_PORT
+    if CATALOGO_VIGILAR_SEGUNDOS > 0:
+        threading.Thread(target=_vigilar_catalogo, name="vigilar-catalogo", daemon=True).start()
+
+    # Servidor MCP HTTP en localhost:MCP_PORT (métricas en /metrics)
     mcp.run(
         transport="http",
         host="127.0.0.1",
@@ -0,0 +1,247 @@
+"""
+Registro de métricas en proceso con exportación en formato de texto
+de Prometheus.
+
+Cada serie (combinación de etiquetas) tiene su propio lock, que solo se
+toma durante la actualización de unos pocos números; así dos herramientas
+distintas nunca compiten entre sí y el coste en el camino caliente es el
+de un lock sin contención. El lock del registro solo se usa al crear una
+métrica o una serie nueva.
+"""
+
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+
+# Límites (en segundos) por defecto de los histogramas de latencia
+BUCKETS_LATENCIA = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatear_etiquetas(nombres: Sequence[str], valores: Sequence[str],
+                         extra: Tuple[str, str] = None) -> str:
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra is not None:
+        pares.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _formatear_numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+# ==========================
+# SERIES (UNA POR ETIQUETAS)
+# ==========================
+
+class _SerieContador:
+    __slots__ = ("_lock", "valor")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.valor = 0.0
+
+    def inc(self, cantidad: float = 1) -> None:
+        with self._lock:
+            self.valor += cantidad
+
+
+class _SerieGauge:
+    __slots__ = ("_lock", "valor")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.valor = 0.0
+
+    def inc(self, cantidad: float = 1) -> None:
+        with self._lock:
+            self.valor += cantidad
+
+    def dec(self, cantidad: float = 1) -> None:
+        with self._lock:
+            self.valor -= cantidad
+
+    def set(self, valor: float) -> None:
+        with self._lock:
+            self.valor = valor
+
+
+class _SerieHistograma:
+    __slots__ = ("_lock", "_limites", "cuentas", "suma", "total")
+
+    def __init__(self, limites: Tuple[float, ...]):
+        self._lock = threading.Lock()
+        self._limites = limites
+        # Una cuenta por límite más la del +Inf (no acumuladas)
+        self.cuentas = [0] * (len(limites) + 1)
+        self.suma = 0.0
+        self.total = 0
+
+    def observe(self, valor: float) -> None:
+        i = bisect_left(self._limites, valor)
+        with self._lock:
+            self.cuentas[i] += 1
+            self.suma += valor
+            self.total += 1
+
+
+# ==========================
+# MÉTRICAS
+# ==========================
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _nueva_serie(self):
+        raise NotImplementedError
+
+    def labels(self, *valores: str):
+        """Devuelve (creándola si hace falta) la serie para esas etiquetas."""
+        clave = tuple(str(v) for v in valores)
+        serie = self._series.get(clave)
+        if serie is None:
+            if len(clave) != len(self.etiquetas):
+                raise ValueError(
+                    f"{self.nombre} espera etiquetas {self.etiquetas}, recibió {clave}"
+                )
+            with self._lock:
+                serie = self._series.setdefault(clave, self._nueva_serie())
+        return serie
+
+    def _copiar_series(self) -> List[Tuple[Tuple[str, ...], object]]:
+        with self._lock:
+            return list(self._series.items())
+
+    def exportar(self) -> List[str]:
+        lineas = [
+            f"# HELP {self.nombre} {_escapar(self.ayuda)}",
+            f"# TYPE {self.nombre} {self.tipo}",
+        ]
+        for valores, serie in self._copiar_series():
+            lineas.extend(self._exportar_serie(valores, serie))
+        return lineas
+
+    def _exportar_serie(self, valores, serie) -> List[str]:
+        etiquetas = _formatear_etiquetas(self.etiquetas, valores)
+        return [f"{self.nombre}{etiquetas} {_formatear_numero(serie.valor)}"]
+
+
+class Counter(_Metrica):
+    tipo = "counter"
+
+    def _nueva_serie(self):
+        return _SerieContador()
+
+    def inc(self, cantidad: float = 1) -> None:
+        """Atajo para métricas sin etiquetas."""
+        self.labels().inc(cantidad)
+
+
+class Gauge(_Metrica):
+    tipo = "gauge"
+
+    def _nueva_serie(self):
+        return _SerieGauge()
+
+    def set(self, valor: float) -> None:
+        """Atajo para métricas sin etiquetas."""
+        self.labels().set(valor)
+
+
+class Histogram(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (),
+                 buckets: Sequence[float] = BUCKETS_LATENCIA):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(sorted(buckets))
+
+    def _nueva_serie(self):
+        return _SerieHistograma(self.buckets)
+
+    def observe(self, valor: float) -> None:
+        """Atajo para métricas sin etiquetas."""
+        self.labels().observe(valor)
+
+    def _exportar_serie(self, valores, serie) -> List[str]:
+        with serie._lock:
+            cuentas = list(serie.cuentas)
+            suma = serie.suma
+            total = serie.total
+
+        lineas = []
+        acumulado = 0
+        for limite, cuenta in zip(self.buckets + (float("inf"),), cuentas):
+            acumulado += cuenta
+            etiquetas = _formatear_etiquetas(
+                self.etiquetas, valores, ("le", _formatear_numero(limite))
+            )
+            lineas.append(f"{self.nombre}_bucket{etiquetas} {acumulado}")
+
+        etiquetas = _formatear_etiquetas(self.etiquetas, valores)
+        lineas.append(f"{self.nombre}_sum{etiquetas} {_formatear_numero(suma)}")
+        lineas.append(f"{self.nombre}_count{etiquetas} {total}")
+        return lineas
+
+
+# ==========================
+# REGISTRO
+# ==========================
+
+class Registry:
+    """Colección de métricas del proceso."""
+
+    def __init__(self):
+        self._metricas: Dict[str, _Metrica] = {}
+        self._lock = threading.Lock()
+
+    def _obtener(self, clase, nombre: str, *args, **kwargs):
+        with self._lock:
+            metrica = self._metricas.get(nombre)
+            if metrica is None:
+                metrica = clase(nombre, *args, **kwargs)
+                self._metricas[nombre] = metrica
+            elif not isinstance(metrica, clase):
+                raise ValueError(f"La métrica '{nombre}' ya existe con otro tipo")
+            return metrica
+
+    def counter(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()) -> Counter:
+        return self._obtener(Counter, nombre, ayuda, etiquetas)
+
+    def gauge(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()) -> Gauge:
+        return self._obtener(Gauge, nombre, ayuda, etiquetas)
+
+    def histogram(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (),
+                  buckets: Sequence[float] = BUCKETS_LATENCIA) -> Histogram:
+        return self._obtener(Histogram, nombre, ayuda, etiquetas, buckets=buckets)
+
+    def exportar(self) -> str:
+        """Devuelve todas las métricas en formato de texto de Prometheus."""
+        with self._lock:
+            metricas = list(self._metricas.values())
+        lineas = []
+        for metrica in metricas:
+            lineas.extend(metrica.exportar())
+        return "\n".join(lineas) + "\n"
+
+
+# Registro global del proceso
+REGISTRY = Registry()
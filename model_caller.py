@@ -0,0 +1,214 @@
+"""
+Llamadas resilientes al modelo.
+
+`ModelCaller` envuelve `chat_completion` con:
+  - un timeout por intento y un plazo total para toda la llamada,
+  - reintentos con backoff exponencial y jitter ante errores transitorios,
+  - una lista ordenada de modelos de reserva,
+  - opcionalmente, una petición de cobertura (hedging): si el modelo
+    principal tarda más que su p95 reciente, se lanza la misma llamada al
+    siguiente modelo y se usa la primera respuesta que llegue.
+"""
+
+import asyncio
+import random
+import time
+from collections import defaultdict, deque
+from typing import Dict, List, Optional, Tuple
+
+from config import (
+    MODEL_NAME,
+    MODEL_FALLBACKS,
+    MODEL_TIMEOUT,
+    MODEL_DEADLINE,
+    MODEL_REINTENTOS,
+    MODEL_BACKOFF_BASE,
+    MODEL_BACKOFF_MAX,
+    MODEL_HEDGE,
+    MODEL_HEDGE_DELAY,
+)
+from tracing import tracer
+
+# Códigos HTTP que merece la pena reintentar
+_ESTADOS_TRANSITORIOS = {408, 425, 429, 500, 502, 503, 504}
+
+# Errores de red de aiohttp/httpx, por nombre para no depender de ellos
+_ERRORES_RED = {
+    "ClientConnectionError",
+    "ClientOSError",
+    "ServerDisconnectedError",
+    "ServerTimeoutError",
+    "ConnectError",
+    "ConnectTimeout",
+    "ReadError",
+    "ReadTimeout",
+    "RemoteProtocolError",
+    "PoolTimeout",
+}
+
+# Muestras mínimas antes de usar el p95 como retraso de la cobertura
+_MIN_MUESTRAS_P95 = 20
+
+
+def _estado_http(exc: Exception) -> Optional[int]:
+    estado = getattr(exc, "status_code", None)
+    if estado is None:
+        response = getattr(exc, "response", None)
+        estado = getattr(response, "status_code", None) or getattr(response, "status", None)
+    try:
+        return int(estado) if estado is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def es_transitorio(exc: Exception) -> bool:
+    """True si el error puede desaparecer reintentando la misma llamada."""
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    estado = _estado_http(exc)
+    if estado is not None:
+        return estado in _ESTADOS_TRANSITORIOS
+    return type(exc).__name__ in _ERRORES_RED
+
+
+class ModelCaller:
+    """
+    Ejecuta `client.chat_completion` de forma resiliente sobre una lista
+    ordenada de modelos. Es seguro compartirlo entre agentes del mismo
+    event loop (las latencias observadas se comparten).
+    """
+
+    def __init__(
+        self,
+        client,
+        modelos: Optional[List[str]] = None,
+        timeout: Optional[float] = MODEL_TIMEOUT,
+        deadline: float = MODEL_DEADLINE,
+        reintentos: int = MODEL_REINTENTOS,
+        backoff_base: float = MODEL_BACKOFF_BASE,
+        backoff_max: float = MODEL_BACKOFF_MAX,
+        hedge: bool = MODEL_HEDGE,
+        hedge_delay: float = MODEL_HEDGE_DELAY,
+    ):
+        self.client = client
+        self.modelos = modelos or [MODEL_NAME] + MODEL_FALLBACKS
+        self.timeout = timeout
+        self.deadline = deadline
+        self.reintentos = reintentos
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self._latencias: Dict[str, deque] = defaultdict(lambda: deque(maxlen=200))
+
+    # ---------- API pública ----------
+
+    async def llamar(self, messages: List[Dict], tools: Optional[List[Dict]] = None,
+                     **kwargs) -> Tuple[object, str]:
+        """
+        Llama al modelo y devuelve (respuesta, modelo que respondió).
+        Si todos los intentos fallan, relanza el último error.
+        """
+        limite = time.monotonic() + self.deadline
+        ultimo_error: Optional[Exception] = None
+
+        for i, modelo in enumerate(self.modelos):
+            alternativo = None
+            if self.hedge and i + 1 < len(self.modelos):
+                alternativo = self.modelos[i + 1]
+
+            for intento in range(self.reintentos + 1):
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    raise ultimo_error or asyncio.TimeoutError()
+                try:
+                    if alternativo is not None and intento == 0:
+                        return await self._con_cobertura(
+                            modelo, alternativo, messages, tools, restante, kwargs
+                        )
+                    respuesta = await self._intento(modelo, messages, tools, restante, kwargs)
+                    return respuesta, modelo
+                except Exception as e:
+                    ultimo_error = e
+                    if not es_transitorio(e):
+                        break
+                    if intento < self.reintentos:
+                        tracer.contar("modelo_reintentos")
+                        espera = self._backoff(intento)
+                        await asyncio.sleep(min(espera, max(0.0, limite - time.monotonic())))
+
+            if i + 1 < len(self.modelos):
+                tracer.contar("modelo_fallbacks")
+
+        raise ultimo_error
+
+    def p95(self, modelo: str) -> Optional[float]:
+        """p95 (s) de las últimas llamadas correctas al modelo, si hay muestras."""
+        muestras = sorted(self._latencias.get(modelo, ()))
+        if len(muestras) < _MIN_MUESTRAS_P95:
+            return None
+        return muestras[int(0.95 * (len(muestras) - 1))]
+
+    # ---------- Interno ----------
+
+    def _backoff(self, intento: int) -> float:
+        """Backoff exponencial con jitter completo."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** intento))
+
+    async def _intento(self, modelo: str, messages: List[Dict], tools: Optional[List[Dict]],
+                       restante: float, kwargs: Dict):
+        timeout = restante if self.timeout is None else min(self.timeout, restante)
+        inicio = time.perf_counter()
+        with tracer.span("modelo.intento", modelo=modelo) as s:
+            respuesta = await asyncio.wait_for(
+                self.client.chat_completion(
+                    messages=messages,
+                    model=modelo,
+                    tools=tools if tools else None,
+                    **kwargs,
+                ),
+                timeout,
+            )
+            s.set(ok=True)
+        self._latencias[modelo].append(time.perf_counter() - inicio)
+        return respuesta
+
+    async def _con_cobertura(self, modelo: str, alternativo: str, messages: List[Dict],
+                             tools: Optional[List[Dict]], restante: float, kwargs: Dict):
+        """
+        Lanza la llamada al modelo principal y, si no ha terminado tras su
+        p95, la misma llamada al alternativo. Gana la primera respuesta válida.
+        """
+        inicio = time.monotonic()
+        principal = asyncio.create_task(self._intento(modelo, messages, tools, restante, kwargs))
+        retraso = self.p95(modelo) or self.hedge_delay
+
+        try:
+            hechas, _ = await asyncio.wait({principal}, timeout=min(retraso, restante))
+        except BaseException:
+            principal.cancel()
+            raise
+        if hechas:
+            return principal.result(), modelo
+
+        tracer.contar("modelo_hedges")
+        restante -= time.monotonic() - inicio
+        cobertura = asyncio.create_task(
+            self._intento(alternativo, messages, tools, restante, kwargs)
+        )
+        pendientes = {principal: modelo, cobertura: alternativo}
+        error: Optional[BaseException] = None
+        try:
+            while pendientes:
+                hechas, _ = await asyncio.wait(pendientes, return_when=asyncio.FIRST_COMPLETED)
+                for tarea in hechas:
+                    nombre = pendientes.pop(tarea)
+                    if tarea.exception() is None:
+                        if tarea is cobertura:
+                            tracer.contar("modelo_hedges_ganados")
+                        return tarea.result(), nombre
+                    error = tarea.exception()
+            raise error
+        finally:
+            for tarea in pendientes:
+                tarea.cancel()
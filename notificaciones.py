@@ -0,0 +1,98 @@
+"""
+Versiones de los datos y avisos de cambios a los clientes MCP.
+
+Cada conjunto de datos se identifica con una URI de recurso MCP:
+  - datos://catalogo            horarios, profesores y aulas;
+  - datos://tareas/{usuario}    tareas de un usuario.
+
+Leer el recurso devuelve su versión actual (ver DataManager.version), y
+las herramientas de lectura que aceptan `if_version` responden solo
+{"sin_cambios": true, ...} cuando el cliente ya tiene esa versión.
+
+Además, los clientes pueden suscribirse a esas URIs con
+`subscriptions/listen` y el servidor les avisa (ResourceUpdated) cada vez
+que los datos cambian, así invalidan su caché sin preguntar. Si el SDK de
+MCP instalado no trae suscripciones, los avisos se desactivan y las
+consultas condicionales siguen funcionando.
+"""
+
+import asyncio
+import logging
+from typing import Optional
+from urllib.parse import quote, unquote
+
+from mcp import types
+
+try:
+    from mcp.server.subscriptions import InMemorySubscriptionBus, ListenHandler, ResourceUpdated
+except ImportError:  # SDK de MCP sin subscriptions/listen
+    InMemorySubscriptionBus = ListenHandler = ResourceUpdated = None
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+URI_CATALOGO = "datos://catalogo"
+PLANTILLA_TAREAS = "datos://tareas/{usuario}"
+
+AVISOS_ENVIADOS = REGISTRY.counter(
+    "mcp_avisos_cambio_total",
+    "Avisos de cambio de datos publicados a los clientes suscritos",
+    ("conjunto",),
+)
+
+
+def uri_datos(conjunto: str, usuario: Optional[str] = None) -> str:
+    """URI del recurso de un conjunto de datos ("catalogo" o "tareas")."""
+    if conjunto == "catalogo":
+        return URI_CATALOGO
+    return PLANTILLA_TAREAS.format(usuario=quote(usuario or "", safe=""))
+
+
+def usuario_de_uri(usuario: str) -> str:
+    """Usuario de la parte variable de datos://tareas/{usuario}."""
+    return unquote(usuario)
+
+
+class Notificador:
+    """
+    Publica ResourceUpdated a los clientes con `subscriptions/listen`
+    abierto.
+
+    Los cambios llegan desde los hilos de las herramientas; la publicación
+    se pasa al event loop del servidor, que se conoce cuando el primer
+    cliente abre su suscripción (antes no hay nadie a quien avisar).
+    """
+
+    def __init__(self):
+        self.activo = InMemorySubscriptionBus is not None
+        self._bus = InMemorySubscriptionBus() if self.activo else None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def registrar(self, mcp):
+        """Añade el método subscriptions/listen al servidor FastMCP."""
+        if not self.activo:
+            logger.info("El SDK de MCP no soporta subscriptions/listen: avisos desactivados")
+            return
+        handler = ListenHandler(self._bus)
+
+        async def escuchar(ctx, params):
+            self._loop = asyncio.get_running_loop()
+            return await handler(ctx, params)
+
+        mcp._mcp_server.add_request_handler(
+            "subscriptions/listen", types.SubscriptionsListenRequestParams, escuchar
+        )
+
+    def publicar(self, conjunto: str, usuario: Optional[str] = None):
+        """Avisa del cambio de un conjunto (se puede llamar desde cualquier hilo)."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        evento = ResourceUpdated(uri_datos(conjunto, usuario))
+        try:
+            asyncio.run_coroutine_threadsafe(self._bus.publish(evento), loop)
+        except RuntimeError:
+            # El loop se está cerrando
+            return
+        AVISOS_ENVIADOS.labels(conjunto).inc()
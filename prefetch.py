@@ -0,0 +1,158 @@
+"""
+Prefetch especulativo de herramientas de solo lectura.
+
+Para mensajes claramente de un grupo (tareas, horarios, calendario) la
+herramienta que pedirá el modelo es previsible. El prefetcher la lanza en
+paralelo con la primera llamada al modelo; si el modelo pide exactamente
+esa llamada (mismos argumentos, con los valores por defecto del schema
+rellenados) se usa el resultado ya obtenido. Si no, se descarta.
+
+Solo se adivinan herramientas de solo lectura, y el resultado se invalida
+si antes de usarlo se ejecuta cualquier herramienta que no lo sea.
+"""
+
+import asyncio
+import re
+import time
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from prompt_builder import ahora_local
+from tool_selector import ToolSelector
+from tracing import tracer
+from utils import sin_tildes
+
+# Herramientas sin efectos secundarios (las únicas que se pueden adelantar)
+TOOLS_SOLO_LECTURA = {
+    "consultar_horario",
+    "consultar_todos_horarios",
+    "consultar_asignatura",
+    "buscar_profesor",
+    "consultar_aula",
+    "listar_tareas",
+    "proximas_tareas",
+    "tareas_vencidas",
+    "buscar_tareas",
+    "mi_agenda",
+    "listar_eventos_calendario",
+}
+
+# Verbos que indican que el usuario quiere modificar algo
+_PATRON_ESCRITURA = re.compile(
+    r"\b(crea|crear|creame|apunta|apuntame|anade|agrega|pon|ponme|recuerdame|"
+    r"completa|completar|marca|marcar|borra|borrar|elimina|eliminar|quita|quitar|"
+    r"cancela|cancelar|mueve|cambia)\b"
+)
+
+
+def _con_defaults(parametros: Dict, args: Dict) -> Dict:
+    """Argumentos con los valores por defecto del schema rellenados."""
+    completos = {
+        nombre: prop["default"]
+        for nombre, prop in parametros.get("properties", {}).items()
+        if "default" in prop
+    }
+    completos.update(args)
+    return completos
+
+
+class Prefetch:
+    """
+    Llamada adelantada en curso durante un turno. Se usa (`consumir`) o
+    se descarta (`descartar`) una sola vez; después deja de coincidir.
+    """
+
+    __slots__ = ("nombre", "args", "parametros", "tarea", "inicio", "fin", "activo")
+
+    def __init__(self, nombre: str, args: Dict, parametros: Dict, tarea: asyncio.Task):
+        self.nombre = nombre
+        self.args = _con_defaults(parametros, args)
+        self.parametros = parametros
+        self.tarea = tarea
+        self.inicio = time.perf_counter()
+        self.fin: Optional[float] = None
+        self.activo = True
+        tarea.add_done_callback(self._terminada)
+
+    def _terminada(self, _tarea):
+        self.fin = time.perf_counter()
+
+    def coincide(self, nombre: str, args: Dict) -> bool:
+        return self.activo and nombre == self.nombre and _con_defaults(self.parametros, args) == self.args
+
+    async def consumir(self) -> str:
+        """Espera (si hace falta) el resultado y registra el tiempo ahorrado."""
+        self.activo = False
+        ahorrado = (self.fin or time.perf_counter()) - self.inicio
+        resultado = await self.tarea
+        tracer.contar("prefetch_aciertos")
+        tracer.contar("prefetch_ms_ahorrados", ahorrado * 1000)
+        return resultado
+
+    def descartar(self):
+        if not self.activo:
+            return
+        self.activo = False
+        if not self.tarea.done():
+            self.tarea.cancel()
+        tracer.contar("prefetch_descartados")
+
+
+class Prefetcher:
+    """Decide qué herramienta adelantar para cada mensaje."""
+
+    def __init__(self, selector: Optional[ToolSelector] = None):
+        self.selector = selector or ToolSelector()
+
+    def adivinar(self, mensaje: str) -> Optional[Tuple[str, Dict]]:
+        """(herramienta, argumentos) más probable, o None si no está claro."""
+        texto = sin_tildes(mensaje)
+        if _PATRON_ESCRITURA.search(texto):
+            return None
+
+        grupos = self.selector.grupos_relevantes(mensaje)
+        if len(grupos) != 1:
+            return None
+        grupo = grupos.pop()
+
+        if grupo == "tareas":
+            if re.search(r"\btodas\b", texto):
+                return "listar_tareas", {"filtro": "todas"}
+            if re.search(r"\b(completadas|hechas|terminadas)\b", texto):
+                return "listar_tareas", {"filtro": "completadas"}
+            return "listar_tareas", {}
+
+        if grupo == "horarios" and re.search(r"\bhorarios?\b", texto):
+            return "consultar_todos_horarios", {}
+
+        if grupo == "calendario":
+            dias = {"hoy": 0, "manana": 1}
+            for palabra, delta in dias.items():
+                if re.search(rf"\b{palabra}\b", texto):
+                    dia = (ahora_local() + timedelta(days=delta)).strftime("%Y-%m-%d")
+                    return "listar_eventos_calendario", {
+                        "fecha_inicio": f"{dia} 00:00",
+                        "fecha_fin": f"{dia} 23:59",
+                    }
+
+        return None
+
+    def iniciar(self, mensaje: str, tools: List[Dict],
+                ejecutar: Callable[[str, Dict], Awaitable[str]]) -> Optional[Prefetch]:
+        """Lanza la herramienta adivinada si está entre las de este turno."""
+        guess = self.adivinar(mensaje)
+        if guess is None:
+            return None
+        nombre, args = guess
+        if nombre not in TOOLS_SOLO_LECTURA:
+            return None
+
+        parametros = next(
+            (t["function"]["parameters"] for t in tools if t["function"]["name"] == nombre),
+            None,
+        )
+        if parametros is None:
+            return None
+
+        tracer.contar("prefetch_lanzados")
+        return Prefetch(nombre, args, parametros, asyncio.create_task(ejecutar(nombre, args)))
@@ -0,0 +1,128 @@
+"""
+Construcción de los mensajes que se envían al modelo.
+
+Los mensajes se ordenan de forma que el principio del prompt (esquemas de
+herramientas + prompt de sistema + historial) sea idéntico byte a byte
+entre peticiones consecutivas y la caché de prefijos del servidor pueda
+reutilizarlo. Lo que cambia con el tiempo (la fecha, y la hora solo si el
+mensaje la necesita) va en un mensaje de sistema al final.
+
+`PrefijoEstable` compara cada petición con la anterior y registra en las
+trazas qué parte del prompt coincide, para poder comprobar la reutilización.
+Si cambia el bloque de herramientas (con TOOLS_SELECCION_POR_TURNO=1) no
+se reutiliza nada; se cuenta aparte y /stats lo marca como fallo.
+"""
+
+import hashlib
+import json
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from config import SYSTEM_PROMPT, TIMEZONE
+from tracing import tracer
+from utils import sin_tildes
+
+
+# Prompt de sistema fijo: no debe incluir nada que cambie entre peticiones
+PROMPT_ESTATICO = (
+    SYSTEM_PROMPT
+    + "\n\nLa fecha actual se indica en el último mensaje de sistema. "
+    "Cuando el usuario use palabras como 'hoy', 'mañana' o "
+    "'pasado mañana', debes convertirlas SIEMPRE a fechas "
+    "completas en formato 'YYYY-MM-DD HH:MM' usando esa "
+    "fecha como referencia. "
+    "Nunca pongas años anteriores al año actual salvo que "
+    "el usuario lo pida explícitamente."
+)
+
+_DIAS_SEMANA = ["lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo"]
+
+# Expresiones que requieren conocer la hora (no solo el día)
+_PATRON_HORA = re.compile(
+    r"\b(hora|horas|ahora|minutos?|luego|despues|"
+    r"esta (manana|tarde|noche)|dentro de|en un rato)\b|\d{1,2}:\d{2}"
+)
+
+
+def necesita_hora(mensaje: Optional[str]) -> bool:
+    """True si el mensaje habla de horas o de plazos relativos a ahora."""
+    if not mensaje:
+        return False
+    return _PATRON_HORA.search(sin_tildes(mensaje)) is not None
+
+
+def ahora_local() -> datetime:
+    """Fecha y hora actuales en TIMEZONE."""
+    # Manejo robusto de zona horaria
+    try:
+        return datetime.now(ZoneInfo(TIMEZONE))
+    except Exception:
+        # Si la zona no existe en el sistema, usa hora local sin zona
+        return datetime.now()
+
+
+def contexto_volatil(incluir_hora: bool = False) -> Dict[str, str]:
+    """Mensaje de sistema final con la fecha (y la hora si se pide)."""
+    ahora = ahora_local()
+    texto = f"Fecha actual: {ahora:%Y-%m-%d} ({_DIAS_SEMANA[ahora.weekday()]})."
+    if incluir_hora:
+        texto += f" Hora actual: {ahora:%H:%M}."
+    return {"role": "system", "content": texto}
+
+
+def construir_mensajes(historial: List[Dict], user_message: Optional[str] = None,
+                       incluir_hora: bool = False) -> List[Dict]:
+    """[sistema fijo] + historial + [usuario] + [contexto volátil]."""
+    messages: List[Dict] = [{"role": "system", "content": PROMPT_ESTATICO}]
+    messages.extend(historial)
+    if user_message:
+        messages.append({"role": "user", "content": user_message})
+    messages.append(contexto_volatil(incluir_hora))
+    return messages
+
+
+# ==========================
+# MEDICIÓN DEL PREFIJO ESTABLE
+# ==========================
+
+def _segmentos(messages: List[Dict], tools: Optional[List[Dict]]) -> List[Tuple[bytes, int]]:
+    """(hash, tamaño en bytes) de cada segmento del prompt, en orden."""
+    partes = [tools or []] + list(messages)
+    segmentos = []
+    for parte in partes:
+        datos = json.dumps(parte, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        segmentos.append((hashlib.sha256(datos).digest(), len(datos)))
+    return segmentos
+
+
+class PrefijoEstable:
+    """
+    Mide, para cada petición, cuántos bytes iniciales del prompt coinciden
+    con la petición anterior del mismo agente (a nivel de segmento: las
+    herramientas y cada mensaje).
+    """
+
+    __slots__ = ("_previos",)
+
+    def __init__(self):
+        self._previos: List[Tuple[bytes, int]] = []
+
+    def medir(self, messages: List[Dict], tools: Optional[List[Dict]]) -> Tuple[int, int]:
+        """Devuelve (bytes del prefijo estable, bytes totales) y los registra."""
+        actuales = _segmentos(messages, tools)
+        if self._previos and self._previos[0][0] != actuales[0][0]:
+            # El bloque de herramientas es el primer segmento: todo el prompt cambia
+            tracer.contar("prompt_tools_cambiadas")
+        estables = 0
+        for previo, actual in zip(self._previos, actuales):
+            if previo[0] != actual[0]:
+                break
+            estables += actual[1]
+        total = sum(n for _, n in actuales)
+        self._previos = actuales
+
+        tracer.contar("prompt_bytes", total)
+        tracer.contar("prompt_bytes_prefijo_estable", estables)
+        return estables, total
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Benchmark de memoria y tiempo de carga del catálogo.
+
+Genera un catálogo sintético de `--filas` horarios (con los nombres de
+asignaturas, profesores y aulas repetidos como en una universidad real) y
+lo carga de tres formas, cada una en su propio proceso para medir la
+memoria residente sin interferencias:
+
+  - dicts:    json.loads, la representación anterior (dicts anidados);
+  - compacto: catalogo.cargar_catalogo leyendo el fichero con json;
+  - ijson:    catalogo.cargar_catalogo en streaming (requiere ijson).
+
+Para cada forma se muestra el tiempo de carga, la memoria residente que
+queda ocupada (RSS) y el pico, y el tamaño de los objetos Python que
+quedan vivos (heap, medido con tracemalloc en otra ejecución). Con json
+el RSS no baja aunque el heap sí: el intérprete no devuelve al sistema la
+memoria de los dicts temporales.
+
+Ejemplo:
+    python scripts/bench_catalogo.py --filas 100000
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+MODOS = ("dicts", "compacto", "ijson")
+DIAS = ("Lunes", "Martes", "Miércoles", "Jueves", "Viernes")
+
+
+def generar(ruta: Path, filas: int, semilla: int = 1):
+    """Escribe un catálogo con `filas` horarios y sus profesores y aulas."""
+    rnd = random.Random(semilla)
+    asignaturas = [f"Asignatura de Ingeniería {i}" for i in range(max(1, filas // 20))]
+    profesores = [f"Dr. Profesor Número {i}" for i in range(max(1, filas // 50))]
+    aulas = [f"{'ABCDEFGH'[i % 8]}-{100 + i}" for i in range(max(1, filas // 125))]
+    catalogo = {
+        "horarios": [
+            {
+                "asignatura": rnd.choice(asignaturas),
+                "dia": rnd.choice(DIAS),
+                "hora_inicio": f"{rnd.randint(8, 19):02d}:00",
+                "hora_fin": f"{rnd.randint(9, 21):02d}:00",
+                "aula": rnd.choice(aulas),
+                "profesor": rnd.choice(profesores),
+            }
+            for _ in range(filas)
+        ],
+        "profesores": [
+            {"nombre": p, "departamento": "Informática", "email": f"p{i}@universidad.es",
+             "despacho": "Edificio A", "tutorias": "Martes 15:00-17:00"}
+            for i, p in enumerate(profesores)
+        ],
+        "aulas": [
+            {"codigo": a, "edificio": "Edificio A", "capacidad": 40,
+             "equipamiento": ["Proyector", "Pizarra digital"]}
+            for a in aulas
+        ],
+    }
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(catalogo, f, ensure_ascii=False, indent=2)
+
+
+def _rss_mb():
+    """Memoria residente actual del proceso en MB (None si no se puede leer)."""
+    try:
+        with open("/proc/self/statm") as f:
+            paginas = int(f.read().split()[1])
+        return paginas * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _pico_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 2**20 if sys.platform == "darwin" else pico / 2**10
+
+
+def medir(modo: str, ruta: Path, heap: bool = False) -> dict:
+    """Carga el catálogo en este proceso y devuelve tiempo y memoria."""
+    from catalogo import cargar_catalogo
+
+    if heap:
+        import tracemalloc
+        tracemalloc.start()
+    gc.collect()
+    antes = _rss_mb()
+    inicio = time.perf_counter()
+    if modo == "dicts":
+        with open(ruta, "rb") as f:
+            catalogo = json.loads(f.read())
+        filas = len(catalogo["horarios"])
+    else:
+        catalogo, _ = cargar_catalogo(ruta, streaming=(modo == "ijson"))
+        filas = len(catalogo.horarios)
+    segundos = time.perf_counter() - inicio
+    gc.collect()
+    despues = _rss_mb()
+    if heap:
+        return {"heap_mb": round(tracemalloc.get_traced_memory()[0] / 2**20, 1)}
+    return {
+        "modo": modo,
+        "filas": filas,
+        "carga_s": round(segundos, 3),
+        "rss_mb": round(despues - antes, 1) if antes is not None else None,
+        "pico_mb": round(_pico_mb(), 1) if _pico_mb() is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--filas", type=int, default=100_000)
+    parser.add_argument("--medir", choices=MODOS, help=argparse.SUPPRESS)
+    parser.add_argument("--ruta", help=argparse.SUPPRESS)
+    parser.add_argument("--heap", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        print(json.dumps(medir(args.medir, Path(args.ruta), args.heap)))
+        return
+
+    try:
+        import ijson  # noqa: F401
+        modos = MODOS
+    except ImportError:
+        print("ijson no está instalado: se omite la carga en streaming")
+        modos = MODOS[:2]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = Path(tmp) / "universidad.json"
+        generar(ruta, args.filas)
+        print(f"Catálogo: {args.filas} horarios, {ruta.stat().st_size / 2**20:.1f} MB en disco\n")
+
+        def proceso(modo, *extra):
+            salida = subprocess.run(
+                [sys.executable, __file__, "--medir", modo, "--ruta", str(ruta), *extra],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            return json.loads(salida.strip().splitlines()[-1])
+
+        print(f"{'modo':<10} {'carga (s)':>10} {'RSS (MB)':>10} {'pico (MB)':>10} {'heap (MB)':>10}")
+        for modo in modos:
+            r = proceso(modo)
+            r.update(proceso(modo, "--heap"))
+            print(f"{r['modo']:<10} {r['carga_s']:>10.2f} {r['rss_mb'] or '-':>10} "
+                  f"{r['pico_mb'] or '-':>10} {r['heap_mb']:>10}")
+
+
+if __name__ == "__main__":
+    main()
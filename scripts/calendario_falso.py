@@ -0,0 +1,136 @@
+"""
+Servicio de Google Calendar simulado para pruebas locales y de carga.
+
+Imita la parte de la API que usa `GoogleCalendarClient`
+(`service.events().list/insert/delete(...).execute()`, con páginas y
+nextPageToken al listar) con eventos en memoria por calendario y una latencia configurable por calendario, sin
+red ni credenciales. Se puede compartir entre hilos.
+
+Ejemplo:
+    from calendario_falso import ServicioCalendarioFalso
+    servicio = ServicioCalendarioFalso(latencias={"examenes": 0.5})
+    cliente = GoogleCalendarClient(service=servicio, calendar_ids=["primary", "examenes"])
+"""
+
+import itertools
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+# Máximo de eventos por página que devuelve la API
+MAX_PAGINA = 2500
+
+
+class _Peticion:
+    def __init__(self, ejecutar):
+        self._ejecutar = ejecutar
+
+    def execute(self):
+        return self._ejecutar()
+
+
+class _Eventos:
+    def __init__(self, servicio: "ServicioCalendarioFalso"):
+        self._s = servicio
+
+    def list(self, calendarId, timeMin, timeMax, maxResults=250, singleEvents=True,
+             orderBy="startTime", pageToken=None):
+        def ejecutar():
+            self._s._esperar(calendarId)
+            with self._s._lock:
+                items = [
+                    e for e in self._s.eventos.get(calendarId, [])
+                    if timeMin <= _inicio(e)[:19] <= timeMax
+                ]
+            items.sort(key=_inicio)
+            # Como la API: como mucho MAX_PAGINA eventos y un token para seguir
+            inicio = int(pageToken or 0)
+            fin = inicio + min(maxResults, MAX_PAGINA)
+            respuesta = {"items": items[inicio:fin]}
+            if fin < len(items):
+                respuesta["nextPageToken"] = str(fin)
+            return respuesta
+        return _Peticion(ejecutar)
+
+    def insert(self, calendarId, body):
+        def ejecutar():
+            self._s._esperar(calendarId)
+            return self._s.agregar(calendarId, body)
+        return _Peticion(ejecutar)
+
+    def delete(self, calendarId, eventId):
+        def ejecutar():
+            self._s._esperar(calendarId)
+            with self._s._lock:
+                eventos = self._s.eventos.get(calendarId, [])
+                self._s.eventos[calendarId] = [e for e in eventos if e["id"] != eventId]
+            return ""
+        return _Peticion(ejecutar)
+
+
+def _inicio(evento: Dict) -> str:
+    return evento["start"].get("dateTime") or evento["start"].get("date")
+
+
+class ServicioCalendarioFalso:
+    """
+    Calendarios simulados.
+
+    Args:
+        latencia: Segundos que tarda cada petición.
+        latencias: Latencia específica de algunos calendarios.
+        jitter: Variación máxima (+/-) sobre la latencia, en segundos.
+        calendarios_caidos: Calendarios cuyas peticiones fallan siempre.
+    """
+
+    def __init__(
+        self,
+        latencia: float = 0.0,
+        latencias: Optional[Dict[str, float]] = None,
+        jitter: float = 0.0,
+        calendarios_caidos: Optional[set] = None,
+    ):
+        self.latencia = latencia
+        self.latencias = latencias or {}
+        self.jitter = jitter
+        self.calendarios_caidos = calendarios_caidos or set()
+        self.eventos: Dict[str, List[Dict]] = {}
+        self.peticiones = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def events(self) -> _Eventos:
+        return _Eventos(self)
+
+    def _esperar(self, calendar_id: str):
+        with self._lock:
+            self.peticiones += 1
+        latencia = self.latencias.get(calendar_id, self.latencia)
+        if self.jitter:
+            latencia += random.uniform(-self.jitter, self.jitter)
+        if latencia > 0:
+            time.sleep(latencia)
+        if calendar_id in self.calendarios_caidos:
+            raise RuntimeError(f"Calendario {calendar_id} no disponible (simulado)")
+
+    def agregar(self, calendar_id: str, body: Dict) -> Dict:
+        """Guarda un evento con el formato de la API y lo devuelve."""
+        evento = dict(body)
+        evento["id"] = f"ev{next(self._ids)}"
+        evento["htmlLink"] = f"https://calendar.invalid/{evento['id']}"
+        with self._lock:
+            self.eventos.setdefault(calendar_id, []).append(evento)
+        return evento
+
+    def poblar(self, calendar_id: str, desde: datetime, n: int, cada: timedelta,
+               titulo: str = "Evento", zona: str = "+00:00"):
+        """Crea n eventos de una hora en un calendario, uno cada `cada`."""
+        for i in range(n):
+            inicio = desde + i * cada
+            self.agregar(calendar_id, {
+                "summary": f"{titulo} {i}",
+                "start": {"dateTime": inicio.strftime("%Y-%m-%dT%H:%M:%S") + zona},
+                "end": {"dateTime": (inicio + timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%S") + zona},
+            })
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga del servicio HTTP de chat contra un modelo simulado.
+
+Lanza `--clientes` conversaciones concurrentes, cada una con su propia
+sesión, que envían `--mensajes` mensajes seguidos. Informa del
+throughput, la latencia (p50/p95/p99) y las respuestas 429.
+
+Ejemplo:
+    python scripts/loadtest_chat.py --clientes 200 --mensajes 5 --workers 16
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx  # noqa: E402
+
+from agent import AsyncQwenAgent  # noqa: E402
+from chat_server import crear_app  # noqa: E402
+from stub_modelo import StubModelo  # noqa: E402
+from utils import percentil  # noqa: E402
+
+
+async def cliente(http: httpx.AsyncClient, n_mensajes: int, latencias, estados):
+    session_id = None
+    for i in range(n_mensajes):
+        body = {"mensaje": f"Mensaje {i} de prueba"}
+        if session_id:
+            body["session_id"] = session_id
+        inicio = time.perf_counter()
+        r = await http.post("/chat", json=body)
+        latencias.append(time.perf_counter() - inicio)
+        estados[r.status_code] = estados.get(r.status_code, 0) + 1
+        if r.status_code == 200:
+            session_id = r.json()["session_id"]
+
+
+async def ejecutar(args):
+    agente = AsyncQwenAgent(client=StubModelo(args.latencia, args.jitter))
+    app = crear_app(
+        agente,
+        workers=args.workers,
+        max_cola=args.cola,
+        cola_timeout=args.cola_timeout,
+        max_sesiones=args.max_sesiones,
+    )
+
+    latencias, estados = [], {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest",
+                                 timeout=None) as http:
+        inicio = time.perf_counter()
+        await asyncio.gather(*[
+            cliente(http, args.mensajes, latencias, estados)
+            for _ in range(args.clientes)
+        ])
+        duracion = time.perf_counter() - inicio
+
+    total = len(latencias)
+    ok = estados.get(200, 0)
+    print(f"Peticiones:   {total} en {duracion:.2f}s")
+    print(f"Throughput:   {total / duracion:.1f} req/s ({ok / duracion:.1f} respuestas OK/s)")
+    print(f"Estados HTTP: {dict(sorted(estados.items()))}")
+    print(
+        "Latencia:     "
+        f"p50={percentil(latencias, 50) * 1000:.0f}ms "
+        f"p95={percentil(latencias, 95) * 1000:.0f}ms "
+        f"p99={percentil(latencias, 99) * 1000:.0f}ms "
+        f"max={max(latencias, default=0) * 1000:.0f}ms"
+    )
+    print(f"Sesiones vivas: {len(app.state.sesiones)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clientes", type=int, default=100)
+    parser.add_argument("--mensajes", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--cola", type=int, default=32)
+    parser.add_argument("--cola-timeout", type=float, default=30.0)
+    parser.add_argument("--max-sesiones", type=int, default=1000)
+    parser.add_argument("--latencia", type=float, default=0.2,
+                        help="Latencia media del modelo simulado (s)")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    asyncio.run(ejecutar(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
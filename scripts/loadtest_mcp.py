@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga del servidor MCP por HTTP con datos temporales.
+
+Arranca mcp_server.py en un subproceso con un directorio de datos
+temporal (el catálogo de ejemplo o uno sintético de `--filas` horarios) y
+Google Calendar simulado (scripts/calendario_falso.py), así que funciona
+sin red ni credenciales. Después lanza, por etapas de concurrencia
+creciente (`--etapas`), tantos clientes MCP simultáneos como indica la
+etapa; cada uno llama sin pausa a herramientas elegidas según `--mezcla`
+durante `--duracion` segundos. Con `--procesos` los clientes se reparten
+entre varios procesos para que el generador no sea el cuello de botella
+(en una máquina con un solo núcleo, generador y servidor compiten por la
+CPU y las cifras son una cota inferior).
+
+Por etapa y herramienta informa de las llamadas, el throughput, la
+latencia (p50/p95/p99) y el porcentaje de errores, además de las llamadas
+unificadas y rechazadas por el servidor (de /metrics). Con `--json` guarda
+también el informe en JSON.
+
+Ejemplo:
+    python scripts/loadtest_mcp.py --etapas 1,10,50 --duracion 10 --json informe.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from utils import percentil  # noqa: E402
+
+MEZCLA_POR_DEFECTO = (
+    "consultar_todos_horarios=3,consultar_asignatura=3,buscar_profesor=1,"
+    "listar_tareas=3,crear_tarea=1,listar_eventos_calendario=2"
+)
+# Métricas del servidor que se muestran por etapa (suma de todas sus series)
+METRICAS_SERVIDOR = {
+    "unificadas": "mcp_tool_unificadas_total",
+    "rechazadas": "mcp_grupo_rechazadas_total",
+}
+
+
+# ========== SERVIDOR (SUBPROCESO) ==========
+
+def servir(port: int, latencia_calendario: float):
+    """Arranca el servidor MCP con el calendario simulado (se ejecuta en el subproceso)."""
+    import mcp_server
+    from calendario_falso import ServicioCalendarioFalso
+    from google_calendar_client import GoogleCalendarClient
+
+    servicio = ServicioCalendarioFalso(latencia=latencia_calendario,
+                                       jitter=latencia_calendario / 2)
+    lunes = datetime.combine(date.today() - timedelta(days=date.today().weekday()),
+                             datetime.min.time())
+    servicio.poblar("primary", lunes.replace(hour=8), 60, timedelta(hours=7))
+    mcp_server.calendar_client = GoogleCalendarClient(service=servicio,
+                                                      calendar_ids=["primary"])
+    mcp_server.mcp.run(transport="http", host="127.0.0.1", port=port,
+                       show_banner=False, log_level="warning")
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def arrancar_servidor(args, datos: Path, log) -> tuple:
+    """Lanza el subproceso del servidor y espera a que responda."""
+    import httpx
+
+    port = _puerto_libre()
+    env = dict(os.environ, DATA_DIR=str(datos), TRACE_FILE="", PYTHONPATH=str(RAIZ))
+    proceso = subprocess.Popen(
+        [sys.executable, __file__, "--servidor", "--port", str(port),
+         "--latencia-calendario", str(args.latencia_calendario)],
+        cwd=RAIZ, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    base = f"http://127.0.0.1:{port}"
+    limite = time.monotonic() + 60
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"El servidor terminó con código {proceso.returncode}")
+        try:
+            if httpx.get(f"{base}/metrics", timeout=1).status_code == 200:
+                return proceso, base
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proceso.terminate()
+    raise RuntimeError("El servidor no respondió en 60s")
+
+
+def metricas_servidor(base: str) -> dict:
+    import httpx
+
+    texto = httpx.get(f"{base}/metrics", timeout=5).text
+    totales = dict.fromkeys(METRICAS_SERVIDOR, 0.0)
+    for linea in texto.splitlines():
+        for clave, metrica in METRICAS_SERVIDOR.items():
+            if linea.startswith(metrica + "{") or linea.startswith(metrica + " "):
+                totales[clave] += float(linea.rsplit(" ", 1)[1])
+    return totales
+
+
+# ========== CLIENTES ==========
+
+def parsear_mezcla(texto: str) -> dict:
+    mezcla = {}
+    for parte in texto.split(","):
+        nombre, _, peso = parte.partition("=")
+        mezcla[nombre.strip()] = float(peso or 1)
+    return mezcla
+
+
+class Generador:
+    """Argumentos aleatorios (pero válidos) para cada herramienta."""
+
+    def __init__(self, catalogo: dict, usuarios: int, rnd: random.Random):
+        self.asignaturas = sorted({h["asignatura"] for h in catalogo.get("horarios", [])}) or ["x"]
+        self.profesores = [p["nombre"] for p in catalogo.get("profesores", [])] or ["x"]
+        self.usuarios = [f"carga{i}" for i in range(usuarios)]
+        self.rnd = rnd
+        self.lunes = date.today() - timedelta(days=date.today().weekday())
+
+    def __call__(self, tool: str) -> dict:
+        r = self.rnd
+        if tool == "consultar_asignatura" or tool == "consultar_horario":
+            return {"asignatura": r.choice(self.asignaturas)}
+        if tool == "buscar_profesor":
+            return {"nombre": r.choice(self.profesores).split()[-1]}
+        if tool in ("listar_tareas", "proximas_tareas", "tareas_vencidas"):
+            return {"usuario": r.choice(self.usuarios)}
+        if tool == "buscar_tareas":
+            return {"consulta": "práctica entrega", "usuario": r.choice(self.usuarios)}
+        if tool == "crear_tarea":
+            vence = self.lunes + timedelta(days=r.randint(0, 60))
+            return {"titulo": f"Práctica {r.randint(1, 999)}",
+                    "fecha_vencimiento": vence.isoformat(),
+                    "usuario": r.choice(self.usuarios)}
+        if tool == "listar_eventos_calendario":
+            dia = self.lunes + timedelta(days=r.randint(0, 6))
+            return {"fecha_inicio": f"{dia} 00:00", "fecha_fin": f"{dia} 23:59",
+                    "max_resultados": 20}
+        if tool == "mi_agenda":
+            dia = self.lunes + timedelta(days=r.randint(0, 6))
+            return {"fecha_inicio": dia.isoformat(), "usuario": r.choice(self.usuarios)}
+        return {}
+
+
+async def cliente(url: str, mezcla: dict, generador: Generador, t_inicio: float,
+                  t_fin: float, muestras: dict, timeout: float):
+    from fastmcp import Client
+
+    tools = list(mezcla)
+    pesos = list(mezcla.values())
+    async with Client(url, timeout=timeout) as c:
+        # Las conexiones se abren antes de empezar a medir
+        await asyncio.sleep(max(0.0, t_inicio - time.time()))
+        while time.time() < t_fin:
+            tool = generador.rnd.choices(tools, pesos)[0]
+            argumentos = generador(tool)
+            t0 = time.perf_counter()
+            try:
+                resultado = await c.call_tool(tool, argumentos, raise_on_error=False)
+                error = resultado.is_error
+            except Exception:
+                error = True
+            latencias, errores = muestras.setdefault(tool, ([], [0]))
+            latencias.append(time.perf_counter() - t0)
+            errores[0] += error
+
+
+async def generar_carga(url: str, clientes: int, primer_cliente: int, args, mezcla: dict,
+                        catalogo: dict, t_inicio: float, t_fin: float) -> tuple:
+    """Ejecuta `clientes` clientes entre t_inicio y t_fin (hora de reloj) y devuelve sus muestras."""
+    muestras: dict = {}
+    resultados = await asyncio.gather(*[
+        cliente(url, mezcla,
+                Generador(catalogo, args.usuarios, random.Random(args.semilla + primer_cliente + i)),
+                t_inicio, t_fin, muestras, args.timeout)
+        for i in range(clientes)
+    ], return_exceptions=True)
+    fallidos = sum(isinstance(r, BaseException) for r in resultados)
+    return {tool: (lat, err[0]) for tool, (lat, err) in muestras.items()}, fallidos
+
+
+async def generar_en_procesos(url: str, concurrencia: int, args, t_inicio: float,
+                              t_fin: float, catalogo_json: Path) -> tuple:
+    """Reparte los clientes de una etapa entre `--procesos` subprocesos."""
+    procesos = min(args.procesos, concurrencia)
+    reparto = [concurrencia // procesos + (i < concurrencia % procesos) for i in range(procesos)]
+    hijos = []
+    primer_cliente = 0
+    for clientes in reparto:
+        hijos.append(await asyncio.create_subprocess_exec(
+            sys.executable, __file__, "--generador", "--url", url, "--catalogo", str(catalogo_json),
+            "--clientes", str(clientes), "--primer-cliente", str(primer_cliente),
+            "--t-inicio", repr(t_inicio), "--t-fin", repr(t_fin),
+            "--mezcla", args.mezcla, "--usuarios", str(args.usuarios),
+            "--semilla", str(args.semilla), "--timeout", str(args.timeout),
+            stdout=subprocess.PIPE,
+        ))
+        primer_cliente += clientes
+
+    muestras: dict = {}
+    fallidos = 0
+    for hijo in hijos:
+        salida, _ = await hijo.communicate()
+        parcial = json.loads(salida.decode().strip().splitlines()[-1])
+        fallidos += parcial["fallidos"]
+        for tool, (latencias, errores) in parcial["muestras"].items():
+            total = muestras.setdefault(tool, ([], 0))
+            muestras[tool] = (total[0] + latencias, total[1] + errores)
+    return muestras, fallidos
+
+
+async def etapa(url: str, base: str, concurrencia: int, args, mezcla: dict,
+                catalogo: dict, catalogo_json: Path) -> dict:
+    """Ejecuta una etapa con `concurrencia` clientes y devuelve su informe."""
+    t_inicio = time.time() + min(10.0, 1.0 + concurrencia * 0.02)
+    t_fin = t_inicio + args.duracion
+    if args.procesos > 1:
+        carga = asyncio.create_task(generar_en_procesos(url, concurrencia, args, t_inicio,
+                                                        t_fin, catalogo_json))
+    else:
+        carga = asyncio.create_task(generar_carga(url, concurrencia, 0, args, mezcla, catalogo,
+                                                  t_inicio, t_fin))
+    await asyncio.sleep(max(0.0, t_inicio - time.time()))
+    antes = await asyncio.to_thread(metricas_servidor, base)
+    muestras, fallidos = await carga
+    duracion = max(args.duracion, time.time() - t_inicio)
+    despues = await asyncio.to_thread(metricas_servidor, base)
+
+    tools = {}
+    todas, errores_total = [], 0
+    for tool, (latencias, errores) in sorted(muestras.items()):
+        todas.extend(latencias)
+        errores_total += errores
+        tools[tool] = _resumen(latencias, errores, duracion)
+    return {
+        "concurrencia": concurrencia,
+        "duracion_s": round(duracion, 2),
+        "clientes_fallidos": fallidos,
+        "tools": tools,
+        "total": _resumen(todas, errores_total, duracion),
+        "servidor": {k: despues[k] - antes[k] for k in METRICAS_SERVIDOR},
+    }
+
+
+def _resumen(latencias, errores: int, duracion: float) -> dict:
+    n = len(latencias)
+    return {
+        "llamadas": n,
+        "rps": round(n / duracion, 1) if duracion else 0.0,
+        "p50_ms": round(percentil(latencias, 50) * 1000, 1),
+        "p95_ms": round(percentil(latencias, 95) * 1000, 1),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 1),
+        "errores_pct": round(100 * errores / n, 2) if n else 0.0,
+    }
+
+
+def imprimir(informe: dict):
+    print(f"\n== Concurrencia {informe['concurrencia']} "
+          f"({informe['duracion_s']}s, unificadas={informe['servidor']['unificadas']:.0f}, "
+          f"rechazadas={informe['servidor']['rechazadas']:.0f}"
+          + (f", clientes fallidos={informe['clientes_fallidos']}" if informe["clientes_fallidos"] else "")
+          + ") ==")
+    print(f"{'herramienta':<28} {'llamadas':>9} {'req/s':>8} {'p50 ms':>8} "
+          f"{'p95 ms':>8} {'p99 ms':>8} {'errores':>8}")
+    filas = list(informe["tools"].items()) + [("TOTAL", informe["total"])]
+    for tool, r in filas:
+        print(f"{tool:<28} {r['llamadas']:>9} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} "
+              f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['errores_pct']:>7.2f}%")
+
+
+async def ejecutar(args, url: str, base: str, catalogo_json: Path) -> list:
+    mezcla = parsear_mezcla(args.mezcla)
+    with open(catalogo_json, "r", encoding="utf-8") as f:
+        catalogo = json.load(f)
+    informes = []
+    for concurrencia in [int(c) for c in args.etapas.split(",")]:
+        informe = await etapa(url, base, concurrencia, args, mezcla, catalogo, catalogo_json)
+        imprimir(informe)
+        informes.append(informe)
+    return informes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--etapas", default="1,5,10,25,50",
+                        help="Clientes simultáneos de cada etapa, separados por comas")
+    parser.add_argument("--duracion", type=float, default=10.0,
+                        help="Segundos de cada etapa")
+    parser.add_argument("--mezcla", default=MEZCLA_POR_DEFECTO,
+                        help="Herramientas y pesos (tool=peso,...)")
+    parser.add_argument("--usuarios", type=int, default=50,
+                        help="Usuarios distintos en las herramientas de tareas")
+    parser.add_argument("--filas", type=int, default=0,
+                        help="Horarios de un catálogo sintético (0 = el de ejemplo)")
+    parser.add_argument("--latencia-calendario", type=float, default=0.05,
+                        help="Latencia media del calendario simulado (s)")
+    parser.add_argument("--timeout", type=float, default=30.0,
+                        help="Timeout de cada llamada (s)")
+    parser.add_argument("--procesos", type=int, default=1,
+                        help="Procesos entre los que se reparten los clientes")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--json", help="Fichero donde guardar el informe en JSON")
+    # Modos internos: servidor y generador de carga en subprocesos
+    parser.add_argument("--servidor", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--generador", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    parser.add_argument("--catalogo", help=argparse.SUPPRESS)
+    parser.add_argument("--clientes", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--primer-cliente", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--t-inicio", type=float, help=argparse.SUPPRESS)
+    parser.add_argument("--t-fin", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.servidor:
+        servir(args.port, args.latencia_calendario)
+        return
+    if args.generador:
+        with open(args.catalogo, "r", encoding="utf-8") as f:
+            catalogo = json.load(f)
+        muestras, fallidos = asyncio.run(generar_carga(
+            args.url, args.clientes, args.primer_cliente, args, parsear_mezcla(args.mezcla),
+            catalogo, args.t_inicio, args.t_fin,
+        ))
+        print(json.dumps({"muestras": muestras, "fallidos": fallidos}))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        datos = Path(tmp) / "data"
+        datos.mkdir()
+        if args.filas:
+            from bench_catalogo import generar
+            generar(datos / "universidad.json", args.filas)
+        else:
+            shutil.copy(RAIZ / "data" / "universidad.json", datos / "universidad.json")
+
+        with open(Path(tmp) / "servidor.log", "w+") as log:
+            proceso, base = arrancar_servidor(args, datos, log)
+            try:
+                informes = asyncio.run(ejecutar(args, f"{base}/mcp", base,
+                                                datos / "universidad.json"))
+            except BaseException:
+                log.seek(0)
+                print(log.read()[-4000:], file=sys.stderr)
+                raise
+            finally:
+                proceso.terminate()
+                proceso.wait(10)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"mezcla": parsear_mezcla(args.mezcla), "etapas": informes}, f,
+                      ensure_ascii=False, indent=2)
+        print(f"\nInforme JSON en {args.json}")
+
+
+if __name__ == "__main__":
+    main()
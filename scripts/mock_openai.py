@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Servidor simulado compatible con la API de OpenAI (/v1/chat/completions).
+
+Sirve para probar el backend "openai" sin GPU ni red:
+  - si se envían herramientas y el último mensaje del usuario pide sus
+    tareas, responde con una tool call a `listar_tareas`;
+  - en otro caso devuelve un eco del último mensaje del usuario;
+  - admite `stream: true` (Server-Sent Events), troceando el texto y los
+    argumentos de las tool calls;
+  - GET /v1/stats devuelve cuántas peticiones y conexiones distintas
+    (puertos de cliente) ha visto, para comprobar el keep-alive.
+
+Ejemplo:
+    python scripts/mock_openai.py --port 8001
+    LLM_BACKEND=openai LLM_BASE_URL=http://localhost:8001/v1 python main.py
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+
+def _ultimo_usuario(messages):
+    for m in reversed(messages):
+        if m.get("role") == "user":
+            return m.get("content") or ""
+    return ""
+
+
+def _respuesta(body):
+    """(texto, tool_calls) que devuelve el modelo simulado."""
+    ultimo = _ultimo_usuario(body.get("messages", []))
+    nombres = {t["function"]["name"] for t in body.get("tools") or []}
+    if "listar_tareas" in nombres and "tareas" in ultimo.lower() \
+            and not ultimo.startswith("Resultado de la herramienta"):
+        return None, [{
+            "id": f"call_{uuid.uuid4().hex[:8]}",
+            "type": "function",
+            "function": {"name": "listar_tareas", "arguments": json.dumps({"filtro": "pendientes"})},
+        }]
+    return f"(mock) Recibido: {ultimo[:80]}", None
+
+
+def crear_app(latencia: float = 0.0) -> Starlette:
+    conexiones = set()
+    peticiones = [0]
+
+    async def chat_completions(request: Request):
+        peticiones[0] += 1
+        if request.client:
+            conexiones.add((request.client.host, request.client.port))
+        body = await request.json()
+        if latencia:
+            await asyncio.sleep(latencia)
+
+        texto, tool_calls = _respuesta(body)
+        base = {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+        }
+        usage = {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+
+        if not body.get("stream"):
+            return JSONResponse({
+                **base,
+                "object": "chat.completion",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": texto, "tool_calls": tool_calls},
+                    "finish_reason": "tool_calls" if tool_calls else "stop",
+                }],
+                "usage": usage,
+            })
+
+        def chunk(delta, finish=None, **extra):
+            datos = {**base, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish}], **extra}
+            return f"data: {json.dumps(datos)}\n\n"
+
+        async def eventos():
+            yield chunk({"role": "assistant"})
+            if texto:
+                for i in range(0, len(texto), 8):
+                    yield chunk({"content": texto[i:i + 8]})
+            for indice, call in enumerate(tool_calls or []):
+                argumentos = call["function"]["arguments"]
+                yield chunk({"tool_calls": [{
+                    "index": indice, "id": call["id"], "type": "function",
+                    "function": {"name": call["function"]["name"], "arguments": ""},
+                }]})
+                for i in range(0, len(argumentos), 5):
+                    yield chunk({"tool_calls": [{
+                        "index": indice, "function": {"arguments": argumentos[i:i + 5]},
+                    }]})
+            yield chunk({}, "tool_calls" if tool_calls else "stop", usage=usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(eventos(), media_type="text/event-stream")
+
+    async def stats(request: Request):
+        return JSONResponse({"peticiones": peticiones[0], "conexiones": len(conexiones)})
+
+    return Starlette(routes=[
+        Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+        Route("/v1/stats", stats, methods=["GET"]),
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latencia", type=float, default=0.0, help="Segundos por respuesta")
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(crear_app(args.latencia), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Comprobación del backend "openai" contra el servidor simulado.
+
+Arranca scripts/mock_openai.py en un hilo (puerto libre) y verifica:
+respuesta normal, tool calls, streaming de texto y de tool calls, un
+turno completo del agente con una herramienta local y que las peticiones
+concurrentes reutilizan las conexiones del pool. Termina con código 1 si
+alguna comprobación falla.
+
+Ejemplo:
+    python scripts/prueba_backend_openai.py
+"""
+
+import asyncio
+import json
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+
+from agent import AsyncQwenAgent  # noqa: E402
+from llm_backends import OpenAICompatBackend, acumular_stream  # noqa: E402
+from mock_openai import crear_app  # noqa: E402
+
+TOOLS = [{
+    "type": "function",
+    "function": {
+        "name": "listar_tareas",
+        "description": "Lista las tareas",
+        "parameters": {"type": "object", "properties": {"filtro": {"type": "string"}}},
+    },
+}]
+USUARIO = [{"role": "user", "content": "¿Qué tareas tengo?"}]
+MAX_CONEXIONES = 4
+
+
+def arrancar_mock() -> str:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        puerto = s.getsockname()[1]
+    servidor = uvicorn.Server(uvicorn.Config(
+        crear_app(latencia=0.02), host="127.0.0.1", port=puerto, log_level="warning"
+    ))
+    threading.Thread(target=servidor.run, daemon=True).start()
+    while not servidor.started:
+        time.sleep(0.02)
+    return f"http://127.0.0.1:{puerto}/v1"
+
+
+async def comprobaciones(url: str):
+    backend = OpenAICompatBackend(base_url=url, model="mock", max_conexiones=MAX_CONEXIONES)
+    try:
+        r = await backend.chat_completion([{"role": "user", "content": "hola"}], max_tokens=10)
+        yield "respuesta", r.choices[0].message.content == "(mock) Recibido: hola", \
+            r.choices[0].message.content
+
+        r = await backend.chat_completion(USUARIO, tools=TOOLS, tool_choice="auto")
+        call = r.choices[0].message.tool_calls[0]
+        yield "tool_call", call.function.name == "listar_tareas" \
+            and json.loads(call.function.arguments) == {"filtro": "pendientes"}, call.function.arguments
+
+        trozos = []
+        r = await acumular_stream(
+            await backend.chat_completion([{"role": "user", "content": "hola"}], stream=True),
+            trozos.append,
+        )
+        yield "stream_texto", r.choices[0].message.content == "(mock) Recibido: hola" \
+            and len(trozos) > 1, f"{len(trozos)} trozos"
+
+        r = await acumular_stream(
+            await backend.chat_completion(USUARIO, tools=TOOLS, stream=True)
+        )
+        call = r.choices[0].message.tool_calls[0]
+        yield "stream_tools", json.loads(call.function.arguments) == {"filtro": "pendientes"}, \
+            call.function.arguments
+
+        agente = AsyncQwenAgent(client=backend)
+        agente.register_tool(
+            "listar_tareas", lambda filtro="pendientes": [{"id": 1, "titulo": "Práctica"}],
+            "Lista las tareas", TOOLS[0]["function"]["parameters"],
+        )
+        respuesta = await agente.chat("¿Qué tareas tengo?")
+        yield "agente", respuesta.startswith("(mock) Recibido: Resultado de la herramienta"), \
+            respuesta[:60]
+
+        await asyncio.gather(*[
+            backend.chat_completion([{"role": "user", "content": f"m{i}"}]) for i in range(50)
+        ])
+        async with httpx.AsyncClient() as http:
+            stats = (await http.get(f"{url}/stats")).json()
+        yield "keep_alive", stats["conexiones"] <= MAX_CONEXIONES, \
+            f"{stats['peticiones']} peticiones en {stats['conexiones']} conexiones"
+    finally:
+        await backend.close()
+
+
+async def main() -> int:
+    url = arrancar_mock()
+    fallos = 0
+    async for nombre, ok, detalle in comprobaciones(url):
+        fallos += not ok
+        print(f"{'✓' if ok else '❌'} {nombre:<14} {detalle}")
+    return 1 if fallos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
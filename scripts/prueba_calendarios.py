@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Comprobación de las consultas a varios calendarios con un servicio simulado.
+
+Ejecuta `GoogleCalendarClient.list_events` contra `ServicioCalendarioFalso`
+con latencias y fallos inyectados por calendario (mezcla ordenada,
+consultas en paralelo, timeout por calendario, consultas seguidas con un
+calendario colgado, calendario caído, zonas horarias distintas,
+resultados en varias páginas y un solo calendario) y verifica el
+resultado.
+Termina con código 1 si algún escenario no se cumple.
+
+Ejemplo:
+    python scripts/prueba_calendarios.py
+"""
+
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from calendario_falso import ServicioCalendarioFalso  # noqa: E402
+from google_calendar_client import CALENDAR_TIMEOUTS, GoogleCalendarClient  # noqa: E402
+
+CALENDARIOS = ["primary", "clases", "examenes"]
+LUNES = datetime(2030, 3, 4, 8, 0)
+RANGO = ("2030-03-04 00:00", "2030-03-10 23:59")
+
+
+def servicio_poblado(**kwargs) -> ServicioCalendarioFalso:
+    servicio = ServicioCalendarioFalso(**kwargs)
+    # Eventos intercalados: cada calendario empieza a una hora distinta
+    for i, calendar_id in enumerate(CALENDARIOS):
+        servicio.poblar(calendar_id, LUNES + timedelta(minutes=20 * i), 30,
+                        timedelta(hours=5), titulo=calendar_id)
+    return servicio
+
+
+def listar(cliente, max_resultados=250):
+    return cliente.list_events(*RANGO, max_resultados=max_resultados, ajustar_anio=False)
+
+
+def mezcla():
+    cliente = GoogleCalendarClient(service=servicio_poblado(), calendar_ids=CALENDARIOS)
+    eventos = listar(cliente, 40)
+    inicios = [e["start"] for e in eventos]
+    ok = (len(eventos) == 40 and inicios == sorted(inicios)
+          and {e["calendar_id"] for e in eventos} == set(CALENDARIOS))
+    return ok, f"{len(eventos)} eventos de {len({e['calendar_id'] for e in eventos})} calendarios"
+
+
+def paralelo():
+    servicio = servicio_poblado(latencia=0.3)
+    cliente = GoogleCalendarClient(service=servicio, calendar_ids=CALENDARIOS)
+    inicio = time.perf_counter()
+    eventos = listar(cliente)
+    segundos = time.perf_counter() - inicio
+    return segundos < 0.6 and len(eventos) == 90, f"3 calendarios de 0.3s en {segundos:.2f}s"
+
+
+def timeout():
+    servicio = servicio_poblado(latencias={"examenes": 2.0})
+    cliente = GoogleCalendarClient(service=servicio, calendar_ids=CALENDARIOS, timeout=0.3)
+    antes = CALENDAR_TIMEOUTS.labels("examenes").valor
+    inicio = time.perf_counter()
+    eventos = listar(cliente)
+    segundos = time.perf_counter() - inicio
+    calendarios = {e["calendar_id"] for e in eventos}
+    ok = (segundos < 0.6 and calendarios == {"primary", "clases"}
+          and CALENDAR_TIMEOUTS.labels("examenes").valor == antes + 1)
+    return ok, f"{len(eventos)} eventos sin 'examenes' en {segundos:.2f}s"
+
+
+def repetido():
+    # Un calendario colgado no debe acabar ocupando todos los hilos
+    servicio = servicio_poblado(latencias={"examenes": 3.0})
+    cliente = GoogleCalendarClient(service=servicio, calendar_ids=CALENDARIOS,
+                                   workers=2, timeout=0.5)
+    respuestas = []
+    inicio = time.perf_counter()
+    for _ in range(4):
+        try:
+            respuestas.append({e["calendar_id"] for e in listar(cliente)})
+        except TimeoutError:
+            respuestas.append(set())
+    segundos = time.perf_counter() - inicio
+    ok = all(r == {"primary", "clases"} for r in respuestas) and segundos < 2.5
+    return ok, f"4 consultas seguidas con 'examenes' colgado en {segundos:.2f}s"
+
+
+def caido():
+    servicio = servicio_poblado(calendarios_caidos={"clases"})
+    cliente = GoogleCalendarClient(service=servicio, calendar_ids=CALENDARIOS)
+    calendarios = {e["calendar_id"] for e in listar(cliente)}
+    parcial = calendarios == {"primary", "examenes"}
+
+    servicio = servicio_poblado(calendarios_caidos=set(CALENDARIOS))
+    cliente = GoogleCalendarClient(service=servicio, calendar_ids=CALENDARIOS)
+    try:
+        listar(cliente)
+        todos = False
+    except RuntimeError:
+        todos = True
+    return parcial and todos, "se omite el caído; si caen todos, error"
+
+
+def zonas():
+    servicio = ServicioCalendarioFalso()
+    # 10:00+02:00 (08:00 UTC) va antes que 09:00+00:00
+    servicio.poblar("primary", LUNES.replace(hour=9), 1, timedelta(hours=1), "utc")
+    servicio.poblar("clases", LUNES.replace(hour=10), 1, timedelta(hours=1), "madrid",
+                    zona="+02:00")
+    cliente = GoogleCalendarClient(service=servicio, calendar_ids=["primary", "clases"])
+    titulos = [e["summary"] for e in listar(cliente)]
+    return titulos == ["madrid 0", "utc 0"], f"orden {titulos}"
+
+
+def paginas():
+    servicio = ServicioCalendarioFalso()
+    servicio.poblar("primary", LUNES, 600, timedelta(minutes=10))
+    cliente = GoogleCalendarClient(service=servicio, calendar_ids=["primary"])
+    eventos = listar(cliente, 550)
+    inicios = [e["start"] for e in eventos]
+    ok = len(eventos) == 550 and inicios == sorted(inicios) and servicio.peticiones == 3
+    return ok, f"{len(eventos)} eventos en {servicio.peticiones} páginas"
+
+
+def un_calendario():
+    cliente = GoogleCalendarClient(service=servicio_poblado(), calendar_ids=["primary"])
+    eventos = listar(cliente, 5)
+    return len(eventos) == 5 and "calendar_id" not in eventos[0], "sin pool ni calendar_id"
+
+
+ESCENARIOS = [mezcla, paralelo, timeout, repetido, caido, zonas, paginas, un_calendario]
+
+
+def main() -> int:
+    fallos = 0
+    for escenario in ESCENARIOS:
+        ok, detalle = escenario()
+        fallos += not ok
+        print(f"{'✓' if ok else '❌'} {escenario.__name__:<14} {detalle}")
+    return 1 if fallos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
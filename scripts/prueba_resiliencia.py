@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Comprobación de las llamadas resilientes al modelo contra el modelo simulado.
+
+Ejecuta varios escenarios con fallos y latencias inyectadas (reintentos,
+modelo de reserva, error no transitorio, plazo total y cobertura) y
+verifica el comportamiento de `ModelCaller`. Termina con código 1 si
+algún escenario no se cumple.
+
+Ejemplo:
+    python scripts/prueba_resiliencia.py
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from model_caller import ModelCaller  # noqa: E402
+from stub_modelo import ErrorStub, StubModelo  # noqa: E402
+from tracing import tracer  # noqa: E402
+from utils import percentil  # noqa: E402
+
+MENSAJES = [{"role": "user", "content": "hola"}]
+
+
+async def reintentos():
+    stub = StubModelo(0.01, 0, fallos_iniciales=2)
+    caller = ModelCaller(stub, ["a"], timeout=1, reintentos=2, backoff_base=0.01)
+    _, modelo = await caller.llamar(MENSAJES)
+    return modelo == "a" and stub.llamadas == 3, f"{stub.llamadas} llamadas"
+
+
+async def reserva():
+    stub = StubModelo(0.01, 0, modelos_caidos={"a"})
+    caller = ModelCaller(stub, ["a", "b"], timeout=1, reintentos=1, backoff_base=0.01)
+    _, modelo = await caller.llamar(MENSAJES)
+    return modelo == "b", f"respondió {modelo}, llamadas {stub.llamadas_por_modelo}"
+
+
+async def no_transitorio():
+    stub = StubModelo(0.01, 0, modelos_caidos={"a"}, codigo_error=400)
+    caller = ModelCaller(stub, ["a", "b"], timeout=1, reintentos=3, backoff_base=0.01)
+    _, modelo = await caller.llamar(MENSAJES)
+    return stub.llamadas_por_modelo.get("a") == 1 and modelo == "b", \
+        f"llamadas {stub.llamadas_por_modelo}"
+
+
+async def plazo_total():
+    stub = StubModelo(5, 0)
+    caller = ModelCaller(stub, ["a", "b"], timeout=0.2, deadline=0.5,
+                         reintentos=5, backoff_base=0.01)
+    inicio = time.perf_counter()
+    try:
+        await caller.llamar(MENSAJES)
+        return False, "no falló"
+    except (asyncio.TimeoutError, ErrorStub):
+        transcurrido = time.perf_counter() - inicio
+        return transcurrido < 0.8, f"{transcurrido:.2f}s"
+
+
+async def cobertura():
+    """Con un 10% de llamadas lentas en el principal, la cobertura recorta la cola."""
+    async def medir(hedge):
+        stub = StubModelo(0.02, 0.005, prob_lenta=0.1, latencia_lenta=1.0,
+                          latencia_por_modelo={"b": 0.03})
+        caller = ModelCaller(stub, ["a", "b"], timeout=2, hedge=hedge, hedge_delay=0.1)
+        latencias = []
+        for _ in range(60):
+            inicio = time.perf_counter()
+            await caller.llamar(MENSAJES)
+            latencias.append(time.perf_counter() - inicio)
+        return percentil(latencias, 99)
+
+    sin, con = await medir(False), await medir(True)
+    return con < sin / 2, f"p99 sin cobertura {sin * 1000:.0f} ms, con cobertura {con * 1000:.0f} ms"
+
+
+ESCENARIOS = [reintentos, reserva, no_transitorio, plazo_total, cobertura]
+
+
+async def main() -> int:
+    fallos = 0
+    for escenario in ESCENARIOS:
+        ok, detalle = await escenario()
+        fallos += not ok
+        print(f"{'✓' if ok else '❌'} {escenario.__name__:<16} {detalle}")
+    print(f"\nContadores: {tracer.contadores()}")
+    return 1 if fallos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
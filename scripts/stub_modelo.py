@@ -0,0 +1,89 @@
+"""
+Cliente de modelo simulado para pruebas de carga y pruebas locales.
+
+Imita la interfaz de `AsyncInferenceClient.chat_completion` devolviendo
+una respuesta final fija tras una latencia aleatoria, sin red ni token.
+Permite inyectar fallos y llamadas lentas, en general o por modelo.
+"""
+
+import asyncio
+import random
+from types import SimpleNamespace
+from typing import Dict, Iterable, Optional
+
+
+class ErrorStub(Exception):
+    """Error HTTP simulado (por defecto 503, transitorio)."""
+
+    def __init__(self, status_code: int = 503):
+        super().__init__(f"HTTP {status_code} (stub)")
+        self.status_code = status_code
+
+
+class StubModelo:
+    """
+    Modelo simulado.
+
+    Args:
+        latencia_media: Segundos medios de cada llamada.
+        jitter: Variación máxima (+/-) sobre la latencia media, en segundos.
+        prob_error: Probabilidad de que una llamada falle con `ErrorStub`.
+        prob_lenta: Probabilidad de que una llamada tarde `latencia_lenta`.
+        latencia_lenta: Segundos de una llamada lenta (cola de latencia).
+        fallos_iniciales: Número de primeras llamadas que fallan siempre.
+        codigo_error: Código HTTP de los errores inyectados.
+        modelos_caidos: Modelos que fallan siempre.
+        latencia_por_modelo: Latencia media específica de algunos modelos.
+    """
+
+    def __init__(
+        self,
+        latencia_media: float = 0.2,
+        jitter: float = 0.05,
+        prob_error: float = 0.0,
+        prob_lenta: float = 0.0,
+        latencia_lenta: float = 5.0,
+        fallos_iniciales: int = 0,
+        codigo_error: int = 503,
+        modelos_caidos: Iterable[str] = (),
+        latencia_por_modelo: Optional[Dict[str, float]] = None,
+    ):
+        self.latencia_media = latencia_media
+        self.jitter = jitter
+        self.prob_error = prob_error
+        self.prob_lenta = prob_lenta
+        self.latencia_lenta = latencia_lenta
+        self.fallos_iniciales = fallos_iniciales
+        self.codigo_error = codigo_error
+        self.modelos_caidos = set(modelos_caidos)
+        self.latencia_por_modelo = latencia_por_modelo or {}
+        self.llamadas = 0
+        self.llamadas_por_modelo: Dict[str, int] = {}
+
+    async def chat_completion(self, messages, model: Optional[str] = None, **kwargs):
+        self.llamadas += 1
+        self.llamadas_por_modelo[model] = self.llamadas_por_modelo.get(model, 0) + 1
+
+        media = self.latencia_por_modelo.get(model, self.latencia_media)
+        latencia = max(0.0, media + random.uniform(-self.jitter, self.jitter))
+        if random.random() < self.prob_lenta:
+            latencia = self.latencia_lenta
+        await asyncio.sleep(latencia)
+
+        if (self.llamadas <= self.fallos_iniciales
+                or model in self.modelos_caidos
+                or random.random() < self.prob_error):
+            raise ErrorStub(self.codigo_error)
+
+        ultimo = next(
+            (m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"),
+            "",
+        )
+        message = SimpleNamespace(content=f"(stub) Recibido: {ultimo[:80]}", tool_calls=None)
+        usage = SimpleNamespace(
+            prompt_tokens=sum(len(m.get("content") or "") for m in messages) // 4,
+            completion_tokens=16,
+            total_tokens=0,
+        )
+        usage.total_tokens = usage.prompt_tokens + usage.completion_tokens
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
@@ -0,0 +1,260 @@
+"""
+Conversaciones de la CLI guardadas en disco para poder reanudarlas.
+
+Cada sesión son dos ficheros en SESIONES_DIR:
+  - <id>.jsonl       los mensajes del historial, uno por línea, en el orden
+                     en que se añaden. Solo se escribe al final (nunca se
+                     reescribe), así que guardar un mensaje cuesta lo mismo
+                     con diez mensajes que con diez mil;
+  - <id>.meta.json   usuario, fechas y número de mensajes, y un resumen
+                     extractivo: las últimas preguntas del usuario con el
+                     principio de cada respuesta.
+
+Los metadatos no se reescriben con cada mensaje: se guardan con el primero,
+cada SESION_META_CADA mensajes y al cerrar la sesión, junto con los bytes
+del .jsonl que ya incluyen. Si el proceso se corta entre dos guardados, al
+abrir la sesión se leen los mensajes posteriores a esos bytes y se ponen
+al día, así que los dos ficheros nunca quedan desacompasados.
+
+Al reanudar solo se leen los últimos mensajes (buscándolos hacia atrás
+desde el final del fichero) y el resumen, de modo que reanudar una sesión
+larga cuesta lo mismo que reanudar una corta.
+"""
+
+import json
+import os
+import re
+import secrets
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import SESIONES_DIR, SESION_META_CADA, SESION_RESUMEN_MAX
+
+_ID_VALIDO = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# Marca de las líneas que son resultados de herramientas (no se envía al modelo)
+_MARCA_RESULTADO = "_resultado"
+
+
+def _ahora() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _recortar(texto: str, max_chars: int = 200) -> str:
+    texto = " ".join((texto or "").split())
+    if len(texto) > max_chars:
+        texto = texto[:max_chars - 1].rstrip() + "…"
+    return texto
+
+
+def leer_ultimas_lineas(ruta: Path, n: int, bloque: int = 64 * 1024) -> List[bytes]:
+    """
+    Últimas n líneas no vacías de un fichero, leyendo bloques hacia atrás
+    desde el final (el coste depende de n, no del tamaño del fichero).
+    """
+    with open(ruta, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        datos = b""
+        # n + 1 saltos de línea garantizan n líneas completas
+        while pos > 0 and datos.count(b"\n") <= n:
+            leer = min(bloque, pos)
+            pos -= leer
+            f.seek(pos)
+            datos = f.read(leer) + datos
+    lineas = datos.split(b"\n")
+    if pos > 0:
+        # La primera puede haber quedado cortada por el bloque
+        lineas = lineas[1:]
+    return [linea for linea in lineas if linea.strip()][-n:] if n > 0 else []
+
+
+class SesionGuardada:
+    """
+    Una conversación guardada. El fichero de mensajes se crea con el
+    primer mensaje, así que las sesiones vacías no dejan rastro.
+    """
+
+    def __init__(self, id_sesion: str, meta: Dict, directorio: Path = SESIONES_DIR):
+        self.id = id_sesion
+        self.meta = meta
+        self.directorio = Path(directorio)
+        self._f = None
+        # Mensajes añadidos desde el último guardado de los metadatos
+        self._sin_guardar = 0
+
+    @property
+    def ruta(self) -> Path:
+        return self.directorio / f"{self.id}.jsonl"
+
+    @property
+    def ruta_meta(self) -> Path:
+        return self.directorio / f"{self.id}.meta.json"
+
+    @classmethod
+    def nueva(cls, usuario: str, directorio: Path = SESIONES_DIR) -> "SesionGuardada":
+        id_sesion = f"{datetime.now():%Y%m%d-%H%M%S}-{secrets.token_hex(2)}"
+        ahora = _ahora()
+        meta = {
+            "id": id_sesion,
+            "usuario": usuario,
+            "creada": ahora,
+            "actualizada": ahora,
+            "mensajes": 0,
+            "bytes": 0,
+            "titulo": "",
+            "resumen": [],
+        }
+        return cls(id_sesion, meta, directorio)
+
+    @classmethod
+    def abrir(cls, id_sesion: str, directorio: Path = SESIONES_DIR) -> "SesionGuardada":
+        """Abre una sesión existente (ValueError si no existe)."""
+        if not _ID_VALIDO.match(id_sesion or ""):
+            raise ValueError(f"Identificador de sesión no válido: {id_sesion!r}")
+        directorio = Path(directorio)
+        try:
+            with open(directorio / f"{id_sesion}.meta.json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            raise ValueError(f"No existe la sesión {id_sesion}") from None
+        sesion = cls(id_sesion, meta, directorio)
+        sesion._poner_al_dia()
+        return sesion
+
+    def _poner_al_dia(self):
+        """Aplica a los metadatos los mensajes escritos después de guardarlos."""
+        if not self.ruta.exists():
+            return
+        if "bytes" not in self.meta:
+            # Las sesiones antiguas guardaban los metadatos en cada mensaje
+            self.meta["bytes"] = self.ruta.stat().st_size
+            return
+        with open(self.ruta, "rb") as f:
+            f.seek(self.meta["bytes"])
+            resto = f.read()
+        # Una última línea sin salto es un mensaje a medio escribir
+        completo = resto[:resto.rfind(b"\n") + 1]
+        if not completo:
+            return
+        for linea in completo.splitlines():
+            try:
+                mensaje = json.loads(linea)
+            except ValueError:
+                continue
+            self._actualizar_meta(mensaje, bool(mensaje.pop(_MARCA_RESULTADO, False)))
+        self.meta["bytes"] += len(completo)
+        self._guardar_meta()
+
+    # ========== ESCRITURA ==========
+
+    def agregar(self, mensaje: Dict, resultado_herramienta: bool = False):
+        """
+        Añade un mensaje al final del fichero y actualiza los metadatos en
+        memoria (en disco, con el primer mensaje y cada SESION_META_CADA).
+        """
+        linea = dict(mensaje)
+        if resultado_herramienta:
+            linea[_MARCA_RESULTADO] = True
+        datos = (json.dumps(linea, ensure_ascii=False) + "\n").encode("utf-8")
+        if self._f is None:
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            self._f = open(self.ruta, "ab")
+            if self._f.tell() > self.meta["bytes"]:
+                # Restos de un mensaje a medio escribir: se descartan
+                self._f.truncate(self.meta["bytes"])
+        self._f.write(datos)
+        self._f.flush()
+
+        self._actualizar_meta(mensaje, resultado_herramienta)
+        self.meta["bytes"] += len(datos)
+        self._sin_guardar += 1
+        if self.meta["mensajes"] == 1 or self._sin_guardar >= SESION_META_CADA:
+            self._guardar_meta()
+
+    def _actualizar_meta(self, mensaje: Dict, resultado_herramienta: bool):
+        meta = self.meta
+        meta["mensajes"] += 1
+        meta["actualizada"] = _ahora()
+        contenido = mensaje.get("content") or ""
+        if mensaje.get("role") == "user" and not resultado_herramienta:
+            meta["titulo"] = meta["titulo"] or _recortar(contenido, 80)
+            meta["resumen"].append({"pregunta": _recortar(contenido)})
+            del meta["resumen"][:-SESION_RESUMEN_MAX]
+        elif mensaje.get("role") == "assistant" and contenido and meta["resumen"]:
+            # La última respuesta del turno es la que queda
+            meta["resumen"][-1]["respuesta"] = _recortar(contenido)
+
+    def _guardar_meta(self):
+        tmp = self.ruta_meta.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        tmp.replace(self.ruta_meta)
+        self._sin_guardar = 0
+
+    def cerrar(self):
+        f, self._f = self._f, None
+        if f is not None:
+            f.close()
+        if self._sin_guardar:
+            self._guardar_meta()
+
+    # ========== REANUDAR ==========
+
+    def contexto(self, n: int) -> List[Dict]:
+        """
+        Historial con el que se reanuda: los últimos n mensajes (desde el
+        principio de un turno del usuario) precedidos, si faltan mensajes
+        anteriores, de un mensaje con el resumen de la sesión.
+        """
+        if not self.ruta.exists():
+            return []
+
+        lineas = []
+        for linea in leer_ultimas_lineas(self.ruta, n):
+            try:
+                lineas.append(json.loads(linea))
+            except ValueError:
+                # Última línea a medio escribir si se cortó el proceso
+                continue
+
+        # No empezar a mitad de un turno (con resultados de herramientas sueltos)
+        inicio = next(
+            (i for i, m in enumerate(lineas) if m.get("role") == "user" and not m.get(_MARCA_RESULTADO)),
+            0,
+        )
+        mensajes = [{k: v for k, v in m.items() if k != _MARCA_RESULTADO} for m in lineas[inicio:]]
+
+        if self.meta["mensajes"] > len(mensajes):
+            cargadas = {_recortar(m["content"]) for m in mensajes if m.get("role") == "user"}
+            anteriores = [r for r in self.meta["resumen"] if r["pregunta"] not in cargadas]
+            if anteriores:
+                puntos = []
+                for r in anteriores:
+                    puntos.append(f"- Usuario: {r['pregunta']}")
+                    if r.get("respuesta"):
+                        puntos.append(f"  Asistente: {r['respuesta']}")
+                mensajes.insert(0, {
+                    "role": "user",
+                    "content": "Resumen de la conversación anterior (se ha reanudado una "
+                               "sesión guardada y no se muestran los mensajes más antiguos):\n"
+                               + "\n".join(puntos),
+                })
+        return mensajes
+
+
+def listar_sesiones(usuario: Optional[str] = None, directorio: Path = SESIONES_DIR,
+                    limite: int = 20) -> List[Dict]:
+    """Metadatos de las sesiones guardadas (del usuario), la más reciente primero."""
+    sesiones = []
+    for ruta in Path(directorio).glob("*.meta.json"):
+        try:
+            with open(ruta, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if meta.get("mensajes") and (usuario is None or meta.get("usuario") == usuario):
+            sesiones.append(meta)
+    sesiones.sort(key=lambda m: m.get("actualizada", ""), reverse=True)
+    return sesiones[:limite]
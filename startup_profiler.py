@@ -0,0 +1,95 @@
+"""
+Perfilado del arranque en frío de la CLI.
+
+Lanza `main.py` en un proceso nuevo con `python -X importtime`, lo detiene
+justo antes del primer prompt y muestra el tiempo total junto con el
+desglose de imports por paquete. Con un presupuesto (`budget_ms`) sirve
+como comprobación de regresión: devuelve código 1 si se supera.
+"""
+
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+
+def _parsear_importtime(salida: str) -> Tuple[Dict[str, int], int]:
+    """
+    Agrupa por paquete raíz el tiempo acumulado (µs) de los imports de
+    primer nivel. Devuelve (tiempos por paquete, total en µs).
+    """
+    por_paquete: Dict[str, int] = defaultdict(int)
+    total = 0
+
+    for linea in salida.splitlines():
+        if not linea.startswith("import time:"):
+            continue
+        partes = linea[len("import time:"):].split("|")
+        if len(partes) != 3:
+            continue
+        try:
+            acumulado = int(partes[1].strip())
+        except ValueError:
+            # Cabecera: "self [us] | cumulative | imported package"
+            continue
+
+        nombre = partes[2]
+        # Solo los imports de primer nivel (sin sangría) para no contar dos veces
+        if nombre.startswith(" ") and nombre[1:2] == " ":
+            continue
+        nombre = nombre.strip()
+        por_paquete[nombre.split(".")[0]] += acumulado
+        total += acumulado
+
+    return dict(por_paquete), total
+
+
+def perfilar_arranque(script: str, top: int = 15,
+                      budget_ms: Optional[float] = None) -> int:
+    """
+    Mide el arranque de `script` hasta el primer prompt e imprime el
+    desglose. Devuelve el código de salida para el proceso.
+    """
+    env = dict(os.environ, PYTHONIOENCODING="utf-8")
+    comando = [sys.executable, "-X", "importtime", script, "--exit-at-prompt"]
+
+    inicio = time.perf_counter()
+    proc = subprocess.run(
+        comando,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        env=env,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+    )
+    total_ms = (time.perf_counter() - inicio) * 1000
+
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:], file=sys.stderr)
+        print(f"❌ El arranque terminó con código {proc.returncode}")
+        return proc.returncode
+
+    por_paquete, imports_us = _parsear_importtime(proc.stderr)
+    filas: List[Tuple[str, int]] = sorted(
+        por_paquete.items(), key=lambda kv: kv[1], reverse=True
+    )[:top]
+
+    print(f"Arranque hasta el primer prompt: {total_ms:.0f} ms")
+    print(f"Tiempo en imports:               {imports_us / 1000:.0f} ms\n")
+    print(f"{'Paquete':<30} {'ms':>9} {'%':>6}")
+    print("-" * 47)
+    for paquete, us in filas:
+        porcentaje = 100 * us / imports_us if imports_us else 0
+        print(f"{paquete:<30} {us / 1000:>9.1f} {porcentaje:>5.1f}%")
+
+    if budget_ms is not None:
+        if total_ms > budget_ms:
+            print(f"\n❌ Arranque por encima del presupuesto ({total_ms:.0f} ms > {budget_ms:.0f} ms)")
+            return 1
+        print(f"\n✓ Arranque dentro del presupuesto ({budget_ms:.0f} ms)")
+
+    return 0
@@ -0,0 +1,200 @@
+"""
+Descubrimiento automático de herramientas desde el servidor MCP.
+
+El agente construye su `tools_schema` y su tabla de despacho a partir de
+la respuesta de `list_tools` del servidor, de modo que cada herramienta
+se define una sola vez (en mcp_server.py).
+
+El resultado se guarda en disco junto con un hash del esquema. En los
+siguientes arranques basta con pedir el hash al servidor (`/tools-hash`,
+una petición HTTP mínima): si coincide se usa la caché y se omite la
+sesión MCP y el `list_tools`.
+"""
+
+import asyncio
+import copy
+import hashlib
+import json
+import re
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config import MCP_URL, TOOLS_CACHE_FILE, TOOLS_DESCRIPCIONES_COMPACTAS
+from tracing import tracer
+
+# Parámetro que rellena el agente (multi-tenant) y que el modelo no debe ver
+PARAM_USUARIO = "usuario"
+# Versión de los datos que ya tiene el cliente (lecturas condicionales): la
+# gestiona la sesión MCP (ver MCPSession.call_tool_versionada)
+PARAM_IF_VERSION = "if_version"
+
+
+# ==========================
+# ESQUEMAS Y HASH
+# ==========================
+
+def tool_a_dict(tool) -> Dict:
+    """Convierte una Tool de MCP en un dict {name, description, parameters}."""
+    schema = getattr(tool, "input_schema", None)
+    if schema is None:
+        schema = getattr(tool, "inputSchema", None)
+    return {
+        "name": tool.name,
+        "description": tool.description or "",
+        "parameters": schema or {"type": "object", "properties": {}},
+    }
+
+
+def hash_tools(tools: List[Dict]) -> str:
+    """Hash estable de una lista de herramientas (independiente del orden)."""
+    canonico = json.dumps(
+        sorted(tools, key=lambda t: t["name"]),
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonico.encode("utf-8")).hexdigest()
+
+
+def _primera_frase(texto: str, max_chars: int) -> str:
+    """Primera frase (o primer párrafo) de un texto, recortada a max_chars."""
+    texto = texto.strip().split("\n\n", 1)[0]
+    texto = " ".join(texto.split())
+    m = re.search(r"(?<=[.!?])\s", texto)
+    if m:
+        texto = texto[:m.start()]
+    if len(texto) > max_chars:
+        texto = texto[:max_chars - 1].rstrip() + "…"
+    return texto
+
+
+def compactar_tool(tool: Dict) -> Dict:
+    """
+    Reduce la descripción de la herramienta y de sus parámetros a la
+    primera frase y elimina los campos que no aportan nada al modelo.
+    """
+    tool = copy.deepcopy(tool)
+    tool["description"] = _primera_frase(tool["description"], 160)
+    params = tool["parameters"]
+    params.pop("title", None)
+    params.pop("additionalProperties", None)
+    for prop in params.get("properties", {}).values():
+        prop.pop("title", None)
+        if "description" in prop:
+            prop["description"] = _primera_frase(prop["description"], 80)
+    return tool
+
+
+def _quitar_param(parameters: Dict, nombre: str) -> Tuple[Dict, bool]:
+    """Elimina un parámetro que rellena el cliente del schema visible para el modelo."""
+    props = parameters.get("properties", {})
+    if nombre not in props:
+        return parameters, False
+    parameters = copy.deepcopy(parameters)
+    del parameters["properties"][nombre]
+    if nombre in parameters.get("required", []):
+        parameters["required"] = [r for r in parameters["required"] if r != nombre]
+    return parameters, True
+
+
+# ==========================
+# DESCUBRIMIENTO Y CACHÉ
+# ==========================
+
+def obtener_hash_servidor(url: str = MCP_URL, timeout: float = 2.0) -> Optional[str]:
+    """Pide al servidor el hash de su esquema de herramientas (o None si falla)."""
+    hash_url = url.rstrip("/").rsplit("/", 1)[0] + "/tools-hash"
+    try:
+        with urllib.request.urlopen(hash_url, timeout=timeout) as resp:
+            return resp.read().decode("utf-8").strip() or None
+    except Exception:
+        return None
+
+
+async def descubrir_tools(url: str = MCP_URL) -> List[Dict]:
+    """Lista las herramientas del servidor con una sesión MCP."""
+    from fastmcp import Client
+
+    async with Client(url) as client:
+        tools = await client.list_tools()
+    return [tool_a_dict(t) for t in tools]
+
+
+def _leer_cache(cache_file: Path) -> Optional[Dict]:
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        if isinstance(cache.get("tools"), list) and cache.get("hash"):
+            return cache
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _guardar_cache(cache_file: Path, url: str, tools: List[Dict], hash_: str):
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache_file.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"hash": hash_, "url": url, "tools": tools}, f, ensure_ascii=False)
+        tmp.replace(cache_file)
+    except OSError:
+        # Sin caché en disco simplemente se descubrirá en el próximo arranque
+        pass
+
+
+def cargar_tools(url: str = MCP_URL, cache_file: Path = TOOLS_CACHE_FILE) -> List[Dict]:
+    """
+    Devuelve las herramientas del servidor, usando la caché en disco si
+    su hash coincide con el del servidor (o si el servidor no responde).
+    """
+    with tracer.span("tools.cargar"):
+        cache = _leer_cache(cache_file)
+        if cache is not None and cache.get("url") == url:
+            hash_servidor = obtener_hash_servidor(url)
+            if hash_servidor is None or hash_servidor == cache["hash"]:
+                return cache["tools"]
+
+        with tracer.span("tools.descubrir"):
+            tools = asyncio.run(descubrir_tools(url))
+        _guardar_cache(cache_file, url, tools, hash_tools(tools))
+        return tools
+
+
+def _crear_dispatcher(tool_name: str, versionada: bool = False):
+    async def _tool(**kwargs):
+        from mcp_client_wrapper import call_mcp_tool_async, call_mcp_tool_versionada_async
+        if versionada:
+            return await call_mcp_tool_versionada_async(tool_name, **kwargs)
+        return await call_mcp_tool_async(tool_name, **kwargs)
+
+    _tool.__name__ = f"tool_{tool_name}"
+    return _tool
+
+
+def registrar_tools_mcp(agent, tools: Optional[List[Dict]] = None,
+                        compactar: bool = TOOLS_DESCRIPCIONES_COMPACTAS):
+    """
+    Registra en el agente todas las herramientas del servidor MCP.
+
+    Args:
+        agent: Agente (QwenAgent o AsyncQwenAgent).
+        tools: Herramientas ya descubiertas (por defecto se cargan con cargar_tools).
+        compactar: Si es True, recorta las descripciones para ahorrar tokens.
+    """
+    if tools is None:
+        tools = cargar_tools()
+
+    for tool in tools:
+        if compactar:
+            tool = compactar_tool(tool)
+        parameters, por_usuario = _quitar_param(tool["parameters"], PARAM_USUARIO)
+        parameters, versionada = _quitar_param(parameters, PARAM_IF_VERSION)
+        agent.register_tool(
+            name=tool["name"],
+            function=_crear_dispatcher(tool["name"], versionada),
+            description=tool["description"],
+            parameters=parameters,
+            por_usuario=por_usuario,
+        )
@@ -0,0 +1,121 @@
+"""
+Selección por turno de las herramientas relevantes.
+
+Un clasificador local de palabras clave decide qué grupos de herramientas
+(horarios, profesores/aulas, tareas, ficheros, calendario) son relevantes para el
+mensaje del usuario y solo se envían esas al modelo. Si no reconoce
+ningún grupo (mensaje ambiguo, seguimiento tipo "¿y el martes?"...) se
+envía el conjunto completo.
+
+Las herramientas que no pertenecen a ningún grupo se envían siempre.
+"""
+
+import json
+import re
+from typing import Dict, List, Set, Tuple
+
+from tracing import tracer
+from utils import sin_tildes
+
+
+# Grupos de herramientas y palabras (prefijos, sin tildes) que los activan
+GRUPOS_TOOLS: Dict[str, Dict[str, List[str]]] = {
+    "horarios": {
+        "tools": ["consultar_horario", "consultar_todos_horarios", "consultar_asignatura"],
+        "palabras": [
+            "horario", "clase", "asignatura", "cuatrimestre", "semestre",
+            "lunes", "martes", "miercoles", "jueves", "viernes",
+        ],
+    },
+    "profesores_aulas": {
+        "tools": ["buscar_profesor", "consultar_aula", "consultar_asignatura"],
+        "palabras": [
+            "profe", "docente", "imparte", "tutoria", "despacho", "correo",
+            "email", "aula", "edificio", "capacidad", "equipamiento", "donde",
+        ],
+    },
+    "tareas": {
+        "tools": [
+            "crear_tarea", "listar_tareas", "proximas_tareas", "tareas_vencidas",
+            "buscar_tareas", "completar_tarea", "eliminar_tarea",
+        ],
+        "palabras": [
+            "tarea", "entrega", "practica", "deber", "recordatorio", "pendiente",
+            "completad", "hecha", "vence", "venc", "plazo", "trabajo",
+        ],
+    },
+    "ficheros": {
+        "tools": ["importar_tareas", "exportar_tareas", "exportar_horarios"],
+        "palabras": ["import", "export", "csv", "ics", "fichero", "archivo"],
+    },
+    "calendario": {
+        "tools": [
+            "listar_eventos_calendario",
+            "crear_evento_calendario",
+            "eliminar_evento_calendario",
+        ],
+        "palabras": [
+            "calendario", "evento", "reunion", "cita", "quedada", "google",
+            "agenda",
+        ],
+    },
+}
+
+
+def estimar_tokens(obj) -> int:
+    """Estimación barata de tokens (≈ 4 caracteres por token)."""
+    return len(json.dumps(obj, ensure_ascii=False)) // 4
+
+
+class ToolSelector:
+    """Elige el subconjunto de herramientas a enviar en cada turno."""
+
+    def __init__(self, grupos: Dict[str, Dict[str, List[str]]] = GRUPOS_TOOLS):
+        self.grupos = grupos
+        self._tools_agrupadas: Set[str] = {
+            t for g in grupos.values() for t in g["tools"]
+        }
+
+    def grupos_relevantes(self, mensaje: str) -> Set[str]:
+        """Grupos cuyas palabras clave aparecen en el mensaje."""
+        palabras = re.findall(r"\w+", sin_tildes(mensaje))
+        relevantes = set()
+        for nombre, grupo in self.grupos.items():
+            claves = grupo["palabras"]
+            if any(p.startswith(k) for p in palabras for k in claves):
+                relevantes.add(nombre)
+        return relevantes
+
+    def seleccionar(self, mensaje: str, tools_schema: List[Dict]) -> Tuple[List[Dict], Dict]:
+        """
+        Devuelve (herramientas a enviar, info) manteniendo el orden original.
+        `info` incluye los grupos elegidos y los tokens estimados ahorrados.
+        """
+        grupos = self.grupos_relevantes(mensaje)
+
+        if not grupos or len(grupos) == len(self.grupos):
+            return tools_schema, {"grupos": sorted(grupos), "fallback": True, "tokens_ahorrados": 0}
+
+        permitidas = {t for g in grupos for t in self.grupos[g]["tools"]}
+        seleccion = [
+            t for t in tools_schema
+            if t["function"]["name"] in permitidas
+            or t["function"]["name"] not in self._tools_agrupadas
+        ]
+        ahorrados = estimar_tokens(tools_schema) - estimar_tokens(seleccion)
+        return seleccion, {
+            "grupos": sorted(grupos),
+            "fallback": False,
+            "tools": len(seleccion),
+            "tokens_ahorrados": ahorrados,
+        }
+
+
+def seleccionar_tools(selector: ToolSelector, mensaje: str,
+                      tools_schema: List[Dict]) -> List[Dict]:
+    """Aplica el selector y registra en las trazas los tokens ahorrados."""
+    with tracer.span("agente.seleccion_tools") as s:
+        seleccion, info = selector.seleccionar(mensaje, tools_schema)
+        s.set(**info)
+    tracer.contar("tokens_ahorrados_seleccion_tools", info["tokens_ahorrados"])
+    return seleccion
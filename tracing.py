@@ -0,0 +1,244 @@
+"""
+Instrumentación ligera por spans.
+
+Cada span mide la duración de una etapa (modelo, herramienta, MCP,
+Google Calendar, acceso a JSON...) y la guarda en memoria para poder
+calcular percentiles de la sesión. Opcionalmente, cada span se escribe
+como una línea en un fichero JSONL de trazas, que se cierra al salir del
+proceso.
+
+El trazado está desactivado por defecto (TRACE_ENABLED=1 lo activa).
+Desactivado, `span()` devuelve un objeto nulo compartido y los
+decoradores llaman directamente a la función original. Los tokens y los
+contadores con nombre (`contar`) se acumulan siempre: son una suma bajo
+un lock, no un span, y /stats los muestra aunque no haya trazado.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Optional
+
+from config import TRACE_ENABLED, TRACE_FILE, TRACE_MAX_MUESTRAS
+from utils import percentil
+
+
+# Identificador del turno de conversación en curso (se añade a cada span)
+_turno_actual: ContextVar[Optional[int]] = ContextVar("turno_actual", default=None)
+
+
+class _SpanNulo:
+    """Span que no hace nada (trazado desactivado)."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_SPAN_NULO = _SpanNulo()
+
+
+class _Span:
+    """Span activo: mide el tiempo entre __enter__ y __exit__."""
+
+    __slots__ = ("_tracer", "etapa", "attrs", "_inicio")
+
+    def __init__(self, tracer: "Tracer", etapa: str, attrs: Dict):
+        self._tracer = tracer
+        self.etapa = etapa
+        self.attrs = attrs
+        self._inicio = 0.0
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duracion_ms = (time.perf_counter() - self._inicio) * 1000
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self._tracer._registrar(self.etapa, duracion_ms, self.attrs)
+        return False
+
+    def set(self, **attrs):
+        """Añade atributos al span (p. ej. tokens de la respuesta)."""
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    """
+    Registro de spans del proceso.
+
+    Guarda las últimas `max_muestras` duraciones de cada etapa y los
+    tokens consumidos en las llamadas al modelo.
+    """
+
+    def __init__(self, habilitado: bool = True, fichero=None,
+                 max_muestras: int = 2000):
+        self.habilitado = habilitado
+        self.fichero = fichero
+        self.max_muestras = max_muestras
+        self._lock = threading.Lock()
+        self._duraciones: Dict[str, deque] = defaultdict(
+            lambda: deque(maxlen=self.max_muestras)
+        )
+        self._tokens: Dict[str, int] = defaultdict(int)
+        self._contadores: Dict[str, float] = defaultdict(float)
+        self._fh = None
+        self._siguiente_turno = 0
+
+    # ---------- API pública ----------
+
+    def span(self, etapa: str, **attrs):
+        """Devuelve un context manager que mide la etapa indicada."""
+        if not self.habilitado:
+            return _SPAN_NULO
+        return _Span(self, etapa, attrs)
+
+    def nuevo_turno(self) -> Optional[int]:
+        """Marca el inicio de un turno de conversación en el contexto actual."""
+        if not self.habilitado:
+            return None
+        with self._lock:
+            self._siguiente_turno += 1
+            turno = self._siguiente_turno
+        _turno_actual.set(turno)
+        return turno
+
+    def registrar_tokens(self, usage) -> None:
+        """
+        Acumula el uso de tokens de una respuesta de chat_completion.
+        Acepta el objeto `usage` de la respuesta (o un dict equivalente).
+        Se acumula aunque el trazado esté desactivado.
+        """
+        if usage is None:
+            return
+        for campo in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            if isinstance(usage, dict):
+                valor = usage.get(campo)
+            else:
+                valor = getattr(usage, campo, None)
+            if valor:
+                with self._lock:
+                    self._tokens[campo] += int(valor)
+
+    def contar(self, nombre: str, cantidad: float = 1) -> None:
+        """
+        Acumula un contador con nombre (p. ej. tokens ahorrados), aunque el
+        trazado esté desactivado.
+        """
+        with self._lock:
+            self._contadores[nombre] += cantidad
+
+    def estadisticas(self) -> Dict[str, Dict[str, float]]:
+        """
+        Devuelve, por etapa, número de muestras, p50, p95, máximo y total (ms).
+        """
+        with self._lock:
+            copia = {etapa: list(d) for etapa, d in self._duraciones.items()}
+
+        resultado = {}
+        for etapa, valores in sorted(copia.items()):
+            if not valores:
+                continue
+            valores.sort()
+            resultado[etapa] = {
+                "n": len(valores),
+                "p50": percentil(valores, 50),
+                "p95": percentil(valores, 95),
+                "max": valores[-1],
+                "total": sum(valores),
+            }
+        return resultado
+
+    def tokens(self) -> Dict[str, int]:
+        """Tokens acumulados en la sesión."""
+        with self._lock:
+            return dict(self._tokens)
+
+    def contadores(self) -> Dict[str, float]:
+        """Contadores acumulados en la sesión (ver `contar`)."""
+        with self._lock:
+            return dict(self._contadores)
+
+    def reiniciar(self) -> None:
+        """Borra las muestras acumuladas en memoria."""
+        with self._lock:
+            self._duraciones.clear()
+            self._tokens.clear()
+            self._contadores.clear()
+
+    def cerrar(self) -> None:
+        """Cierra el fichero de trazas (se vuelve a abrir con el siguiente span)."""
+        with self._lock:
+            fh, self._fh = self._fh, None
+            if fh is not None:
+                try:
+                    fh.close()
+                except OSError:
+                    pass
+
+    # ---------- Interno ----------
+
+    def _registrar(self, etapa: str, duracion_ms: float, attrs: Dict) -> None:
+        with self._lock:
+            self._duraciones[etapa].append(duracion_ms)
+
+            if self.fichero is None:
+                return
+
+            registro = {
+                "ts": round(time.time(), 6),
+                "pid": os.getpid(),
+                "turno": _turno_actual.get(),
+                "etapa": etapa,
+                "ms": round(duracion_ms, 3),
+            }
+            registro.update(attrs)
+
+            try:
+                if self._fh is None:
+                    self._fh = open(self.fichero, "a", encoding="utf-8")
+                self._fh.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+                self._fh.flush()
+            except OSError:
+                # Un fallo al escribir la traza nunca debe romper la petición
+                self.fichero = None
+
+
+# Tracer global del proceso
+tracer = Tracer(TRACE_ENABLED, TRACE_FILE, TRACE_MAX_MUESTRAS)
+atexit.register(tracer.cerrar)
+
+
+def span(etapa: str, **attrs):
+    """Atajo para `tracer.span(...)`."""
+    return tracer.span(etapa, **attrs)
+
+
+def trazar(etapa: str):
+    """
+    Decorador que envuelve una función en un span con el nombre indicado.
+    Si el trazado está desactivado llama directamente a la función.
+    """
+    def decorador(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.habilitado:
+                return func(*args, **kwargs)
+            with tracer.span(etapa):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorador
@@ -1,5 +1,10 @@
-﻿from datetime import datetime, date
-from typing import Dict, List
+﻿import math
+import unicodedata
+from datetime import datetime, date
+from typing import Callable, Dict, List, Optional
+
+_DIAS_SEMANA = ["lunes", "martes", "miercoles", "jueves", "viernes", "sabado", "domingo"]
+
 
 def format_horario(horarios: List[Dict]) -> str:
     """Formatea una lista de horarios para mostrar"""
@@ -36,7 +41,7 @@ def es_fecha_valida(fecha_str: str) -> bool:
     except ValueError:
         return False
     
-def normalizar_fecha_futura(fecha_str: str) -> str:
+def normalizar_fecha_futura(fecha_str: str, hoy: Optional[date] = None) -> str:
     """
     Recibe una fecha 'YYYY-MM-DD' (posiblemente en pasado, ej. 2023-12-20)
     y la ajusta para que sea como mínimo en el año actual, y si aún así
@@ -49,7 +54,7 @@ def normalizar_fecha_futura(fecha_str: str) -> str:
       - '2026-03-01' -> '2026-03-01' (se respeta porque ya es futuro)
     """
     dt = datetime.strptime(fecha_str, "%Y-%m-%d").date()
-    hoy = date.today()
+    hoy = hoy or date.today()
 
     # Si el año es menor que el actual, súbelo al año actual
     if dt.year < hoy.year:
@@ -60,3 +65,50 @@ def normalizar_fecha_futura(fecha_str: str) -> str:
         dt = dt.replace(year=dt.year + 1)
 
     return dt.strftime("%Y-%m-%d")
+
+
+def normalizador_fechas_futuras() -> Callable[[str], str]:
+    """
+    Versión por lotes de normalizar_fecha_futura para importaciones:
+    devuelve una función que fija "hoy" una sola vez y reutiliza el
+    resultado de las fechas repetidas (muchas entregas comparten fecha).
+    Las fechas no válidas lanzan ValueError igual que la versión individual.
+    """
+    hoy = date.today()
+    cache: Dict[str, str] = {}
+
+    def normalizar(fecha_str: str) -> str:
+        normalizada = cache.get(fecha_str)
+        if normalizada is None:
+            normalizada = normalizar_fecha_futura(fecha_str, hoy)
+            if len(cache) < 4096:
+                cache[fecha_str] = normalizada
+        return normalizada
+
+    return normalizar
+
+
+def sin_tildes(texto: str) -> str:
+    """Texto en minúsculas, sin tildes ni espacios alrededor (para comparar nombres)"""
+    texto = unicodedata.normalize("NFKD", texto.strip().lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def dia_semana(nombre: str) -> Optional[int]:
+    """Número de día (lunes = 0) de un nombre como 'Miércoles', o None"""
+    try:
+        return _DIAS_SEMANA.index(sin_tildes(nombre))
+    except ValueError:
+        return None
+
+
+def percentil(valores, p: float) -> float:
+    """
+    Percentil p (0-100) por rango más cercano; 0.0 si no hay valores.
+    Es el que usan /stats, el resumen del modo batch y las pruebas de carga.
+    """
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    k = math.ceil(p / 100 * len(ordenados)) - 1
+    return ordenados[max(0, min(k, len(ordenados) - 1))]